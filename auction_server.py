@@ -0,0 +1,845 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP de la subasta (asyncio, sin dependencias externas)
+
+Rutas:
+    GET /api/search   Búsqueda con filtros, paginación y facetas
+    GET /api/suggest  Sugerencias mientras se escribe
+    GET /api/facets   Recuentos por marca, año y rango de precio del catálogo completo
+    GET /api/catalog  Lotes cambiados desde una versión (?since=N), con ETag y paginación por cursor
+    POST /api/bids    Pujar por un lote ({"lot", "bidder", "amount"})
+    GET /api/bids     Estado de las pujas de un lote (?lot=N) o de todos
+    GET /api/live     Flujo de eventos (SSE) con los cambios de los lotes suscritos
+    POST /api/live/subscribe  Lotes que sigue un cliente del flujo ({"client", "lots"})
+    GET /static/<archivo>     Imágenes publicadas por publish_images.py (caché permanente, Range, WebP/AVIF)
+    GET /pages/<archivo>      Páginas del archivo único {prefix}.pages de page_archive.py (mapeado en memoria)
+"""
+
+import sys
+import json
+import math
+import time
+import asyncio
+import re
+import argparse
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+
+from catalog_index import load_index
+from catalog_feed import CatalogFeed, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE as MAX_FEED_PAGE_SIZE
+from bid_engine import BidEngine, BidRejected
+from live_updates import LiveHub, format_event
+from publish_images import ASSET_MANIFEST, CONTENT_TYPES, STATIC_DIR_NAME, load_manifest
+from page_archive import ARCHIVE_SUFFIX, PageArchive
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_CATALOG = "auction_images/catalog.json"
+# Fuera de auction_images: el convertidor limpia esa carpeta en cada conversión
+DEFAULT_BIDS_LOG = "data/bids.wal"
+DEFAULT_STATIC_DIR = f"auction_images/{STATIC_DIR_NAME}"
+DEFAULT_PAGES_ARCHIVE = f"auction_images/page{ARCHIVE_SUFFIX}"
+
+# Los archivos publicados no cambian nunca (el nombre lleva el hash del contenido)
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Pujas confirmadas entre instantáneas del libro de pujas (acota la reproducción del WAL al arrancar)
+BIDS_CHECKPOINT_EVERY = 100000
+
+# Segundos entre comprobaciones de si catalog.json cambió
+CATALOG_CHECK_INTERVAL = 1.0
+
+# Segundos entre pasadas que cierran los lotes cuya hora de cierre ya pasó
+LOT_CLOSE_INTERVAL = 1.0
+
+# Límites de las peticiones
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MAX_PAGE_SIZE = 200
+
+STATUS_TEXT = {
+    200: "OK", 204: "No Content", 206: "Partial Content", 304: "Not Modified",
+    400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    413: "Payload Too Large", 416: "Range Not Satisfiable", 500: "Internal Server Error",
+}
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+class HTTPError(Exception):
+    """Error que se devuelve al cliente con su código HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    """Petición HTTP ya leída"""
+
+    def __init__(self, method, target, headers, body=b""):
+        self.method = method
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "JSON inválido")
+
+    def int_param(self, name, default=None, minimum=None, maximum=None):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise HTTPError(400, f"Parámetro {name} debe ser un entero")
+        if minimum is not None:
+            value = max(minimum, value)
+        if maximum is not None:
+            value = min(maximum, value)
+        return value
+
+class Response:
+    """Respuesta HTTP con cuerpo completo"""
+
+    def __init__(self, status=200, body=b"", headers=None, content_type="application/json"):
+        self.status = status
+        self.body = body
+        self.headers = dict(headers or {})
+        if content_type and body:
+            self.headers.setdefault("Content-Type", content_type)
+
+    @classmethod
+    def json(cls, data, status=200, headers=None):
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return cls(status, body, headers, "application/json; charset=utf-8")
+
+    async def send(self, writer, head_only=False):
+        headers = dict(self.headers)
+        headers["Content-Length"] = str(len(self.body))
+        head = [f"HTTP/1.1 {self.status} {STATUS_TEXT.get(self.status, 'OK')}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        if self.body and not head_only and self.status != 304:
+            writer.write(self.body)
+        await writer.drain()
+
+class StreamResponse(Response):
+    """
+    Respuesta sin longitud fija: tras las cabeceras, `stream(writer)` escribe
+    el cuerpo hasta que termina o el cliente se desconecta, y la conexión se
+    cierra después
+    """
+
+    def __init__(self, stream, headers=None, content_type="text/event-stream; charset=utf-8"):
+        super().__init__(200, b"", headers, None)
+        self.headers["Content-Type"] = content_type
+        self.headers.setdefault("Cache-Control", "no-cache")
+        self.stream = stream
+
+    async def send(self, writer, head_only=False):
+        self.headers["Connection"] = "close"
+        head = [f"HTTP/1.1 {self.status} {STATUS_TEXT.get(self.status, 'OK')}"]
+        head += [f"{name}: {value}" for name, value in self.headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        if not head_only:
+            await self.stream(writer)
+
+class HTTPServer:
+    """
+    Servidor HTTP/1.1 mínimo sobre asyncio con conexiones persistentes
+
+    Las rutas se registran con `route(método, ruta, handler)`; cada handler es
+    una corrutina que recibe un Request y devuelve un Response.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.prefix_routes = {}
+        self.default_headers = {"Access-Control-Allow-Origin": "*"}
+        self.startup = []
+        self.shutdown = []
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    def route_prefix(self, method, prefix, handler):
+        """Registrar un handler para todas las rutas que empiezan por `prefix`"""
+        self.prefix_routes[(method, prefix)] = handler
+
+    async def _preflight(self, request):
+        methods = sorted({method for method, path in self.routes if path == request.path} | {"OPTIONS"})
+        return Response(204, headers={
+            "Access-Control-Allow-Methods": ", ".join(methods),
+            "Access-Control-Allow-Headers": "Content-Type",
+            "Access-Control-Max-Age": "86400",
+        })
+
+    def find_handler(self, request):
+        """Handler de una petición (HEAD usa el de GET; OPTIONS responde el preflight CORS)"""
+        method = "GET" if request.method == "HEAD" else request.method
+        if method == "OPTIONS" and any(path == request.path for _, path in self.routes):
+            return self._preflight
+        handler = self.routes.get((method, request.path))
+        if handler is None:
+            for (route_method, prefix), prefix_handler in self.prefix_routes.items():
+                if route_method == method and request.path.startswith(prefix):
+                    return prefix_handler
+            if any(path == request.path for _, path in self.routes):
+                raise HTTPError(405, "Método no permitido")
+            raise HTTPError(404, "No encontrado")
+        return handler
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Cabeceras demasiado grandes")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Línea de petición inválida")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length inválido")
+        if length < 0:
+            raise HTTPError(400, "Content-Length inválido")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Cuerpo demasiado grande")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = None
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    response = await self.find_handler(request)(request)
+                except HTTPError as e:
+                    response = Response.json({"error": e.message}, status=e.status)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    log_message(f"❌ Error procesando la petición: {e}")
+                    request = None
+                    response = Response.json({"error": "Error interno"}, status=500)
+
+                for name, value in self.default_headers.items():
+                    response.headers.setdefault(name, value)
+                keep_alive = (request is not None and not isinstance(response, StreamResponse)
+                              and request.headers.get("connection", "").lower() != "close")
+                response.headers["Connection"] = "keep-alive" if keep_alive else "close"
+                await response.send(writer, head_only=request is not None and request.method == "HEAD")
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """Atender peticiones en host:port, o en el socket Unix `unix_path` si se indica"""
+        for hook in self.startup:
+            await hook()
+        try:
+            if unix_path:
+                server = await asyncio.start_unix_server(self.handle_connection, unix_path,
+                                                         limit=MAX_HEADER_BYTES)
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port,
+                                                    limit=MAX_HEADER_BYTES)
+            async with server:
+                await server.serve_forever()
+        finally:
+            for hook in self.shutdown:
+                await hook()
+
+class CatalogService:
+    """
+    Búsqueda sobre catalog.json con el índice de catalog_index
+
+    El índice se reconstruye cuando cambia la fecha de modificación del
+    catálogo (comprobada como mucho una vez por segundo), de modo que una
+    nueva extracción de lotes se publica sin reiniciar el servidor.
+    """
+
+    def __init__(self, catalog_path):
+        self.catalog_path = Path(catalog_path)
+        self._mtime = None
+        self._checked = 0.0
+        self.index = load_index(self.catalog_path)
+        self._mtime = self._catalog_mtime()
+        self.feed = CatalogFeed(self.index.lots)
+        self.books = {}
+
+    def _catalog_mtime(self):
+        try:
+            return self.catalog_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def current_index(self):
+        now = time.monotonic()
+        if now - self._checked >= CATALOG_CHECK_INTERVAL:
+            self._checked = now
+            mtime = self._catalog_mtime()
+            if mtime != self._mtime:
+                self.index = load_index(self.catalog_path)
+                self._mtime = mtime
+                changed = self.feed.update_catalog(self.index.lots)
+                log_message(f"🔄 Catálogo recargado: {len(self.index.lots)} lotes, {changed} cambios")
+        return self.index
+
+    def register(self, server):
+        server.route("GET", "/api/search", self.handle_search)
+        server.route("GET", "/api/suggest", self.handle_suggest)
+        server.route("GET", "/api/facets", self.handle_facets)
+        server.route("GET", "/api/catalog", self.handle_catalog)
+
+    async def handle_search(self, request):
+        start = time.perf_counter()
+        sort = request.query.get("sort", "lot")
+        if sort not in ("lot", "price", "price_desc"):
+            raise HTTPError(400, "sort debe ser lot, price o price_desc")
+        result = self.current_index().search(
+            request.query.get("q", ""),
+            offset=request.int_param("offset", 0, minimum=0),
+            limit=request.int_param("limit", 50, minimum=1, maximum=MAX_PAGE_SIZE),
+            sort=sort,
+            facets=request.query.get("facets", "1") != "0",
+            brand=request.query.get("brand") or None,
+            price=request.query.get("price") or None,
+            price_min=request.int_param("price_min"),
+            price_max=request.int_param("price_max"),
+            year_min=request.int_param("year_min"),
+            year_max=request.int_param("year_max"),
+        )
+        result["took_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return Response.json(result)
+
+    async def handle_suggest(self, request):
+        limit = request.int_param("limit", 5, minimum=1, maximum=20)
+        suggestions = self.current_index().suggest(request.query.get("q", ""), limit=limit)
+        return Response.json({"suggestions": suggestions})
+
+    async def handle_facets(self, request):
+        index = self.current_index()
+        return Response.json({"total": len(index.lots), "facets": index.facets()})
+
+    def lot_entry(self, number):
+        """Lote tal como lo devuelve /api/catalog: datos del catálogo más el estado de sus pujas"""
+        if number in self.feed.removed:
+            return {"lot": number, "removed": True}
+        entry = dict(self.index.get_lot(number) or {"lot": number})
+        book = self.books.get(number)
+        if book is not None:
+            entry.update(current_bid=book.current_bid, min_bid=book.min_bid, bids=book.bids, closed=book.closed)
+        return entry
+
+    async def handle_catalog(self, request):
+        """
+        Sincronización incremental del catálogo
+
+        `?since=<versión>` devuelve solo los lotes nuevos, modificados,
+        retirados (`removed`) o con pujas nuevas desde esa versión; sin
+        `since` devuelve el catálogo completo. Si hay más de `limit` cambios,
+        `next_cursor` es el `since` de la página siguiente. El ETag es la
+        versión del catálogo: un cliente que repite la petición con
+        `If-None-Match` recibe 304 mientras nada cambie.
+        """
+        self.current_index()
+        feed = self.feed
+        etag = f'"{feed.version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(304, headers=headers)
+
+        since = request.int_param("since", 0, minimum=0)
+        limit = request.int_param("limit", DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_FEED_PAGE_SIZE)
+        reset = feed.needs_reset(since)
+        if reset:
+            since = 0
+        changes, cursor = feed.changed_since(since, limit)
+        return Response.json({
+            "version": feed.version,
+            "since": since,
+            "reset": reset,
+            "lots": [self.lot_entry(number) for _, number in changes],
+            "next_cursor": cursor,
+        }, headers=headers)
+
+class BidService:
+    """
+    Pujas sobre los lotes del catálogo con bid_engine
+
+    El precio de salida de cada lote sale del catálogo que sirve
+    CatalogService; los lotes que no están en el catálogo no admiten pujas.
+    Cada lote se cierra a su `ends_at` del catálogo o, si no tiene, al cierre
+    de la subasta (`closes_at`): una tarea lo comprueba cada segundo y una
+    puja que llega después de la hora cierra el lote antes de rechazarse.
+    """
+
+    def __init__(self, catalog, bids_log=DEFAULT_BIDS_LOG, checkpoint_every=BIDS_CHECKPOINT_EVERY,
+                 closes_at=None):
+        self.catalog = catalog
+        self.engine = BidEngine(bids_log, lot_lookup=self.starting_price)
+        self.engine.listeners.append(lambda state: catalog.feed.touch(state["lot"]))
+        catalog.books = self.engine.books
+        self.closes_at = closes_at
+        self.checkpoint_every = checkpoint_every
+        self._since_checkpoint = 0
+        self._checkpointing = False
+        self._closer_task = None
+
+    def starting_price(self, number):
+        index = self.catalog.current_index()
+        lot = index.get_lot(number)
+        return None if lot is None else index.price_of(lot)
+
+    def ends_at(self, lot):
+        """Hora de cierre (timestamp) de un lote del catálogo, o None si no cierra"""
+        ends_at = lot.get("ends_at", self.closes_at)
+        return ends_at if isinstance(ends_at, (int, float)) and not isinstance(ends_at, bool) else None
+
+    def lot_delta(self, state):
+        """Cambio de un lote tal como se envía a los clientes (sin el pujador)"""
+        lot = self.catalog.current_index().get_lot(state["lot"]) or {}
+        return {
+            "lot": state["lot"],
+            "current_bid": state["current_bid"],
+            "min_bid": state["min_bid"],
+            "bids": state["bids"],
+            "closed": state["closed"],
+            "ends_at": self.ends_at(lot),
+            "seq": state["seq"],
+        }
+
+    def register(self, server):
+        server.route("POST", "/api/bids", self.handle_bid)
+        server.route("GET", "/api/bids", self.handle_book)
+        server.startup.append(self.start)
+        server.shutdown.append(self.stop)
+
+    async def start(self):
+        replayed = await self.engine.start()
+        log_message(f"🔨 Libro de pujas listo: {len(self.engine.books)} lotes, {replayed} pujas reproducidas del WAL")
+        self._closer_task = asyncio.create_task(self._close_expired_lots())
+
+    async def stop(self):
+        if self._closer_task is not None:
+            self._closer_task.cancel()
+            try:
+                await self._closer_task
+            except asyncio.CancelledError:
+                pass
+            self._closer_task = None
+        await self.engine.stop()
+
+    async def _close_if_expired(self, number, lot, now):
+        """Cerrar un lote si su hora de cierre ya pasó (True si queda cerrado)"""
+        ends_at = self.ends_at(lot)
+        if ends_at is None or ends_at > now:
+            return False
+        book = self.engine.books.get(number)
+        if book is None or not book.closed:
+            await self.engine.close_lot(number)
+            log_message(f"🔒 Lote {number} cerrado")
+        return True
+
+    async def _close_expired_lots(self):
+        while True:
+            now = time.time()
+            for lot in self.catalog.current_index().lots:
+                number = lot.get("lot", lot.get("id"))
+                if number is None:
+                    continue
+                try:
+                    await self._close_if_expired(number, lot, now)
+                except BidRejected:
+                    # Lote sin precio de salida: no admite pujas de todos modos
+                    pass
+                except Exception as e:
+                    log_message(f"⚠️ No se pudo cerrar el lote {number}: {e}")
+            await asyncio.sleep(LOT_CLOSE_INTERVAL)
+
+    async def _checkpoint(self):
+        try:
+            await self.engine.checkpoint()
+        except Exception as e:
+            # La tarea no la espera nadie: sin este aviso el WAL dejaría de compactarse en silencio
+            log_message(f"⚠️ No se pudo guardar la instantánea de pujas: {e}")
+        finally:
+            self._checkpointing = False
+
+    async def handle_bid(self, request):
+        data = request.json()
+        lot, bidder, amount = data.get("lot"), data.get("bidder"), data.get("amount")
+        if not isinstance(lot, int) or isinstance(lot, bool):
+            raise HTTPError(400, "lot debe ser un entero")
+        if (not isinstance(amount, (int, float)) or isinstance(amount, bool)
+                or not math.isfinite(amount) or amount <= 0):
+            raise HTTPError(400, "amount debe ser un número positivo")
+        if not isinstance(bidder, str) or not bidder.strip():
+            raise HTTPError(400, "bidder es obligatorio")
+
+        try:
+            # Una puja que llega tras el cierre cierra el lote sin esperar a la tarea periódica
+            await self._close_if_expired(lot, self.catalog.current_index().get_lot(lot) or {}, time.time())
+            state = await self.engine.place_bid(lot, bidder.strip(), amount)
+        except BidRejected as e:
+            body = {"accepted": False, "error": e.reason}
+            if e.book is not None:
+                body["lot"] = e.book.to_dict()
+            return Response.json(body, status=409 if e.book is not None else 404)
+
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every and not self._checkpointing:
+            self._since_checkpoint = 0
+            self._checkpointing = True
+            asyncio.create_task(self._checkpoint())
+        return Response.json({"accepted": True, "lot": state})
+
+    async def handle_book(self, request):
+        number = request.int_param("lot")
+        if number is None:
+            return Response.json({"lots": [book.to_dict() for book in self.engine.books.values()]})
+        book = self.engine.book(number)
+        if book is None:
+            raise HTTPError(404, f"Lote {number} no encontrado")
+        return Response.json({"lot": book.to_dict()})
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def parse_range(header, size):
+    """
+    Rango de bytes pedido en una cabecera Range
+
+    Returns:
+        tuple: (inicio, fin inclusive), None para servir el archivo completo
+            (sin Range, o varios rangos) o "invalid" si no se puede satisfacer
+    """
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "invalid"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return "invalid"
+    return start, end
+
+def preferred_variant(accept, variants):
+    """Variante más ligera que acepta el cliente según Accept (None = el original)"""
+    accepted = set()
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(media_type.strip().lower())
+    candidates = [variant for content_type, variant in variants.items() if content_type in accepted]
+    return min(candidates, key=lambda variant: variant["bytes"]) if candidates else None
+
+def _read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+        return file.read(length)
+
+class StaticService:
+    """
+    Imágenes publicadas por publish_images.py
+
+    Los archivos con hash en el nombre se sirven con caché permanente
+    (`immutable`) y ETag fuerte, admiten peticiones Range y, si el cliente
+    acepta WebP o AVIF, reciben la variante más ligera (`Vary: Accept`).
+    El manifiesto se sirve con `no-cache` y su ETag, así que un visitante que
+    vuelve solo hace una petición condicional (304) para él.
+    """
+
+    def __init__(self, static_dir=DEFAULT_STATIC_DIR, prefix="/static/"):
+        self.static_dir = Path(static_dir)
+        self.prefix = prefix
+        self._mtime = None
+        self._checked = 0.0
+        self.files = {}
+        self.manifest_etag = None
+
+    def current_files(self):
+        """Archivos publicados por nombre (se recargan cuando cambia el manifiesto)"""
+        now = time.monotonic()
+        if now - self._checked >= CATALOG_CHECK_INTERVAL:
+            self._checked = now
+            try:
+                mtime = (self.static_dir / ASSET_MANIFEST).stat().st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self.manifest_etag = f'"m{mtime}"' if mtime else None
+                files = {}
+                for entry in load_manifest(self.static_dir).get("assets", {}).values():
+                    files[entry["file"]] = entry
+                self.files = files
+        return self.files
+
+    def register(self, server):
+        server.route_prefix("GET", self.prefix, self.handle_file)
+
+    async def handle_file(self, request):
+        name = request.path[len(self.prefix):]
+        files = self.current_files()
+        if name == ASSET_MANIFEST and self.manifest_etag:
+            return await self._serve(request, self.static_dir / name, self.manifest_etag,
+                                     "application/json; charset=utf-8", "no-cache")
+
+        entry = files.get(name)
+        if entry is None or "/" in name:
+            raise HTTPError(404, "No encontrado")
+        variant = preferred_variant(request.headers.get("accept", ""), entry.get("variants", {}))
+        if variant is None:
+            path, etag, content_type = self.static_dir / name, entry["etag"], entry["content_type"]
+        else:
+            path, etag = self.static_dir / variant["file"], variant["etag"]
+            content_type = "image/" + Path(variant["file"]).suffix[1:]
+        return await self._serve(request, path, etag, content_type, IMMUTABLE_CACHE,
+                                 vary=bool(entry.get("variants")))
+
+    async def _serve(self, request, path, etag, content_type, cache_control, vary=False):
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+        if vary:
+            headers["Vary"] = "Accept"
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(304, headers=headers)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            raise HTTPError(404, "No encontrado")
+
+        byte_range = parse_range(request.headers.get("range", ""), size)
+        if_range = request.headers.get("if-range")
+        if if_range and if_range != etag:
+            byte_range = None
+        if byte_range == "invalid":
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(416, headers=headers)
+
+        start, end = byte_range or (0, size - 1)
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(None, _read_range, path, start, end - start + 1)
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(206, body, headers, content_type)
+        return Response(200, body, headers, content_type)
+
+class PageArchiveService:
+    """
+    Páginas de un archivo {prefix}.pages (ver page_archive)
+
+    El archivo está mapeado en memoria y servir una página es una búsqueda en
+    su índice: el cuerpo de la respuesta es un memoryview sobre el mapa, sin
+    leer ni copiar la imagen. Los nombres son los de los archivos sueltos
+    (`/pages/page_001.png`), que no llevan hash, así que se sirven con
+    `no-cache` y un ETag del CRC32 y la longitud. Cuando el archivo cambia
+    (se vuelve a empaquetar o se despliega otro) se mapea de nuevo; las
+    respuestas en curso conservan el mapa anterior. Si el archivo nuevo no se
+    puede abrir, se sigue sirviendo el anterior.
+    """
+
+    def __init__(self, archive_path=DEFAULT_PAGES_ARCHIVE, prefix="/pages/"):
+        self.archive_path = Path(archive_path)
+        self.prefix = prefix
+        self._signature = None
+        self._checked = 0.0
+        self.archive = None
+
+    def current_archive(self):
+        """Archivo de páginas mapeado (se vuelve a abrir cuando cambia en disco)"""
+        now = time.monotonic()
+        if now - self._checked >= CATALOG_CHECK_INTERVAL:
+            self._checked = now
+            try:
+                stat = self.archive_path.stat()
+                signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                signature = None
+            if signature != self._signature:
+                self._signature = signature
+                try:
+                    self.archive = PageArchive(self.archive_path) if signature else None
+                except (OSError, ValueError) as e:
+                    log_message(f"⚠️ No se pudo abrir {self.archive_path}, se mantiene la versión anterior: {e}")
+        return self.archive
+
+    def register(self, server):
+        server.route_prefix("GET", self.prefix, self.handle_page)
+
+    async def handle_page(self, request):
+        name = request.path[len(self.prefix):]
+        archive = self.current_archive()
+        found = archive.lookup(name) if archive is not None else None
+        if found is None:
+            raise HTTPError(404, "No encontrado")
+        data, crc = found
+        etag = f'"{crc:08x}-{len(data):x}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Accept-Ranges": "bytes"}
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(304, headers=headers)
+
+        content_type = CONTENT_TYPES.get(Path(name).suffix.lower(), "application/octet-stream")
+        byte_range = parse_range(request.headers.get("range", ""), len(data))
+        if_range = request.headers.get("if-range")
+        if if_range and if_range != etag:
+            byte_range = None
+        if byte_range == "invalid":
+            headers["Content-Range"] = f"bytes */{len(data)}"
+            return Response(416, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(206, data[start:end + 1], headers, content_type)
+        return Response(200, data, headers, content_type)
+
+class LiveService:
+    """
+    Cambios de pujas en tiempo real con live_updates
+
+    Cada pantalla abre `GET /api/live`; el primer evento (`hello`) trae su
+    identificador de cliente, con el que indica en `POST /api/live/subscribe`
+    los lotes que tiene a la vista. Al suscribirse recibe el estado actual de
+    esos lotes y, a partir de ahí, un evento `lot` por cada puja aceptada.
+    """
+
+    def __init__(self, bids):
+        self.bids = bids
+        self.hub = LiveHub()
+        bids.engine.listeners.append(self.publish)
+
+    def publish(self, state):
+        self.hub.publish(state["lot"], self.bids.lot_delta(state))
+
+    def register(self, server):
+        server.route("GET", "/api/live", self.handle_stream)
+        server.route("POST", "/api/live/subscribe", self.handle_subscribe)
+
+    async def handle_stream(self, request):
+        subscriber = self.hub.connect()
+        lots = [int(lot) for lot in request.query.get("lots", "").split(",") if lot.strip().isdigit()]
+        self._subscribe(subscriber, lots)
+
+        async def stream(writer):
+            writer.write(b"retry: 3000\n")
+            writer.write(format_event("hello", {"client": subscriber.client_id, "server_time": time.time(),
+                                                "closes_at": self.bids.closes_at}))
+            await self.hub.stream(subscriber, writer)
+
+        return StreamResponse(stream, headers={"X-Accel-Buffering": "no"})
+
+    def _subscribe(self, subscriber, lots):
+        new_lots = set(lots) - subscriber.lots
+        self.hub.subscribe(subscriber, lots)
+        for lot in new_lots & subscriber.lots:
+            book = self.bids.engine.books.get(lot)
+            if book is not None:
+                subscriber.push(lot, self.bids.lot_delta(book.to_dict()))
+
+    async def handle_subscribe(self, request):
+        data = request.json()
+        subscriber = self.hub.subscribers.get(data.get("client"))
+        if subscriber is None:
+            raise HTTPError(404, "Cliente desconocido (reconectar al flujo)")
+        lots = data.get("lots")
+        if not isinstance(lots, list) or not all(isinstance(lot, int) for lot in lots):
+            raise HTTPError(400, "lots debe ser una lista de enteros")
+        self._subscribe(subscriber, lots)
+        return Response.json({"client": subscriber.client_id, "lots": sorted(subscriber.lots)})
+
+def build_server(catalog_path=DEFAULT_CATALOG, bids_log=DEFAULT_BIDS_LOG, closes_at=None,
+                 static_dir=DEFAULT_STATIC_DIR, pages_archive=DEFAULT_PAGES_ARCHIVE):
+    """Crear el servidor con todas las rutas registradas"""
+    server = HTTPServer()
+    catalog = CatalogService(catalog_path)
+    catalog.register(server)
+    bids = BidService(catalog, bids_log, closes_at=closes_at)
+    bids.register(server)
+    LiveService(bids).register(server)
+    StaticService(static_dir).register(server)
+    PageArchiveService(pages_archive).register(server)
+    return server
+
+def parse_closing_time(text):
+    """Hora de cierre de la subasta (ISO 8601 o segundos desde epoch) como timestamp"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Hora de cierre inválida: {text}")
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Servidor HTTP de la subasta (búsqueda del catálogo y pujas)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Dirección de escucha (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Puerto (default: {DEFAULT_PORT})")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG,
+                        help=f"Catálogo generado por lot_extract.py (default: {DEFAULT_CATALOG})")
+    parser.add_argument("--bids-log", default=DEFAULT_BIDS_LOG,
+                        help=f"Log de escritura anticipada de las pujas (default: {DEFAULT_BIDS_LOG})")
+    parser.add_argument("--static-dir", default=DEFAULT_STATIC_DIR,
+                        help=f"Imágenes publicadas por publish_images.py (default: {DEFAULT_STATIC_DIR})")
+    parser.add_argument("--pages-archive", default=DEFAULT_PAGES_ARCHIVE,
+                        help=f"Archivo de páginas de page_archive.py (default: {DEFAULT_PAGES_ARCHIVE})")
+    parser.add_argument("--closes-at", type=parse_closing_time, default=None,
+                        help="Cierre de la subasta (ISO 8601, p. ej. 2024-06-04T18:00): los lotes sin "
+                             "ends_at propio dejan de admitir pujas a esa hora")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    server = build_server(args.catalog, args.bids_log, args.closes_at, args.static_dir, args.pages_archive)
+    log_message(f"🌐 Servidor en http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        log_message("🛑 Servidor detenido")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
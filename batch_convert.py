@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Conversión por lotes de varios PDFs sin interacción (para scripts y tareas programadas)
+"""
+
+import os
+import sys
+import copy
+import glob
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pdf_render import (
+    PDF2IMAGE_AVAILABLE,
+    CHUNKS_PER_WORKER,
+    DEFAULT_WINDOW_SIZE,
+    DEFAULT_WORKERS,
+    find_poppler_path,
+    get_page_count,
+    group_page_ranges,
+    page_filename,
+    plan_budget_dpi,
+    render_chunk,
+    split_page_ranges,
+)
+from page_pipeline import DEFAULT_ENCODERS, StageStats
+from page_cache import invalidate_manifest, plan_incremental
+from page_variants import parse_variants, variant_filename, write_variants_manifest
+from conversion_metrics import METRIC_FORMATS, metrics_format_for, write_metrics
+from page_dedupe import NUMPY_AVAILABLE, finish_dedupe, index_manager
+from page_budget import parse_budget, write_budget_manifest
+from page_journal import PageJournal, journal_key
+from page_archive import pack_pages
+from job_queue import SHARD_PAGES, submit_job
+
+# Plantilla por defecto de la carpeta de salida de cada PDF
+DEFAULT_OUTPUT_TEMPLATE = "auction_images/{stem}"
+
+def log_message(message):
+    """Imprimir mensaje con timestamp (por stderr, para no mezclarse con el resumen JSON)"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+
+def expand_inputs(patterns):
+    """Expandir rutas y patrones glob a una lista de PDFs sin duplicados"""
+    pdf_paths = []
+    for pattern in patterns:
+        pdf_paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+    return unique_inputs(pdf_paths)
+
+def output_dir_for(template, pdf_path):
+    """Carpeta de salida de un PDF a partir de la plantilla ({stem}, {name}, {parent})"""
+    pdf_path = Path(pdf_path)
+    return Path(template.format(stem=pdf_path.stem, name=pdf_path.name, parent=pdf_path.parent))
+
+def unique_inputs(pdf_paths):
+    """Quitar los PDFs repetidos (la misma ruta escrita de dos formas cuenta una vez)"""
+    unique = {}
+    for path in map(Path, pdf_paths):
+        unique.setdefault(os.path.normcase(str(path.resolve())), path)
+    return list(unique.values())
+
+def check_output_dirs(template, pdf_paths):
+    """
+    Comprobar que cada PDF tiene su propia carpeta de salida
+
+    Con "auction_images/{stem}", a/venta.pdf y b/venta.pdf irían a la misma
+    carpeta y se pisarían las páginas, el manifiesto y el diario.
+
+    Raises:
+        ValueError: Si dos PDFs comparten carpeta (el mensaje los nombra)
+    """
+    owners = {}
+    for pdf_path in pdf_paths:
+        key = os.path.normcase(str(output_dir_for(template, pdf_path).resolve()))
+        owners.setdefault(key, []).append(str(pdf_path))
+    clashes = [f"{output_dir}: {', '.join(paths)}" for output_dir, paths in owners.items() if len(paths) > 1]
+    if clashes:
+        raise ValueError("varios PDFs con la misma carpeta de salida (usar {parent} o {name} en --output): "
+                         + "; ".join(clashes))
+
+def _timed_chunk(*args):
+    """Ejecutar render_chunk registrando cuándo empezó y terminó el bloque"""
+    started = time.time()
+    pages, stats = render_chunk(*args)
+    return pages, stats, started, time.time()
+
+class DocumentJob:
+    """Estado de un PDF dentro del lote"""
+
+    def __init__(self, pdf_path, output_dir):
+        self.pdf_path = Path(pdf_path)
+        self.output_dir = Path(output_dir)
+        self.total_pages = 0
+        self.render_pages = []
+        self.plan = None
+        self.budget = None
+        self.page_sizes = None
+        self.page_dpi = None
+        self.dedupe = None
+        self.skipped = None
+        self.journal = None
+        self.resumed = 0
+        self.archive = None
+        self.pending_chunks = 0
+        self.saved_pages = []
+        self.stats = StageStats()
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    def page_files(self, page_no, prefix, format_type, variants):
+        """Archivos de salida esperados de una página"""
+        if variants:
+            return [self.output_dir / variant_filename(prefix, page_no, variant) for variant in variants]
+        return [self.output_dir / page_filename(prefix, page_no, format_type)]
+
+    def output_files(self, prefix, format_type, variants):
+        """Archivos de salida esperados de todas las páginas del documento"""
+        for page_no in range(1, self.total_pages + 1):
+            yield from self.page_files(page_no, prefix, format_type, variants)
+
+    def summary(self, prefix, format_type, variants):
+        """Resumen del documento para el JSON final"""
+        files = [path for path in self.output_files(prefix, format_type, variants) if path.is_file()]
+        seconds = None
+        if self.started is not None and self.finished is not None:
+            seconds = round(self.finished - self.started, 3)
+        return {
+            "pdf": str(self.pdf_path),
+            "output_dir": str(self.output_dir),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "pages": self.total_pages,
+            "rendered": len(self.saved_pages),
+            "resumed": self.resumed,
+            "archive": str(self.archive["path"]) if self.archive else None,
+            "files": len(files),
+            "bytes": sum(path.stat().st_size for path in files),
+            "seconds": seconds,
+            "skipped": None if self.skipped is None else {
+                "blank": self.skipped["blank"],
+                "duplicates": self.skipped["duplicates"],
+                "bytes_saved": self.skipped["bytes"],
+                "encode_seconds_saved": round(self.skipped["seconds"], 3),
+            },
+            "peak_rss_mb": self.stats.peak_rss_mb,
+            "slowest_pages": [
+                {"page": page_no, "seconds": round(total, 3),
+                 "stages": {stage: round(value, 3) for stage, value in timings.items()}}
+                for page_no, total, timings in self.stats.slowest_pages()
+            ],
+        }
+
+def run_batch(pdf_paths, output_template=DEFAULT_OUTPUT_TEMPLATE, dpi=200, format_type="PNG",
+              prefix="page", workers=DEFAULT_WORKERS, encoders=DEFAULT_ENCODERS,
+              window_size=DEFAULT_WINDOW_SIZE, variants=None, incremental=False, poppler_path=None,
+              metrics_path=None, metrics_format=None, dedupe=False, budget=None, resume=False,
+              archive=False):
+    """
+    Convertir varios PDFs con un único pool de procesos compartido
+
+    Las páginas de todos los documentos se dividen en bloques de tamaño
+    parecido y se envían al mismo pool, empezando por los documentos más
+    grandes, de modo que los PDFs pequeños rellenan los núcleos libres
+    mientras termina el más grande. Con `metrics_path` se exportan las
+    métricas: en JSON lines una ejecución por documento, con sus páginas; en
+    Prometheus el total del lote. Con `dedupe` las páginas en blanco no se
+    guardan y las repetidas dentro de un documento se guardan una sola vez
+    (ver page_dedupe). Con `budget` cada página se renderiza al DPI que la
+    deja en el presupuesto de píxeles o bytes (ver page_budget). Las páginas
+    terminadas se anotan en el diario de cada carpeta (ver page_journal); con
+    `resume` no se renderizan las que el diario da por terminadas y siguen
+    intactas en disco. Con `archive` las páginas de cada documento se
+    empaquetan además en {prefix}.pages (ver page_archive).
+
+    Returns:
+        dict: Resumen del lote (por documento y total) listo para serializar a JSON
+
+    Raises:
+        ValueError: Si dos PDFs irían a la misma carpeta de salida
+    """
+    pdf_paths = unique_inputs(pdf_paths)
+    check_output_dirs(output_template, pdf_paths)
+    batch_start = time.time()
+    # Un índice de páginas vistas por documento, compartido por todos los procesos
+    manager = index_manager() if dedupe else None
+    jobs = []
+    for pdf_path in pdf_paths:
+        job = DocumentJob(pdf_path, output_dir_for(output_template, pdf_path))
+        jobs.append(job)
+        try:
+            if not job.pdf_path.is_file():
+                raise FileNotFoundError(f"PDF no encontrado: {job.pdf_path}")
+
+            job.output_dir.mkdir(parents=True, exist_ok=True)
+            job.total_pages = get_page_count(job.pdf_path, poppler_path=poppler_path)
+            if budget is not None:
+                # Copia por documento: los bytes por píxel se miden en cada PDF
+                job.budget = copy.copy(budget)
+                job.page_sizes, job.page_dpi = plan_budget_dpi(job.pdf_path, job.total_pages, job.budget,
+                                                               format_type, poppler_path=poppler_path)
+            if incremental:
+                job.plan = plan_incremental(job.pdf_path, job.output_dir, job.total_pages,
+                                            budget.key if budget is not None else dpi,
+                                            format_type, prefix, variants=variants)
+                job.plan.apply_reuse()
+                job.render_pages = job.plan.render_pages
+            else:
+                invalidate_manifest(job.output_dir)
+                job.render_pages = list(range(1, job.total_pages + 1))
+            if manager is not None:
+                job.dedupe = manager.DuplicateIndex()
+            else:
+                job.journal = PageJournal(job.output_dir, journal_key(
+                    job.pdf_path, budget.key if budget is not None else dpi, format_type, prefix,
+                    variants)).open(resume)
+            if resume:
+                finished = job.journal.completed_pages(job.render_pages)
+                job.render_pages = [page_no for page_no in job.render_pages if page_no not in finished]
+                job.resumed = len(finished)
+            log_message(f"📄 {job.pdf_path.name}: {job.total_pages} páginas, "
+                        f"{len(job.render_pages)} por renderizar"
+                        + (f", {job.resumed} ya terminadas" if resume else ""))
+        except Exception as e:
+            job.error = str(e)
+            log_message(f"❌ {job.pdf_path.name}: {e}")
+
+    # Repartir todas las páginas en bloques para el pool global
+    total_render = sum(len(job.render_pages) for job in jobs if not job.error)
+    chunk_count = max(1, workers * CHUNKS_PER_WORKER)
+    chunk_size = max(1, -(-total_render // chunk_count))
+    tasks = []
+    for job in sorted(jobs, key=lambda j: -len(j.render_pages)):
+        if job.error:
+            continue
+        pieces = -(-len(job.render_pages) // chunk_size)
+        chunks = split_page_ranges(group_page_ranges(job.render_pages), pieces)
+        job.pending_chunks = len(chunks)
+        tasks.extend((job, start, end) for start, end in chunks)
+        if not chunks:
+            job.started = job.finished = time.time()
+
+    stats = StageStats()
+    stats.set_threads("render", workers)
+    log_message(f"⚙️ {len(jobs)} documentos, {total_render} páginas en {len(tasks)} bloques, "
+                f"{workers} procesos")
+    try:
+        if tasks:
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as executor:
+                futures = {
+                    executor.submit(_timed_chunk, str(job.pdf_path), str(job.output_dir),
+                                    job.page_dpi or dpi, format_type, prefix, window_size,
+                                    poppler_path, encoders, variants, False, job.dedupe,
+                                    budget.max_bytes if budget is not None else None, None,
+                                    start, end): job
+                    for job, start, end in tasks
+                }
+                for future in as_completed(futures):
+                    job = futures[future]
+                    job.pending_chunks -= 1
+                    try:
+                        pages, chunk_stats, started, finished = future.result()
+                    except Exception as e:
+                        job.error = job.error or str(e)
+                        log_message(f"❌ {job.pdf_path.name}: {e}")
+                        continue
+
+                    job.stats.merge(chunk_stats)
+                    # Los números de página se repiten entre documentos: el total solo acumula etapas
+                    stats.merge(dict(chunk_stats, pages={}))
+                    job.saved_pages.extend(page_no for page_no, _ in pages)
+                    if job.journal is not None:
+                        for page_no, _ in pages:
+                            job.journal.record(page_no, job.page_files(page_no, prefix, format_type, variants))
+                    job.started = started if job.started is None else min(job.started, started)
+                    job.finished = finished if job.finished is None else max(job.finished, finished)
+                    if job.pending_chunks == 0 and not job.error:
+                        log_message(f"✅ {job.pdf_path.name}: {len(job.saved_pages)} páginas")
+
+        # Cerrar cada documento: manifiestos de caché, de variantes y de páginas omitidas
+        for job in jobs:
+            if job.error:
+                continue
+            if job.plan is not None:
+                job.plan.finish()
+            if variants:
+                write_variants_manifest(job.output_dir, prefix, job.total_pages, variants,
+                                        job.page_dpi or dpi)
+            if budget is not None:
+                write_budget_manifest(job.output_dir, prefix, job.budget, job.page_sizes, job.page_dpi,
+                                      lambda page_no, job=job: job.page_files(page_no, prefix,
+                                                                              format_type, variants)[0])
+            if job.dedupe is not None:
+                job.skipped = finish_dedupe(
+                    job.dedupe, job.output_dir, prefix, job.stats,
+                    lambda page_no, job=job: job.page_files(page_no, prefix, format_type, variants))
+                log_message(f"🔁 {job.pdf_path.name}: {job.skipped['blank']} páginas en blanco y "
+                            f"{job.skipped['duplicates']} repetidas sin guardar")
+            if archive:
+                job.archive = pack_pages(job.output_dir, prefix, format_type, variants, job.total_pages)
+                log_message(f"🗃️ {job.pdf_path.name}: {job.archive['path'].name} "
+                            f"({job.archive['added']} archivos nuevos o cambiados)")
+    finally:
+        for job in jobs:
+            if job.journal is not None:
+                job.journal.close()
+        if manager is not None:
+            manager.shutdown()
+
+    documents = [job.summary(prefix, format_type, variants) for job in jobs]
+    stages = stats.to_dict()
+    if metrics_path:
+        run = {"dpi": dpi, "format": format_type, "workers": workers, "encoders": encoders}
+        if metrics_format_for(metrics_path, metrics_format) == "jsonl":
+            for job, doc in zip(jobs, documents):
+                write_metrics(metrics_path, job.stats, "jsonl", pdf=doc["pdf"], status=doc["status"],
+                              pages=doc["rendered"], wall_seconds=doc["seconds"] or 0.0, **run)
+        else:
+            write_metrics(metrics_path, stats, "prometheus", pdf="batch",
+                          pages=sum(doc["rendered"] for doc in documents),
+                          wall_seconds=time.time() - batch_start, **run)
+        log_message(f"📈 Métricas escritas en: {metrics_path}")
+    return {
+        "settings": {
+            "dpi": dpi,
+            "format": format_type,
+            "prefix": prefix,
+            "variants": [variant.to_dict() for variant in variants] if variants else None,
+            "workers": workers,
+            "encoders": encoders,
+            "incremental": incremental,
+            "dedupe": dedupe,
+            "resume": resume,
+            "archive": archive,
+            "budget": budget.to_dict() if budget is not None else None,
+        },
+        "documents": documents,
+        "total": {
+            "documents": len(documents),
+            "failed": sum(1 for doc in documents if doc["status"] != "ok"),
+            "pages": sum(doc["pages"] for doc in documents),
+            "rendered": sum(doc["rendered"] for doc in documents),
+            "bytes": sum(doc["bytes"] for doc in documents),
+            "seconds": round(time.time() - batch_start, 3),
+        },
+        "stages": stages["stages"],
+        "peak_rss_mb": stages["peak_rss_mb"],
+    }
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Convertir varios PDFs a imágenes sin interacción, con un pool de procesos compartido")
+    parser.add_argument("inputs", nargs="+", help="PDFs o patrones glob (p. ej. \"catalogs/*.pdf\")")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_TEMPLATE,
+                        help="Plantilla de la carpeta de salida con {stem}, {name} o {parent} "
+                             f"(default: {DEFAULT_OUTPUT_TEMPLATE})")
+    parser.add_argument("--dpi", type=int, default=200, help="Calidad en DPI (default: 200)")
+    parser.add_argument("--format", dest="format_type", default="PNG", type=str.upper,
+                        choices=["PNG", "JPEG", "TIFF"], help="Formato de imagen (default: PNG)")
+    parser.add_argument("--prefix", default="page", help="Prefijo de los archivos (default: page)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos de renderizado compartidos por todos los PDFs (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--encoders", type=int, default=DEFAULT_ENCODERS,
+                        help=f"Hilos de codificación por proceso, 0 = en serie (default: {DEFAULT_ENCODERS})")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW_SIZE,
+                        help=f"Páginas decodificadas en memoria por proceso (default: {DEFAULT_WINDOW_SIZE})")
+    parser.add_argument("--variants", type=parse_variants, default=None,
+                        help="Varias salidas por página, p. ej. \"thumb:webp:320,large:jpeg:1024,full:png\"")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Renderizar solo las páginas que cambiaron desde la última conversión")
+    parser.add_argument("--budget", type=parse_budget, default=None,
+                        help="DPI por página para un presupuesto de píxeles o bytes por página "
+                             "(p. ej. 4mp o 800kb); reemplaza a --dpi")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="No guardar páginas en blanco y guardar una sola vez las páginas repetidas")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar un lote interrumpido sin repetir las páginas ya terminadas")
+    parser.add_argument("--archive", action="store_true",
+                        help="Empaquetar además las páginas de cada documento en un solo archivo {prefix}.pages")
+    parser.add_argument("--queue", default=None,
+                        help="Enviar los PDFs a una cola compartida (job_queue.py) en lugar de convertirlos aquí")
+    parser.add_argument("--shard-pages", type=int, default=SHARD_PAGES,
+                        help=f"Páginas por bloque de la cola (default: {SHARD_PAGES})")
+    parser.add_argument("--summary", default=None,
+                        help="Archivo donde escribir el resumen JSON (default: salida estándar)")
+    parser.add_argument("--metrics", default=None,
+                        help="Archivo de métricas: .jsonl añade una ejecución por PDF, .prom el total del lote")
+    parser.add_argument("--metrics-format", choices=METRIC_FORMATS, default=None,
+                        help="Formato de --metrics (default: según la extensión)")
+    return parser.parse_args(argv)
+
+def submit_batch(args, pdf_paths):
+    """Enviar los PDFs a la cola compartida, cada uno dividido en bloques de páginas"""
+    unsupported = [flag for flag, value in (("--incremental", args.incremental), ("--budget", args.budget),
+                                            ("--dedupe", args.dedupe), ("--resume", args.resume),
+                                            ("--archive", args.archive), ("--metrics", args.metrics))
+                   if value]
+    if unsupported:
+        log_message(f"❌ Error: {', '.join(unsupported)} no se puede combinar con --queue")
+        return 2
+
+    poppler_path = find_poppler_path(Path(__file__).parent)
+    jobs = []
+    for pdf_path in pdf_paths:
+        output_dir = output_dir_for(args.output, pdf_path)
+        try:
+            job_id, pages, shards = submit_job(args.queue, pdf_path, output_dir, args.dpi, args.format_type,
+                                               args.prefix, args.variants, args.shard_pages, poppler_path)
+        except Exception as e:
+            log_message(f"❌ {pdf_path.name}: {e}")
+            jobs.append({"pdf": str(pdf_path), "status": "error", "error": str(e)})
+            continue
+        log_message(f"📥 Trabajo {job_id}: {pdf_path.name}, {pages} páginas en {shards} bloques")
+        jobs.append({"pdf": str(pdf_path), "status": "queued", "job": job_id, "output_dir": str(output_dir),
+                     "pages": pages, "shards": shards})
+
+    text = json.dumps({"queue": args.queue, "jobs": jobs}, indent=2)
+    if args.summary:
+        Path(args.summary).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    log_message(f"📋 {sum(job['status'] == 'queued' for job in jobs)} PDFs en la cola; "
+                f"procesarlos con: python job_queue.py --queue {args.queue} worker")
+    return 1 if any(job["status"] == "error" for job in jobs) else 0
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+
+    if not PDF2IMAGE_AVAILABLE:
+        log_message("❌ Error: pdf2image no está instalado")
+        return 2
+    if args.dedupe and not NUMPY_AVAILABLE:
+        log_message("❌ Error: --dedupe necesita numpy")
+        return 2
+    if args.resume and args.dedupe:
+        log_message("❌ Error: --resume no se puede combinar con --dedupe")
+        return 2
+    if args.budget is not None and args.budget.max_bytes and args.variants:
+        log_message("❌ Error: un presupuesto en bytes no se puede combinar con --variants (usar MP)")
+        return 2
+
+    pdf_paths = expand_inputs(args.inputs)
+    try:
+        check_output_dirs(args.output, pdf_paths)
+    except ValueError as e:
+        log_message(f"❌ Error: {e}")
+        return 2
+    if args.queue:
+        return submit_batch(args, pdf_paths)
+    summary = run_batch(
+        pdf_paths,
+        output_template=args.output,
+        dpi=args.dpi,
+        format_type=args.format_type,
+        prefix=args.prefix,
+        workers=max(1, args.workers),
+        encoders=args.encoders,
+        window_size=max(1, args.window),
+        variants=args.variants,
+        incremental=args.incremental,
+        poppler_path=find_poppler_path(Path(__file__).parent),
+        metrics_path=args.metrics,
+        metrics_format=args.metrics_format,
+        dedupe=args.dedupe,
+        budget=args.budget,
+        resume=args.resume,
+        archive=args.archive,
+    )
+
+    text = json.dumps(summary, indent=2)
+    if args.summary:
+        Path(args.summary).write_text(text + "\n", encoding="utf-8")
+        log_message(f"📋 Resumen escrito en: {args.summary}")
+    else:
+        print(text)
+
+    total = summary["total"]
+    log_message(f"📊 {total['documents']} documentos, {total['rendered']} páginas renderizadas, "
+                f"{total['bytes'] / (1024 * 1024):.2f} MB en {total['seconds']:.1f} s")
+    return 1 if total["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
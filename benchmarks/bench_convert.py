@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmark de conversión con catálogos de subasta sintéticos
+
+Genera catálogos de texto y de fotos de varios tamaños, los convierte con
+convert_pdf_to_images para cada combinación de DPI y formato, y mide páginas
+por segundo, memoria máxima (RSS) y bytes escritos. Cada caso corre en un
+proceso nuevo para que la memoria máxima sea la de ese caso y no la de los
+anteriores.
+
+Uso:
+    python benchmarks/bench_convert.py --quick
+    python benchmarks/bench_convert.py --save-baseline
+    python benchmarks/bench_convert.py            # compara con baseline.json
+"""
+
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import itertools
+import subprocess
+import contextlib
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from pdf_render import DEFAULT_WORKERS
+from page_pipeline import DEFAULT_ENCODERS
+from conversion_metrics import peak_rss_mb
+from synthetic_catalog import SHAPES, generate_catalog
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_WORK_DIR = BENCH_DIR / ".work"
+
+DEFAULT_SHAPES = ["text", "photo"]
+DEFAULT_PAGES = [10, 100, 500]
+DEFAULT_DPIS = [72, 150, 200, 300]
+DEFAULT_FORMATS = ["PNG", "JPEG", "TIFF"]
+
+QUICK_PAGES = [10]
+QUICK_DPIS = [72, 150]
+
+# Variación máxima admitida respecto al baseline antes de considerarla regresión
+DEFAULT_TOLERANCE = 0.15
+RSS_TOLERANCE = 0.20
+BYTES_TOLERANCE = 0.05
+
+def log_message(message):
+    """Imprimir mensaje por stderr (stdout queda para el JSON de los casos)"""
+    print(message, file=sys.stderr, flush=True)
+
+def case_name(shape, pages, dpi, format_type):
+    return f"{shape}-{pages}p-{dpi}dpi-{format_type.lower()}"
+
+def run_case(pdf_path, output_dir, dpi, format_type, workers, encoders):
+    """
+    Convertir un catálogo y medir el resultado (se ejecuta en el proceso hijo)
+
+    Returns:
+        dict: Métricas del caso
+    """
+    from simple_pdf_converter import convert_pdf_to_images
+
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        success = convert_pdf_to_images(str(pdf_path), output_dir=output_dir, dpi=dpi,
+                                        format_type=format_type, workers=workers,
+                                        encoders=encoders)
+    seconds = time.perf_counter() - start
+
+    files = [path for path in output_dir.iterdir() if path.is_file() and not path.name.startswith(".")]
+    result = {
+        "success": bool(success),
+        "seconds": round(seconds, 3),
+        "pages": len(files),
+        "pages_per_sec": round(len(files) / seconds, 3) if seconds > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_bytes": sum(path.stat().st_size for path in files),
+    }
+    shutil.rmtree(output_dir)
+    return result
+
+def _run_case_subprocess(pdf_path, output_dir, dpi, format_type, workers, encoders):
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--run-case", str(pdf_path), str(output_dir),
+        "--dpi", str(dpi), "--formats", format_type,
+        "--workers", str(workers), "--encoders", str(encoders),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip() or f"código de salida {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def catalog_path(work_dir, shape, pages):
+    """Generar (o reutilizar) el catálogo sintético de un tamaño y tipo"""
+    path = Path(work_dir) / "catalogs" / f"{shape}_{pages}.pdf"
+    if not path.is_file():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        log_message(f"📄 Generando catálogo sintético: {path.name}")
+        generate_catalog(path, pages, shape=shape)
+    return path
+
+def run_benchmarks(shapes, page_counts, dpis, formats, workers=DEFAULT_WORKERS,
+                   encoders=DEFAULT_ENCODERS, work_dir=DEFAULT_WORK_DIR):
+    """
+    Ejecutar todos los casos de la matriz
+
+    Returns:
+        dict: Resultados por nombre de caso
+    """
+    results = {}
+    cases = list(itertools.product(shapes, page_counts, dpis, formats))
+    for index, (shape, pages, dpi, format_type) in enumerate(cases, 1):
+        name = case_name(shape, pages, dpi, format_type)
+        pdf_path = catalog_path(work_dir, shape, pages)
+        try:
+            result = _run_case_subprocess(pdf_path, Path(work_dir) / "output" / name, dpi,
+                                          format_type, workers, encoders)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+
+        results[name] = result
+        if result.get("success"):
+            rss = result["peak_rss_mb"]
+            log_message(f"[{index}/{len(cases)}] {name}: {result['pages_per_sec']:.2f} páginas/s, "
+                        f"{rss if rss is not None else '?'} MB RSS, "
+                        f"{result['output_bytes'] / (1024 * 1024):.1f} MB")
+        else:
+            log_message(f"[{index}/{len(cases)}] {name}: ❌ {result.get('error', 'conversión fallida')}")
+    return results
+
+def environment_info(workers, encoders):
+    """Datos de la máquina, para saber si el baseline es comparable"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": DEFAULT_WORKERS,
+        "workers": workers,
+        "encoders": encoders,
+    }
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Comparar los resultados con el baseline
+
+    Una caída de páginas/s mayor que `tolerance`, un aumento de memoria mayor
+    que RSS_TOLERANCE o de bytes de salida mayor que BYTES_TOLERANCE cuenta
+    como regresión, igual que un caso que antes funcionaba y ahora falla.
+
+    Returns:
+        list: Descripción de cada regresión encontrada
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("success"):
+            continue
+        if not result.get("success"):
+            regressions.append(f"{name}: la conversión falló ({result.get('error', 'sin detalle')})")
+            continue
+
+        if result["pages_per_sec"] < base["pages_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['pages_per_sec']:.2f} páginas/s "
+                               f"(baseline {base['pages_per_sec']:.2f})")
+        if (result["peak_rss_mb"] is not None and base.get("peak_rss_mb")
+                and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + RSS_TOLERANCE)):
+            regressions.append(f"{name}: {result['peak_rss_mb']:.1f} MB RSS "
+                               f"(baseline {base['peak_rss_mb']:.1f})")
+        if result["output_bytes"] > base["output_bytes"] * (1 + BYTES_TOLERANCE):
+            regressions.append(f"{name}: {result['output_bytes']} bytes de salida "
+                               f"(baseline {base['output_bytes']})")
+    return regressions
+
+def _int_list(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+def _str_list(text):
+    return [value.strip() for value in text.split(",") if value.strip()]
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Benchmark de conversión con catálogos sintéticos")
+    parser.add_argument("--shapes", type=_str_list, default=DEFAULT_SHAPES,
+                        help=f"Tipos de catálogo: {', '.join(SHAPES)} (default: {','.join(DEFAULT_SHAPES)})")
+    parser.add_argument("--pages", type=_int_list, default=None,
+                        help="Tamaños de catálogo en páginas (default: 10,100,500)")
+    parser.add_argument("--dpi", type=_int_list, default=None, help="DPIs a medir (default: 72,150,200,300)")
+    parser.add_argument("--formats", type=lambda text: [f.upper() for f in _str_list(text)],
+                        default=DEFAULT_FORMATS, help="Formatos a medir (default: PNG,JPEG,TIFF)")
+    parser.add_argument("--quick", action="store_true",
+                        help="Solo catálogos de 10 páginas a 72 y 150 DPI")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos de renderizado (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--encoders", type=int, default=DEFAULT_ENCODERS,
+                        help=f"Hilos de codificación por proceso (default: {DEFAULT_ENCODERS})")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE,
+                        help="Archivo de baseline (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Guardar los resultados como nuevo baseline en lugar de comparar")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Caída de páginas/s admitida (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--output", type=Path, default=None, help="Escribir los resultados en un JSON")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR,
+                        help="Carpeta para catálogos generados y salidas temporales")
+    parser.add_argument("--run-case", nargs=2, metavar=("PDF", "OUTPUT"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+
+    if args.run_case:
+        pdf_path, output_dir = args.run_case
+        result = run_case(pdf_path, output_dir, args.dpi[0], args.formats[0], args.workers, args.encoders)
+        print(json.dumps(result))
+        return 0
+
+    unknown = [shape for shape in args.shapes if shape not in SHAPES]
+    if unknown:
+        log_message(f"❌ Tipos de catálogo desconocidos: {', '.join(unknown)}")
+        return 2
+
+    page_counts = args.pages or (QUICK_PAGES if args.quick else DEFAULT_PAGES)
+    dpis = args.dpi or (QUICK_DPIS if args.quick else DEFAULT_DPIS)
+    results = run_benchmarks(args.shapes, page_counts, dpis, args.formats, workers=args.workers,
+                             encoders=args.encoders, work_dir=args.work_dir)
+    report = {"environment": environment_info(args.workers, args.encoders), "results": results}
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        log_message(f"📋 Resultados escritos en: {args.output}")
+
+    if args.save_baseline:
+        baseline = {"environment": report["environment"], "results": {}}
+        if args.baseline.is_file():
+            baseline["results"] = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+        baseline["results"].update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        log_message(f"💾 Baseline guardado en: {args.baseline}")
+        return 0
+
+    if not args.baseline.is_file():
+        log_message(f"⚠️ No hay baseline en {args.baseline}; usar --save-baseline para crearlo")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("environment", {}).get("cpu_count") != report["environment"]["cpu_count"]:
+        log_message("⚠️ El baseline se midió en una máquina con otro número de núcleos")
+
+    regressions = compare_with_baseline(results, baseline.get("results", {}), tolerance=args.tolerance)
+    if regressions:
+        log_message(f"❌ {len(regressions)} regresiones respecto al baseline:")
+        for line in regressions:
+            log_message(f"   - {line}")
+        return 1
+
+    failed = [name for name, result in results.items() if not result.get("success")]
+    if failed:
+        log_message(f"❌ {len(failed)} casos fallaron: {', '.join(failed)}")
+        return 1
+
+    log_message(f"✅ Sin regresiones en {len(results)} casos")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Generador de catálogos de subasta sintéticos en PDF para benchmarks
+
+Escribe el PDF directamente (sin dependencias aparte de Pillow para las fotos)
+con tres tipos de página:
+    text   - listado de lotes en texto, como las páginas de condiciones
+    photo  - cuadrícula 2x2 de fotos JPEG con un pie por lote
+    mixed  - alterna páginas de texto y de fotos
+"""
+
+import io
+import sys
+import zlib
+import random
+import argparse
+from pathlib import Path
+
+from PIL import Image
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+SHAPES = ("text", "photo", "mixed")
+
+MAKES = [
+    ("TOYOTA", ["CAMRY", "COROLLA", "LAND CRUISER", "HILUX"]),
+    ("NISSAN", ["PATROL", "ALTIMA", "SUNNY"]),
+    ("HONDA", ["CIVIC", "ACCORD", "CR-V"]),
+    ("FORD", ["F-150", "EXPLORER", "MUSTANG"]),
+    ("CHEVROLET", ["MALIBU", "TAHOE", "SILVERADO"]),
+    ("MITSUBISHI", ["PAJERO", "LANCER"]),
+]
+
+# Fotos distintas que se generan y se reutilizan entre páginas
+PHOTO_POOL_SIZE = 12
+PHOTO_SIZE = (800, 600)
+
+class PdfWriter:
+    """Escritor mínimo de PDF: objetos numerados, xref y trailer"""
+
+    def __init__(self):
+        self.objects = []
+
+    def reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, number, data):
+        self.objects[number - 1] = data
+
+    def add(self, data):
+        number = self.reserve()
+        self.set(number, data)
+        return number
+
+    def add_stream(self, dictionary, payload):
+        header = f"<< {dictionary} /Length {len(payload)} >>\nstream\n".encode("latin-1")
+        return self.add(header + payload + b"\nendstream")
+
+    def write(self, path, root):
+        output = io.BytesIO()
+        output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, data in enumerate(self.objects, 1):
+            offsets.append(output.tell())
+            if isinstance(data, str):
+                data = data.encode("latin-1")
+            output.write(f"{number} 0 obj\n".encode("ascii") + data + b"\nendobj\n")
+
+        xref = output.tell()
+        output.write(f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode("ascii"))
+        for offset in offsets:
+            output.write(f"{offset:010d} 00000 n \n".encode("ascii"))
+        output.write(f"trailer\n<< /Size {len(self.objects) + 1} /Root {root} 0 R >>\n"
+                     f"startxref\n{xref}\n%%EOF\n".encode("ascii"))
+        Path(path).write_bytes(output.getvalue())
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _lot_line(rng, lot_no):
+    make, models = rng.choice(MAKES)
+    model = rng.choice(models)
+    year = rng.randint(2008, 2024)
+    mileage = rng.randint(5, 250) * 1000
+    price = rng.randint(8, 180) * 500
+    return f"LOT {lot_no}  {year} {make} {model}  {mileage:,} KM  AED {price:,}"
+
+def _make_photo(rng):
+    """Foto sintética: ruido y degradados, que comprime como una foto real"""
+    width, height = PHOTO_SIZE
+    noise = Image.effect_noise((width, height), rng.uniform(20, 60))
+    gradient = Image.linear_gradient("L").resize((width, height)).rotate(rng.choice([0, 90, 180, 270]))
+    blend = Image.blend(noise, gradient, rng.uniform(0.3, 0.7))
+    photo = Image.merge("RGB", (gradient, blend, noise))
+    buffer = io.BytesIO()
+    photo.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+def _text_content(rng, first_lot, lines=38):
+    ops = ["BT", "/F1 11 Tf", "14 TL", f"50 {PAGE_HEIGHT - 60} Td"]
+    ops.append("/F2 16 Tf (AUCTION CATALOG - VEHICLE LIST) Tj T* T* /F1 11 Tf")
+    for index in range(lines):
+        ops.append(f"({_escape(_lot_line(rng, first_lot + index))}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1"), first_lot + lines
+
+def _photo_content(rng, first_lot, photo_names):
+    ops = []
+    cell_width, cell_height = 240, 180
+    positions = [(50, 480), (305, 480), (50, 180), (305, 180)]
+    for index, (x, y) in enumerate(positions):
+        name = rng.choice(photo_names)
+        ops.append(f"q {cell_width} 0 0 {cell_height} {x} {y} cm /{name} Do Q")
+        ops.append(f"BT /F1 9 Tf {x} {y - 14} Td ({_escape(_lot_line(rng, first_lot + index))}) Tj ET")
+    return "\n".join(ops).encode("latin-1"), first_lot + len(positions)
+
+def generate_catalog(path, pages, shape="mixed", seed=0):
+    """
+    Escribir un catálogo sintético
+
+    Args:
+        path (str): Ruta del PDF a crear
+        pages (int): Número de páginas
+        shape (str): text, photo o mixed
+        seed (int): Semilla para obtener siempre el mismo PDF
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Tipo de catálogo desconocido: {shape}")
+
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    catalog = writer.reserve()
+    pages_root = writer.reserve()
+    font_regular = writer.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    font_bold = writer.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>")
+
+    photos = {}
+    if shape != "text":
+        for index in range(PHOTO_POOL_SIZE):
+            width, height = PHOTO_SIZE
+            photos[f"Im{index}"] = writer.add_stream(
+                f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode",
+                _make_photo(rng),
+            )
+
+    page_refs = []
+    lot_no = 1
+    for page_index in range(pages):
+        is_photo = shape == "photo" or (shape == "mixed" and page_index % 2 == 1)
+        if is_photo:
+            content, lot_no = _photo_content(rng, lot_no, sorted(photos))
+            xobjects = " ".join(f"/{name} {ref} 0 R" for name, ref in sorted(photos.items()))
+            resources = f"/Font << /F1 {font_regular} 0 R /F2 {font_bold} 0 R >> /XObject << {xobjects} >>"
+        else:
+            content, lot_no = _text_content(rng, lot_no)
+            resources = f"/Font << /F1 {font_regular} 0 R /F2 {font_bold} 0 R >>"
+
+        content_ref = writer.add_stream("/Filter /FlateDecode", zlib.compress(content))
+        page_refs.append(writer.add(
+            f"<< /Type /Page /Parent {pages_root} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << {resources} >> /Contents {content_ref} 0 R >>"
+        ))
+
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs)
+    writer.set(pages_root, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>")
+    writer.set(catalog, f"<< /Type /Catalog /Pages {pages_root} 0 R >>")
+    writer.write(path, catalog)
+    return Path(path)
+
+def main(argv=None):
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Generar un catálogo de subasta sintético en PDF")
+    parser.add_argument("output", help="Ruta del PDF a crear")
+    parser.add_argument("--pages", type=int, default=10, help="Número de páginas (default: 10)")
+    parser.add_argument("--shape", choices=SHAPES, default="mixed", help="Tipo de páginas (default: mixed)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla aleatoria (default: 0)")
+    args = parser.parse_args(argv)
+
+    path = generate_catalog(args.output, args.pages, shape=args.shape, seed=args.seed)
+    print(f"📄 Catálogo sintético: {path} ({args.pages} páginas, {args.shape})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
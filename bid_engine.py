@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Motor de pujas asyncio con libro en memoria por lote y log de escritura anticipada (WAL)
+"""
+
+import os
+import json
+import math
+import time
+import zlib
+import asyncio
+from pathlib import Path
+from datetime import datetime
+
+# Incremento mínimo sobre la puja actual (la misma regla que la web: minBid = puja + 500)
+DEFAULT_MIN_INCREMENT = 500
+
+# Espera máxima para agrupar pujas en un mismo fsync y tamaño máximo del grupo
+DEFAULT_COMMIT_DELAY = 0.002
+DEFAULT_MAX_BATCH = 4096
+
+SNAPSHOT_SUFFIX = ".snapshot"
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+class BidRejected(Exception):
+    """Puja rechazada por las reglas del lote"""
+
+    def __init__(self, reason, book=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.book = book
+
+class LotBook:
+    """
+    Estado de las pujas de un lote
+
+    Attributes:
+        lot (int): Número de lote
+        current_bid (int): Puja más alta (o precio de salida si no hay pujas)
+        leader (str): Pujador con la puja más alta (None si no hay pujas)
+        bids (int): Pujas aceptadas
+        min_increment (int): Incremento mínimo sobre la puja actual
+        seq (int): Secuencia del WAL de la última puja aceptada
+        closed (bool): Si el lote ya no admite pujas
+    """
+
+    def __init__(self, lot, starting_price, min_increment=DEFAULT_MIN_INCREMENT):
+        self.lot = lot
+        self.current_bid = starting_price
+        self.leader = None
+        self.bids = 0
+        self.min_increment = min_increment
+        self.seq = 0
+        self.updated = None
+        self.closed = False
+
+    @property
+    def min_bid(self):
+        return self.current_bid + self.min_increment
+
+    def check(self, bidder, amount):
+        """Validar una puja sin aplicarla (lanza BidRejected)"""
+        if self.closed:
+            raise BidRejected("Lote cerrado", self)
+        if not math.isfinite(amount):
+            raise BidRejected("La puja debe ser un número finito", self)
+        if amount < self.min_bid:
+            raise BidRejected(f"La puja mínima es {self.min_bid}", self)
+
+    def apply(self, bidder, amount, seq, timestamp):
+        self.current_bid = amount
+        self.leader = bidder
+        self.bids += 1
+        self.seq = seq
+        self.updated = timestamp
+
+    def to_dict(self):
+        return {
+            "lot": self.lot,
+            "current_bid": self.current_bid,
+            "min_bid": self.min_bid,
+            "min_increment": self.min_increment,
+            "leader": self.leader,
+            "bids": self.bids,
+            "seq": self.seq,
+            "updated": self.updated,
+            "closed": self.closed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        book = cls(data["lot"], data["current_bid"], data.get("min_increment", DEFAULT_MIN_INCREMENT))
+        book.leader = data.get("leader")
+        book.bids = data.get("bids", 0)
+        book.seq = data.get("seq", 0)
+        book.updated = data.get("updated")
+        book.closed = data.get("closed", False)
+        return book
+
+def encode_record(record):
+    """Línea del WAL: CRC32 del JSON seguido del JSON (detecta líneas a medio escribir)"""
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+def decode_record(line):
+    """Leer una línea del WAL; None si está incompleta o dañada"""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+class BidEngine:
+    """
+    Motor de pujas con confirmación en grupo
+
+    Cada puja se valida y se aplica al libro de su lote sin ceder el control
+    del bucle de eventos, así que dos pujas que compiten nunca se intercalan.
+    La puja aceptada se añade al lote de escritura pendiente y `place_bid`
+    espera a que ese lote se escriba y sincronice (fsync) antes de
+    confirmarla. Un único escritor vuelca todas las pujas acumuladas con una
+    sola escritura y un solo fsync, que corre en un hilo aparte mientras el
+    bucle sigue aceptando las pujas del siguiente grupo.
+
+    Al arrancar se carga la última instantánea (si existe) y se reproducen
+    las pujas del WAL posteriores a ella. Una línea final incompleta (caída
+    a mitad de escritura) se descarta y el archivo se trunca en ese punto.
+    """
+
+    def __init__(self, wal_path, lot_lookup=None, min_increment=DEFAULT_MIN_INCREMENT,
+                 commit_delay=DEFAULT_COMMIT_DELAY, max_batch=DEFAULT_MAX_BATCH):
+        self.wal_path = Path(wal_path)
+        self.snapshot_path = self.wal_path.with_name(self.wal_path.name + SNAPSHOT_SUFFIX)
+        self.lot_lookup = lot_lookup
+        self.min_increment = min_increment
+        self.commit_delay = commit_delay
+        self.max_batch = max_batch
+        self.books = {}
+        self.seq = 0
+        self.listeners = []
+        self.stats = {"accepted": 0, "rejected": 0, "commits": 0, "fsync_seconds": 0.0}
+
+        self._file = None
+        self._pending = []
+        self._wakeup = None
+        self._writer_task = None
+        self._commit_lock = None
+        self._stopping = False
+        self._failed = None
+
+    # --- Recuperación -------------------------------------------------------
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return
+        self.seq = snapshot.get("seq", 0)
+        for data in snapshot.get("books", []):
+            book = LotBook.from_dict(data)
+            self.books[book.lot] = book
+
+    def replay(self):
+        """
+        Reconstruir los libros desde la instantánea y el WAL
+
+        Returns:
+            int: Pujas reproducidas desde el WAL
+        """
+        self.books.clear()
+        self.seq = 0
+        self._load_snapshot()
+        if not self.wal_path.exists():
+            return 0
+
+        replayed = 0
+        valid_bytes = 0
+        with open(self.wal_path, "rb") as file:
+            for line in file:
+                record = decode_record(line)
+                if record is None:
+                    break
+                valid_bytes += len(line)
+                if record["seq"] <= self.seq:
+                    continue
+                self._apply_record(record)
+                replayed += 1
+
+        if valid_bytes < self.wal_path.stat().st_size:
+            with open(self.wal_path, "r+b") as file:
+                file.truncate(valid_bytes)
+        return replayed
+
+    def _apply_record(self, record):
+        kind = record.get("type", "bid")
+        book = self.books.get(record["lot"])
+        if book is None:
+            book = LotBook(record["lot"], record.get("start", 0), record.get("inc", self.min_increment))
+            self.books[record["lot"]] = book
+        if kind == "bid":
+            book.apply(record["bidder"], record["amount"], record["seq"], record["ts"])
+        elif kind == "close":
+            book.closed = True
+            book.seq = record["seq"]
+        self.seq = max(self.seq, record["seq"])
+
+    # --- Ciclo de vida --------------------------------------------------------
+
+    async def start(self):
+        """Reproducir el WAL y arrancar el escritor en grupo"""
+        self.wal_path.parent.mkdir(parents=True, exist_ok=True)
+        replayed = self.replay()
+        self._file = open(self.wal_path, "ab")
+        self._wakeup = asyncio.Event()
+        self._commit_lock = asyncio.Lock()
+        self._writer_task = asyncio.create_task(self._writer())
+        return replayed
+
+    async def stop(self):
+        """Escribir las pujas pendientes y cerrar el WAL"""
+        if self._writer_task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._writer_task
+            self._writer_task = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Pujas ----------------------------------------------------------------
+
+    def book(self, lot):
+        """Libro de un lote, creado con su precio de salida la primera vez (None si no existe)"""
+        book = self.books.get(lot)
+        if book is None and self.lot_lookup is not None:
+            starting_price = self.lot_lookup(lot)
+            if starting_price is not None:
+                book = LotBook(lot, starting_price, self.min_increment)
+                self.books[lot] = book
+        return book
+
+    async def place_bid(self, lot, bidder, amount):
+        """
+        Pujar por un lote
+
+        La comprobación y la actualización del libro son atómicas respecto a
+        las demás pujas; la confirmación espera al fsync del grupo.
+
+        Returns:
+            dict: Estado del lote tras la puja
+
+        Raises:
+            BidRejected: Si la puja no cumple el incremento mínimo o el lote no existe o está cerrado
+        """
+        if self._failed is not None:
+            raise self._failed
+        book = self.book(lot)
+        if book is None:
+            self.stats["rejected"] += 1
+            raise BidRejected("Lote desconocido")
+        try:
+            book.check(bidder, amount)
+        except BidRejected:
+            self.stats["rejected"] += 1
+            raise
+
+        self.seq += 1
+        timestamp = time.time()
+        record = {"seq": self.seq, "type": "bid", "lot": lot, "bidder": bidder, "amount": amount,
+                  "ts": timestamp, "start": book.current_bid if book.bids == 0 else None,
+                  "inc": book.min_increment}
+        if record["start"] is None:
+            del record["start"]
+        book.apply(bidder, amount, self.seq, timestamp)
+        self.stats["accepted"] += 1
+
+        state = book.to_dict()
+        await self._enqueue(record)
+        for listener in self.listeners:
+            listener(state)
+        return state
+
+    async def close_lot(self, lot):
+        """Cerrar un lote: a partir de aquí se rechazan sus pujas"""
+        if self._failed is not None:
+            raise self._failed
+        book = self.book(lot)
+        if book is None:
+            raise BidRejected("Lote desconocido")
+        if book.closed:
+            return book.to_dict()
+        self.seq += 1
+        book.closed = True
+        book.seq = self.seq
+        record = {"seq": self.seq, "type": "close", "lot": lot, "ts": time.time(),
+                  "start": book.current_bid, "inc": book.min_increment}
+        state = book.to_dict()
+        await self._enqueue(record)
+        for listener in self.listeners:
+            listener(state)
+        return state
+
+    # --- Escritura en grupo ---------------------------------------------------
+
+    async def _enqueue(self, record):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((encode_record(record), future))
+        self._wakeup.set()
+        await future
+
+    def _take_batch(self):
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        return batch
+
+    async def _writer(self):
+        while not (self._stopping and not self._pending):
+            await self._wakeup.wait()
+            # Dejar que lleguen más pujas para repartir el coste del fsync
+            if self.commit_delay:
+                await asyncio.sleep(self.commit_delay)
+            batch = self._take_batch()
+            if not self._pending:
+                self._wakeup.clear()
+            if batch:
+                await self._commit(batch)
+
+    def _write_and_sync(self, data):
+        start = time.perf_counter()
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return time.perf_counter() - start
+
+    async def _commit(self, batch):
+        data = b"".join(line for line, _ in batch)
+        try:
+            async with self._commit_lock:
+                seconds = await asyncio.get_running_loop().run_in_executor(None, self._write_and_sync, data)
+        except OSError as e:
+            # Sin WAL no se pueden aceptar más pujas: el estado en memoria ya no es durable
+            self._failed = e
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["commits"] += 1
+        self.stats["fsync_seconds"] += seconds
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    # --- Instantáneas ---------------------------------------------------------
+
+    async def checkpoint(self):
+        """
+        Guardar una instantánea de todos los libros y vaciar el WAL
+
+        Acota el tiempo de recuperación: tras la instantánea solo se
+        reproducen las pujas nuevas. La instantánea se serializa en el bucle
+        de eventos (las pujas siguen creando libros mientras tanto) y el hilo
+        solo escribe los bytes.
+        """
+        while self._pending:
+            await self._commit(self._take_batch())
+
+        async with self._commit_lock:
+            seq = self.seq
+            books = [book.to_dict() for book in self.books.values()]
+            data = json.dumps({"seq": seq, "books": books}, separators=(",", ":")).encode("utf-8")
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, data)
+        log_message(f"💾 Instantánea de pujas guardada: {len(books)} lotes, seq {seq}")
+
+    def _write_snapshot(self, data):
+        temp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(temp_path, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+        # Las pujas del WAL ya están en la instantánea (seq <= snapshot.seq) y
+        # las posteriores esperan en _pending a que se suelte el lock
+        self._file.close()
+        self._file = open(self.wal_path, "wb")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Versiones del catálogo para sincronización incremental (?since=<versión>)
+"""
+
+import time
+from bisect import bisect_right
+
+# Tamaño de página por defecto y máximo de una respuesta incremental
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+def initial_version():
+    """
+    Versión de partida: microsegundos desde epoch
+
+    Así la primera versión de un arranque es mayor que cualquier versión
+    emitida antes del reinicio (salvo que se emitiera más de un cambio por
+    microsegundo), y un cliente que vuelve con un `since` antiguo recibe
+    todos los lotes de nuevo en lugar de perder cambios.
+    """
+    return int(time.time() * 1_000_000)
+
+class CatalogFeed:
+    """
+    Registro de la versión en que cambió cada lote
+
+    Cada cambio (lote nuevo, modificado, retirado o con una puja nueva)
+    recibe una versión propia y creciente. `changes` es la lista de
+    (versión, lote) en orden; un lote que cambia varias veces deja entradas
+    antiguas que se ignoran (solo cuenta la de `lot_versions`) y se
+    compactan cuando ocupan más que las vigentes.
+    """
+
+    def __init__(self, lots=()):
+        self.version = self.base_version = initial_version()
+        self.lot_versions = {}
+        self.removed = set()
+        self.changes = []
+        self._fingerprints = {}
+        self.update_catalog(lots)
+
+    def touch(self, lot):
+        """Marcar un lote como cambiado y devolver la nueva versión del catálogo"""
+        self.version += 1
+        self.lot_versions[lot] = self.version
+        self.changes.append((self.version, lot))
+        if len(self.changes) > 2 * len(self.lot_versions) + 1024:
+            self._compact()
+        return self.version
+
+    def update_catalog(self, lots):
+        """
+        Comparar un catálogo recién cargado con el anterior
+
+        Returns:
+            int: Lotes nuevos, modificados o retirados
+        """
+        fingerprints = {lot["lot"]: lot for lot in lots if lot.get("lot") is not None}
+        changed = [number for number, lot in fingerprints.items() if self._fingerprints.get(number) != lot]
+        gone = [number for number in self._fingerprints if number not in fingerprints]
+
+        for number in changed:
+            self.removed.discard(number)
+            self.touch(number)
+        for number in gone:
+            self.removed.add(number)
+            self.touch(number)
+        self._fingerprints = fingerprints
+        return len(changed) + len(gone)
+
+    def _compact(self):
+        self.changes = sorted((version, lot) for lot, version in self.lot_versions.items())
+
+    def needs_reset(self, since):
+        """Si un `since` no sirve para un delta (de antes del arranque o de otro servidor)"""
+        return since != 0 and not self.base_version <= since <= self.version
+
+    def changed_since(self, since=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Lotes cambiados después de `since`, en orden de versión
+
+        Returns:
+            tuple: (lista de (versión, lote), cursor de la página siguiente o None)
+        """
+        page = []
+        position = bisect_right(self.changes, (since, float("inf")))
+        while position < len(self.changes):
+            version, lot = self.changes[position]
+            position += 1
+            if self.lot_versions.get(lot) != version:
+                continue
+            # Un cliente que empieza de cero no necesita los lotes ya retirados
+            if since == 0 and lot in self.removed:
+                continue
+            if len(page) == limit:
+                return page, page[-1][0]
+            page.append((version, lot))
+        return page, None
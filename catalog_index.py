@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Índice en memoria del catálogo de lotes: búsqueda por prefijo, filtros por rango y facetas
+"""
+
+import re
+import json
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+# Rangos de precio del filtro de la web (valor del <select> -> (mínimo exclusivo, máximo inclusivo))
+PRICE_BUCKETS = {
+    "0-5000": (None, 5000),
+    "5000-10000": (5000, 10000),
+    "10000-20000": (10000, 20000),
+    "20000+": (20000, None),
+}
+
+# Los prefijos de hasta esta longitud tienen su conjunto de resultados precalculado
+PREFIX_CACHE_LENGTH = 3
+
+# Tamaño de bloque de los índices ordenados (ver SortedBitmapIndex)
+BLOCK_SIZE = 64
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+(?:-[0-9a-z]+)*")
+
+def tokenize(text):
+    """Palabras en minúsculas de un texto ("F-150" se conserva como un solo token)"""
+    return _TOKEN_RE.findall(str(text).lower())
+
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def iter_bits(mask):
+    """Posiciones de los bits activos de un entero, de menor a mayor"""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+def bit_count(mask):
+    """Número de bits activos de un entero (int.bit_count() necesita Python 3.10)"""
+    return bin(mask).count("1")
+
+class SortedBitmapIndex:
+    """
+    Índice ordenado de un valor numérico para filtros por rango
+
+    Los documentos se ordenan por valor y se agrupan en bloques de BLOCK_SIZE.
+    Para cada frontera de bloque se guarda el bitmap acumulado de todos los
+    documentos anteriores, de modo que un rango cualquiera se resuelve con un
+    XOR de dos bitmaps más, como mucho, dos bloques parciales.
+    """
+
+    def __init__(self, values):
+        pairs = sorted((value, doc_id) for doc_id, value in enumerate(values) if value is not None)
+        self.values = [value for value, _ in pairs]
+        self.doc_ids = [doc_id for _, doc_id in pairs]
+        self.cumulative = [0]
+        mask = 0
+        for start in range(0, len(pairs), BLOCK_SIZE):
+            for doc_id in self.doc_ids[start:start + BLOCK_SIZE]:
+                mask |= 1 << doc_id
+            self.cumulative.append(mask)
+
+    def _prefix_mask(self, position):
+        """Bitmap de los `position` primeros documentos en orden de valor"""
+        block, extra = divmod(position, BLOCK_SIZE)
+        mask = self.cumulative[block]
+        for doc_id in self.doc_ids[block * BLOCK_SIZE:block * BLOCK_SIZE + extra]:
+            mask |= 1 << doc_id
+        return mask
+
+    def range_mask(self, low=None, high=None, low_inclusive=True):
+        """Bitmap de los documentos con low <= valor <= high (None = sin límite)"""
+        start = 0
+        if low is not None:
+            start = (bisect_left if low_inclusive else bisect_right)(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        if end <= start:
+            return 0
+        return self._prefix_mask(end) ^ self._prefix_mask(start)
+
+class CatalogIndex:
+    """
+    Índice del catálogo de lotes
+
+    Cada lote recibe un identificador interno (su posición en orden de número
+    de lote) y cada término, marca, año o rango de precio se representa como
+    un bitmap (un int de Python) con un bit por lote. Una búsqueda es una
+    serie de AND entre bitmaps y las facetas son recuentos de bits
+    (`bit_count(resultado & faceta)`), así que ni la búsqueda ni las
+    facetas recorren los lotes uno a uno.
+
+    Acepta tanto lotes de lot_extract (make, starting_price) como los coches
+    de ejemplo de la web (brand, currentBid, specs).
+    """
+
+    def __init__(self, lots):
+        self.lots = sorted(lots, key=lambda lot: (lot.get("lot", lot.get("id")) is None,
+                                                  lot.get("lot", lot.get("id")) or 0))
+        self.all_mask = (1 << len(self.lots)) - 1
+        self.postings = {}
+        self.brands = {}
+        self.brand_names = {}
+        self.years = {}
+        self.by_lot = {}
+
+        prices = []
+        years = []
+        for doc_id, lot in enumerate(self.lots):
+            bit = 1 << doc_id
+            if lot.get("lot", lot.get("id")) is not None:
+                self.by_lot[lot.get("lot", lot.get("id"))] = doc_id
+            brand = self.brand_of(lot)
+            if brand:
+                key = brand.lower()
+                self.brands[key] = self.brands.get(key, 0) | bit
+                self.brand_names.setdefault(key, brand)
+            year = lot.get("year") or None
+            if year:
+                self.years[year] = self.years.get(year, 0) | bit
+            prices.append(self.price_of(lot))
+            years.append(year)
+
+            for token in set(self._document_tokens(lot)):
+                self.postings[token] = self.postings.get(token, 0) | bit
+
+        self.terms = sorted(self.postings)
+        self.prices = SortedBitmapIndex(prices)
+        self.year_index = SortedBitmapIndex(years)
+        self.sorted_brands = sorted(self.brand_names)
+        self.price_buckets = {
+            name: self.prices.range_mask(low, high, low_inclusive=False)
+            for name, (low, high) in PRICE_BUCKETS.items()
+        }
+
+        # Prefijos cortos precalculados: la escritura de las primeras letras no recorre términos
+        self.prefixes = {}
+        for term in self.terms:
+            for length in range(1, min(PREFIX_CACHE_LENGTH, len(term)) + 1):
+                prefix = term[:length]
+                self.prefixes[prefix] = self.prefixes.get(prefix, 0) | self.postings[term]
+
+        self.facet_cache = self._facets(self.all_mask)
+
+    @classmethod
+    def from_file(cls, catalog_path):
+        """Crear el índice desde catalog.json (lot_extract)"""
+        with open(catalog_path, "r", encoding="utf-8") as file:
+            catalog = json.load(file)
+        return cls(catalog.get("lots", []))
+
+    @staticmethod
+    def brand_of(lot):
+        return lot.get("make") or lot.get("brand")
+
+    @staticmethod
+    def price_of(lot):
+        price = lot.get("current_bid", lot.get("currentBid", lot.get("starting_price")))
+        return price if isinstance(price, (int, float)) else None
+
+    def get_lot(self, number):
+        """Lote por su número (None si no está en el catálogo)"""
+        doc_id = self.by_lot.get(number)
+        return None if doc_id is None else self.lots[doc_id]
+
+    def _document_tokens(self, lot):
+        fields = [lot.get("title"), self.brand_of(lot), lot.get("model"), lot.get("year")]
+        fields.extend(f"{key} {value}" for key, value in (lot.get("specs") or {}).items())
+        for field in fields:
+            if field:
+                yield from tokenize(field)
+        if lot.get("lot") is not None:
+            yield str(lot["lot"])
+
+    def _prefix_mask(self, prefix):
+        """Bitmap de los lotes con algún término que empieza por `prefix`"""
+        if len(prefix) <= PREFIX_CACHE_LENGTH:
+            return self.prefixes.get(prefix, 0)
+        mask = 0
+        position = bisect_left(self.terms, prefix)
+        while position < len(self.terms) and self.terms[position].startswith(prefix):
+            mask |= self.postings[self.terms[position]]
+            position += 1
+        return mask
+
+    def text_mask(self, query):
+        """
+        Bitmap de los lotes que contienen todas las palabras de la consulta
+
+        La última palabra se trata como prefijo (búsqueda mientras se escribe);
+        las anteriores deben coincidir completas.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return self.all_mask
+        mask = self.all_mask
+        for token in tokens[:-1]:
+            mask &= self.postings.get(token, 0)
+            if not mask:
+                return 0
+        return mask & self._prefix_mask(tokens[-1])
+
+    def filter_mask(self, query="", brand=None, price=None, price_min=None, price_max=None,
+                    year_min=None, year_max=None):
+        """Combinar texto, marca, rango de precio (o bucket del <select>) y rango de años"""
+        mask = self.text_mask(query) if query else self.all_mask
+        if brand:
+            mask &= self.brands.get(brand.lower(), 0)
+        if price:
+            mask &= self.price_buckets.get(price, 0)
+        if price_min is not None or price_max is not None:
+            mask &= self.prices.range_mask(price_min, price_max)
+        if year_min is not None or year_max is not None:
+            mask &= self.year_index.range_mask(year_min, year_max)
+        return mask
+
+    def _facets(self, mask):
+        def count(bitmap):
+            return bit_count(mask & bitmap)
+
+        brands = {self.brand_names[key]: count(bitmap) for key, bitmap in self.brands.items()}
+        years = {year: count(bitmap) for year, bitmap in self.years.items()}
+        return {
+            "brand": {name: n for name, n in sorted(brands.items(), key=lambda item: (-item[1], item[0])) if n},
+            "year": {str(year): n for year, n in sorted(years.items(), reverse=True) if n},
+            "price": {name: count(bitmap) for name, bitmap in self.price_buckets.items()},
+        }
+
+    def facets(self, mask=None):
+        """Recuento por marca, año y rango de precio de un conjunto de resultados"""
+        if mask is None or mask == self.all_mask:
+            return self.facet_cache
+        return self._facets(mask)
+
+    def _ordered_ids(self, mask, sort):
+        if sort in ("price", "price_desc"):
+            selected = set(iter_bits(mask))
+            ids = [doc_id for doc_id in self.prices.doc_ids if doc_id in selected]
+            return ids[::-1] if sort == "price_desc" else ids
+        return iter_bits(mask)
+
+    def search(self, query="", offset=0, limit=50, sort="lot", facets=True, **filters):
+        """
+        Buscar lotes
+
+        Args:
+            query (str): Texto libre (la última palabra como prefijo)
+            offset (int): Resultados a saltar (paginación)
+            limit (int): Resultados a devolver
+            sort (str): "lot", "price" o "price_desc"
+            facets (bool): Incluir los recuentos por faceta
+            **filters: brand, price, price_min, price_max, year_min, year_max
+
+        Returns:
+            dict: total, lots (la página pedida) y facets
+        """
+        mask = self.filter_mask(query, **filters)
+        page = []
+        for position, doc_id in enumerate(self._ordered_ids(mask, sort)):
+            if position >= offset + limit:
+                break
+            if position >= offset:
+                page.append(self.lots[doc_id])
+
+        result = {"total": bit_count(mask), "offset": offset, "lots": page}
+        if facets:
+            result["facets"] = self.facets(mask)
+        return result
+
+    def suggest(self, query, limit=5):
+        """
+        Sugerencias mientras se escribe: marcas que empiezan por la consulta y títulos que la contienen
+
+        Returns:
+            list: {"type": "brand"|"title", "text": ...}
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        suggestions = []
+        position = bisect_left(self.sorted_brands, query)
+        while (position < len(self.sorted_brands) and self.sorted_brands[position].startswith(query)
+               and len(suggestions) < limit):
+            suggestions.append({"type": "brand", "text": self.brand_names[self.sorted_brands[position]]})
+            position += 1
+
+        seen = set()
+        for doc_id in iter_bits(self.text_mask(query)):
+            if len(suggestions) >= limit:
+                break
+            title = self.lots[doc_id].get("title")
+            if title and title not in seen:
+                seen.add(title)
+                suggestions.append({"type": "title", "text": title})
+        return suggestions
+
+def load_index(catalog_path):
+    """Crear el índice desde un catálogo JSON; vacío si el archivo no existe"""
+    catalog_path = Path(catalog_path)
+    if not catalog_path.is_file():
+        return CatalogIndex([])
+    return CatalogIndex.from_file(catalog_path)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Vigilar una carpeta de entrada y convertir automáticamente cada catálogo PDF nuevo
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pdf_render import DEFAULT_WORKERS
+from page_variants import parse_variants
+from simple_pdf_converter import convert_pdf_to_images
+
+# Catálogos que se convierten a la vez; todos comparten el mismo pool de procesos de renderizado
+DEFAULT_JOBS = 2
+
+# Segundos entre escaneos de la carpeta de entrada
+DEFAULT_INTERVAL = 2.0
+
+# Segundos que un PDF debe quedar sin cambios antes de convertirlo
+DEFAULT_SETTLE = 5.0
+
+# Estado de catálogos ya convertidos, guardado en la carpeta de salida
+STATE_NAME = ".watch_state.json"
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def output_folder_name(pdf_path):
+    """Nombre de carpeta de salida seguro para un PDF: 'Sale 24-June.pdf' -> 'Sale_24-June'"""
+    name = re.sub(r"[^\w.-]+", "_", Path(pdf_path).stem).strip("_.")
+    return name or "catalog"
+
+def _init_worker():
+    # Ctrl+C lo atiende el proceso principal, que espera a las conversiones en curso
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def is_pdf_complete(pdf_path, tail_size=2048):
+    """Comprobar que el PDF termina con %%EOF (no se está escribiendo todavía)"""
+    try:
+        with open(pdf_path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            file.seek(max(0, size - tail_size))
+            return b"%%EOF" in file.read()
+    except OSError:
+        return False
+
+class CatalogWatcher:
+    """
+    Vigilante de una carpeta de entrada de catálogos PDF
+
+    En cada escaneo se compara el tamaño y la fecha de modificación de cada
+    PDF. Un archivo nuevo o reemplazado solo se encola cuando su firma no ha
+    cambiado durante `settle` segundos y termina en %%EOF, de modo que una
+    ráfaga de subidas se convierte una sola vez por versión de cada archivo,
+    sin importar cuántos eventos de escritura genere. Las conversiones corren
+    en un pool de `jobs` hilos que envían sus bloques de páginas a un único
+    pool de `workers` procesos: un catálogo solo usa todos los procesos y
+    varios a la vez se los reparten según la carga. Se convierte en modo
+    incremental para que un PDF reemplazado solo renderice las páginas que
+    cambiaron.
+    """
+
+    def __init__(self, inbox, output_root, jobs=DEFAULT_JOBS, interval=DEFAULT_INTERVAL,
+                 settle=DEFAULT_SETTLE, workers=DEFAULT_WORKERS, convert_options=None,
+                 convert_func=convert_pdf_to_images):
+        self.inbox = Path(inbox)
+        self.output_root = Path(output_root)
+        self.jobs = max(1, int(jobs))
+        self.interval = interval
+        self.settle = settle
+        self.workers = max(1, int(workers))
+        self.convert_options = dict(convert_options or {})
+        self.convert_func = convert_func
+
+        self._seen = {}
+        self._stable_since = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="catalog-job")
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._done = self._load_state()
+
+    def _state_path(self):
+        return self.output_root / STATE_NAME
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), "r", encoding="utf-8") as file:
+                return {name: tuple(sig) for name, sig in json.load(file).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        self.output_root.mkdir(parents=True, exist_ok=True)
+        temp_path = self._state_path().with_name(STATE_NAME + ".tmp")
+        with self._lock:
+            state = {name: list(sig) for name, sig in self._done.items()}
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self._state_path())
+
+    def scan(self):
+        """
+        Escanear la carpeta una vez y encolar los PDFs listos
+
+        Returns:
+            list: Rutas de los PDFs encolados en este escaneo
+        """
+        now = time.monotonic()
+        ready = []
+        for pdf_path in sorted(self.inbox.iterdir()):
+            if pdf_path.suffix.lower() != ".pdf" or not pdf_path.is_file():
+                continue
+
+            try:
+                stat = pdf_path.stat()
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            name = pdf_path.name
+
+            with self._lock:
+                if name in self._running or self._done.get(name) == signature:
+                    continue
+
+            if self._seen.get(name) != signature:
+                # Archivo nuevo o todavía cambiando: reiniciar la espera
+                self._seen[name] = signature
+                self._stable_since[name] = now
+                continue
+
+            if now - self._stable_since[name] < self.settle or not is_pdf_complete(pdf_path):
+                continue
+
+            ready.append((pdf_path, signature))
+
+        for pdf_path, signature in ready:
+            self._submit(pdf_path, signature)
+        return [pdf_path for pdf_path, _ in ready]
+
+    def _submit(self, pdf_path, signature):
+        with self._lock:
+            self._running.add(pdf_path.name)
+        output_dir = self.output_root / output_folder_name(pdf_path)
+        log_message(f"📥 En cola: {pdf_path.name} -> {output_dir}")
+        future = self._executor.submit(self._convert, pdf_path, output_dir)
+        future.add_done_callback(lambda f: self._finished(pdf_path, signature, f))
+
+    def _convert(self, pdf_path, output_dir):
+        options = {"incremental": True, "workers": self.workers, "executor": self._pool}
+        options.update(self.convert_options)
+        return self.convert_func(str(pdf_path), output_dir=output_dir, **options)
+
+    def _finished(self, pdf_path, signature, future):
+        name = pdf_path.name
+        try:
+            success = future.result()
+        except Exception as e:
+            log_message(f"❌ Error convirtiendo {name}: {e}")
+            success = False
+
+        with self._lock:
+            self._running.discard(name)
+            # Un fallo no se reintenta hasta que el archivo vuelva a cambiar
+            self._done[name] = signature
+
+        if success:
+            log_message(f"✅ Catálogo convertido: {name}")
+            self._save_state()
+        else:
+            log_message(f"⚠️ Conversión fallida: {name}")
+
+    def run_forever(self):
+        """Escanear la carpeta de entrada hasta Ctrl+C"""
+        self.inbox.mkdir(parents=True, exist_ok=True)
+        log_message(f"👀 Vigilando: {self.inbox}")
+        log_message(f"📁 Salida: {self.output_root}")
+        log_message(f"⚙️ {self.jobs} conversiones a la vez sobre {self.workers} procesos compartidos")
+        try:
+            while True:
+                self.scan()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            log_message("🛑 Deteniendo; esperando a que terminen las conversiones en curso...")
+        finally:
+            self.close()
+
+    def close(self):
+        """Esperar a las conversiones en curso y cerrar los pools"""
+        self._executor.shutdown(wait=True)
+        self._pool.shutdown(wait=True)
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Convertir automáticamente los catálogos PDF que lleguen a una carpeta")
+    parser.add_argument("inbox", help="Carpeta de entrada a vigilar")
+    parser.add_argument("--output", default="auction_catalogs",
+                        help="Carpeta raíz de salida; cada PDF va a su propia subcarpeta (default: auction_catalogs)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Catálogos convertidos a la vez (default: {DEFAULT_JOBS})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos de renderizado en total, compartidos por los catálogos (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"Segundos entre escaneos (default: {DEFAULT_INTERVAL})")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help=f"Segundos sin cambios antes de convertir un PDF (default: {DEFAULT_SETTLE})")
+    parser.add_argument("--dpi", type=int, default=200, help="Calidad en DPI (default: 200)")
+    parser.add_argument("--format", dest="format_type", default="PNG", choices=["PNG", "JPEG", "TIFF"],
+                        help="Formato de imagen (default: PNG)")
+    parser.add_argument("--prefix", default="page", help="Prefijo de los archivos (default: page)")
+    parser.add_argument("--variants", type=parse_variants, default=None,
+                        help="Varias salidas por página, p. ej. \"thumb:webp:320,large:jpeg:1024,full:png\"")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    watcher = CatalogWatcher(
+        args.inbox,
+        args.output,
+        jobs=args.jobs,
+        interval=args.interval,
+        settle=args.settle,
+        workers=args.workers,
+        convert_options={
+            "dpi": args.dpi,
+            "format_type": args.format_type,
+            "prefix": args.prefix,
+            "variants": args.variants,
+        },
+    )
+    watcher.run_forever()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Cliente ligero de conversion_server.py
+
+Solo usa la biblioteca estándar (no importa pdf2image ni Pillow), así que
+arranca en unas decenas de milisegundos: envía el trabajo al servicio y
+muestra el progreso a medida que llega.
+"""
+
+import os
+import sys
+import json
+import socket
+import argparse
+import http.client
+from datetime import datetime
+
+DEFAULT_SERVER = "http://127.0.0.1:8090"
+
+# Salida si no se puede contactar con el servicio
+EXIT_UNREACHABLE = 3
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """Conexión HTTP sobre un socket Unix"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+def open_connection(server=DEFAULT_SERVER, unix_path=None, timeout=None):
+    """Conexión con el servicio: socket Unix si se indica, si no http://host:puerto"""
+    if unix_path:
+        return UnixHTTPConnection(unix_path, timeout=timeout)
+    address = server.split("://", 1)[-1].rstrip("/")
+    host, _, port = address.partition(":")
+    return http.client.HTTPConnection(host, int(port or 80), timeout=timeout)
+
+def submit_job(job, server=DEFAULT_SERVER, unix_path=None):
+    """
+    Enviar un trabajo y devolver sus eventos a medida que llegan
+
+    Args:
+        job (dict): pdf y output (rutas absolutas), dpi, format, prefix, incremental, resume,
+            archive, variants
+
+    Yields:
+        dict: Eventos queued, running, start, page, error y done
+
+    Raises:
+        OSError: Si no se puede contactar con el servicio
+        RuntimeError: Si el servicio rechaza el trabajo
+    """
+    connection = open_connection(server, unix_path)
+    try:
+        body = json.dumps(job).encode("utf-8")
+        connection.request("POST", "/api/jobs", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status != 200:
+            try:
+                message = json.loads(response.read()).get("error")
+            except ValueError:
+                message = None
+            raise RuntimeError(message or f"HTTP {response.status}")
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        connection.close()
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Convertir un PDF con el servicio de conversión ya arrancado")
+    parser.add_argument("pdf", help="PDF a convertir")
+    parser.add_argument("--output", default=None,
+                        help="Carpeta de salida (default: auction_images junto al PDF)")
+    parser.add_argument("--dpi", type=int, default=200, help="Calidad en DPI (default: 200)")
+    parser.add_argument("--format", dest="format_type", default="PNG", choices=["PNG", "JPEG", "TIFF"],
+                        help="Formato de imagen (default: PNG)")
+    parser.add_argument("--prefix", default="page", help="Prefijo de los archivos (default: page)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Renderizar solo las páginas que cambiaron desde la última conversión")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar una conversión interrumpida sin repetir las páginas ya terminadas")
+    parser.add_argument("--archive", action="store_true",
+                        help="Empaquetar también todas las páginas en un solo archivo {prefix}.pages")
+    parser.add_argument("--variants", default=None,
+                        help="Varias salidas por página, p. ej. \"thumb:webp:320,large:jpeg:1024,full:png\"")
+    parser.add_argument("--server", default=DEFAULT_SERVER,
+                        help=f"Dirección del servicio (default: {DEFAULT_SERVER})")
+    parser.add_argument("--socket", default=None, help="Socket Unix del servicio (en lugar de --server)")
+    parser.add_argument("--quiet", action="store_true", help="Mostrar solo el resultado final")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    job = {
+        "pdf": os.path.abspath(args.pdf),
+        "output": os.path.abspath(args.output) if args.output else None,
+        "dpi": args.dpi,
+        "format": args.format_type,
+        "prefix": args.prefix,
+        "incremental": args.incremental,
+        "resume": args.resume,
+        "archive": args.archive,
+        "variants": args.variants,
+    }
+
+    done = None
+    try:
+        for event in submit_job(job, args.server, args.socket):
+            kind = event["event"]
+            if kind == "done":
+                done = event
+            elif kind == "error":
+                log_message(f"❌ Error: {event['message']}")
+            elif args.quiet:
+                continue
+            elif kind == "queued" and event["ahead"]:
+                log_message(f"⏳ En cola (trabajo {event['job']}, {event['ahead']} por delante)")
+            elif kind == "start":
+                log_message(f"📑 {event['pages']} páginas, {event['render']} por renderizar")
+            elif kind == "page":
+                log_message(f"💾 Guardado: {event['file']}")
+    except RuntimeError as e:
+        log_message(f"❌ Trabajo rechazado: {e}")
+        return 2
+    except OSError as e:
+        log_message(f"❌ No se pudo contactar con el servicio de conversión: {e}")
+        log_message("   Arrancarlo con: python conversion_server.py")
+        return EXIT_UNREACHABLE
+
+    if done is None:
+        log_message("❌ El servicio cerró la conexión antes de terminar el trabajo")
+        return 1
+    if done["ok"]:
+        log_message(f"✅ Conversión completada en {done['seconds']:.2f} s")
+        return 0
+    log_message("⚠️ La conversión falló (ver el log del servicio)")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Métricas de conversión: memoria máxima y exportación de tiempos por etapa y página
+"""
+
+import os
+import sys
+import json
+import time
+from pathlib import Path
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Formatos de exportación: JSON lines (se añade al archivo) o texto de Prometheus (se reemplaza)
+METRIC_FORMATS = ("jsonl", "prometheus")
+
+# Páginas más lentas incluidas en el archivo de Prometheus
+PROMETHEUS_SLOWEST_PAGES = 10
+
+def peak_rss_mb():
+    """
+    Memoria máxima (RSS) del proceso actual y de sus hijos ya terminados, en MB
+
+    Usa `resource` en Linux/macOS (incluye pdftoppm) y psutil en Windows si
+    está instalado. Devuelve None si no hay forma de medirla.
+    """
+    if RESOURCE_AVAILABLE:
+        peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # Linux devuelve KB, macOS bytes
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return round(peak / divisor, 1)
+
+    if PSUTIL_AVAILABLE:
+        memory = psutil.Process().memory_info()
+        peak = getattr(memory, "peak_wset", None) or memory.rss
+        return round(peak / (1024 * 1024), 1)
+
+    return None
+
+def metrics_format_for(path, metrics_format=None):
+    """Formato de un archivo de métricas: el indicado o, si no, según la extensión (.prom)"""
+    if metrics_format:
+        return metrics_format
+    return "prometheus" if Path(path).suffix.lower() == ".prom" else "jsonl"
+
+def _jsonl_records(stats, run):
+    data = stats.to_dict()
+    base = {"run_id": run["run_id"], "pdf": run.get("pdf")}
+    yield dict(base, type="run", **run)
+    for stage, values in sorted(data["stages"].items()):
+        yield dict(base, type="stage", stage=stage, **values)
+    for page_no, timings in sorted(data["pages"].items()):
+        yield dict(base, type="page", page=page_no, total=sum(timings.values()), stages=timings)
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _prometheus_lines(stats, run):
+    data = stats.to_dict()
+    pdf = _label(run.get("pdf") or "")
+    lines = [
+        "# HELP pdf_convert_stage_seconds_total Seconds of work per conversion stage",
+        "# TYPE pdf_convert_stage_seconds_total counter",
+    ]
+    for stage, values in sorted(data["stages"].items()):
+        lines.append(f'pdf_convert_stage_seconds_total{{pdf="{pdf}",stage="{stage}"}} {values["seconds"]:.6f}')
+    lines += [
+        "# HELP pdf_convert_stage_pages_total Pages processed per conversion stage",
+        "# TYPE pdf_convert_stage_pages_total counter",
+    ]
+    for stage, values in sorted(data["stages"].items()):
+        lines.append(f'pdf_convert_stage_pages_total{{pdf="{pdf}",stage="{stage}"}} {values["pages"]}')
+    lines += [
+        "# HELP pdf_convert_slowest_page_seconds Total seconds of the slowest pages",
+        "# TYPE pdf_convert_slowest_page_seconds gauge",
+    ]
+    for page_no, total, _ in stats.slowest_pages(PROMETHEUS_SLOWEST_PAGES):
+        lines.append(f'pdf_convert_slowest_page_seconds{{pdf="{pdf}",page="{page_no}"}} {total:.6f}')
+    lines += [
+        "# HELP pdf_convert_wall_seconds Wall-clock duration of the conversion",
+        "# TYPE pdf_convert_wall_seconds gauge",
+        f'pdf_convert_wall_seconds{{pdf="{pdf}"}} {run.get("wall_seconds", 0.0):.6f}',
+        "# HELP pdf_convert_pages Pages written by the conversion",
+        "# TYPE pdf_convert_pages gauge",
+        f'pdf_convert_pages{{pdf="{pdf}"}} {run.get("pages", 0)}',
+    ]
+    if data["peak_rss_mb"] is not None:
+        lines += [
+            "# HELP pdf_convert_peak_rss_bytes Peak resident memory of a conversion process",
+            "# TYPE pdf_convert_peak_rss_bytes gauge",
+            f'pdf_convert_peak_rss_bytes{{pdf="{pdf}"}} {int(data["peak_rss_mb"] * 1024 * 1024)}',
+        ]
+    lines += [
+        "# HELP pdf_convert_last_run_timestamp_seconds Unix time when the conversion finished",
+        "# TYPE pdf_convert_last_run_timestamp_seconds gauge",
+        f'pdf_convert_last_run_timestamp_seconds{{pdf="{pdf}"}} {run["finished"]:.3f}',
+    ]
+    return lines
+
+def write_metrics(path, stats, metrics_format=None, **run):
+    """
+    Exportar las métricas de una conversión
+
+    En formato "jsonl" se añaden al archivo una línea "run", una por etapa y
+    una por página, todas con el mismo identificador de ejecución. En formato
+    "prometheus" el archivo se reemplaza de forma atómica, apto para el
+    textfile collector de node_exporter.
+
+    Args:
+        path (str): Archivo de métricas
+        stats (StageStats): Estadísticas de la conversión
+        metrics_format (str): "jsonl" o "prometheus" (default: según la extensión)
+        **run: Datos de la ejecución (pdf, dpi, format, pages, wall_seconds...)
+
+    Returns:
+        Path: Ruta del archivo escrito
+    """
+    path = Path(path)
+    metrics_format = metrics_format_for(path, metrics_format)
+    if metrics_format not in METRIC_FORMATS:
+        raise ValueError(f"Formato de métricas no soportado: {metrics_format}")
+
+    finished = time.time()
+    run = dict(run, finished=finished, run_id=f"{int(finished * 1000)}-{os.getpid()}")
+    run["peak_rss_mb"] = stats.peak_rss_mb
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if metrics_format == "jsonl":
+        with open(path, "a", encoding="utf-8") as file:
+            for record in _jsonl_records(stats, run):
+                file.write(json.dumps(record, default=str) + "\n")
+        return path
+
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(_prometheus_lines(stats, run)) + "\n")
+    os.replace(temp_path, path)
+    return path
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Servicio de conversión siempre en marcha (asyncio, sin dependencias externas)
+
+Cada ejecución de convert_auction_pdf.py o simple_pdf_converter.py paga el
+arranque del intérprete, la importación de pdf2image/Pillow, la búsqueda de
+Poppler y el arranque del pool de procesos. Para un folleto de una página eso
+es casi todo el tiempo. Este servicio lo paga una sola vez: los procesos de
+renderizado quedan arrancados y cada trabajo empieza en milisegundos. El
+cliente ligero es conversion_client.py.
+
+Rutas:
+    POST /api/jobs    Convertir un PDF ({"pdf", "output", "dpi", "format", ...});
+                      la respuesta es un flujo NDJSON con un evento por línea
+    GET /api/health   Estado del servicio: procesos, trabajos en curso y hechos
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import itertools
+import threading
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from auction_server import HTTPError, HTTPServer, Response, StreamResponse, log_message
+from pdf_render import PDF2IMAGE_AVAILABLE, DEFAULT_WORKERS, DEFAULT_WINDOW_SIZE, find_poppler_path
+from page_pipeline import DEFAULT_ENCODERS
+from page_variants import parse_variants
+from simple_pdf_converter import convert_pdf_to_images
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8090
+
+# Conversiones a la vez; todas comparten los mismos procesos de renderizado
+DEFAULT_JOBS = 2
+
+FORMATS = ("PNG", "JPEG", "TIFF")
+MIN_DPI = 36
+MAX_DPI = 600
+
+NDJSON = "application/x-ndjson; charset=utf-8"
+
+def ndjson_line(event):
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def _init_worker():
+    # Ctrl+C lo atiende el proceso principal, que cierra el pool ordenadamente
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _warm_worker(_):
+    """Cargar los plugins de Pillow en un proceso del pool (las importaciones ya están hechas)"""
+    if PIL_AVAILABLE:
+        Image.init()
+
+def job_options(data):
+    """
+    Validar las opciones de un trabajo recibido por POST /api/jobs
+
+    Returns:
+        dict: Argumentos para convert_pdf_to_images
+
+    Raises:
+        HTTPError: 400 si falta el PDF o una opción es inválida
+    """
+    pdf = data.get("pdf")
+    if not isinstance(pdf, str) or not pdf:
+        raise HTTPError(400, "Falta la ruta del PDF (pdf)")
+    if not os.path.isabs(pdf):
+        raise HTTPError(400, "La ruta del PDF debe ser absoluta")
+    if not Path(pdf).is_file():
+        raise HTTPError(400, f"PDF no encontrado: {pdf}")
+
+    options = {"pdf_path": pdf, "output_dir": data.get("output") or None}
+    if options["output_dir"] is not None and not os.path.isabs(options["output_dir"]):
+        raise HTTPError(400, "La carpeta de salida debe ser absoluta")
+
+    try:
+        options["dpi"] = int(data.get("dpi", 200))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "dpi debe ser un entero")
+    if not MIN_DPI <= options["dpi"] <= MAX_DPI:
+        raise HTTPError(400, f"dpi debe estar entre {MIN_DPI} y {MAX_DPI}")
+
+    options["format_type"] = str(data.get("format", "PNG")).upper()
+    if options["format_type"] not in FORMATS:
+        raise HTTPError(400, f"Formato no soportado: {options['format_type']}")
+
+    options["prefix"] = str(data.get("prefix") or "page")
+    if "/" in options["prefix"] or "\\" in options["prefix"]:
+        raise HTTPError(400, "Prefijo inválido")
+    options["incremental"] = bool(data.get("incremental", False))
+    options["resume"] = bool(data.get("resume", False))
+    options["archive"] = bool(data.get("archive", False))
+
+    if data.get("variants"):
+        try:
+            options["variants"] = parse_variants(data["variants"])
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+    return options
+
+class ConversionService:
+    """
+    Trabajos de conversión sobre un pool de procesos que no se cierra
+
+    El pool se arranca completo al crear el servicio, antes de que existan los
+    hilos de los trabajos. Los PDFs de una sola página se renderizan en el
+    propio hilo del trabajo (sin pasar por el pool); los de varias páginas
+    reparten sus bloques entre todos los procesos. Cada trabajo corre en uno
+    de `jobs` hilos y publica sus eventos en una cola asyncio que la
+    respuesta NDJSON va vaciando.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, jobs=DEFAULT_JOBS, window_size=DEFAULT_WINDOW_SIZE,
+                 encoders=DEFAULT_ENCODERS):
+        self.workers = max(1, int(workers))
+        self.window_size = max(1, int(window_size))
+        self.encoders = encoders
+        self.poppler_path = find_poppler_path(Path(__file__).parent)
+        self.started = time.time()
+
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        list(self.pool.map(_warm_worker, range(self.workers)))
+        self.jobs = ThreadPoolExecutor(max_workers=max(1, int(jobs)), thread_name_prefix="conversion-job")
+
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+        self.finished = 0
+        self.failed = 0
+
+    def register(self, server):
+        server.route("POST", "/api/jobs", self.handle_job)
+        server.route("GET", "/api/health", self.handle_health)
+        server.shutdown.append(self.close)
+
+    async def close(self):
+        self.jobs.shutdown(wait=True)
+        self.pool.shutdown(wait=True)
+
+    def run_job(self, job_id, options, emit, queued_at):
+        """Convertir un PDF en el hilo del trabajo, publicando los eventos con `emit`"""
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        start = time.perf_counter()
+        emit({"event": "running", "job": job_id, "waited_ms": round((start - queued_at) * 1000, 1)})
+        success = False
+        try:
+            success = convert_pdf_to_images(
+                window_size=self.window_size,
+                workers=self.workers,
+                encoders=self.encoders,
+                poppler_path=self.poppler_path,
+                executor=self.pool,
+                progress=lambda event: emit(dict(event, job=job_id)),
+                **options,
+            )
+        except Exception as e:
+            emit({"event": "error", "job": job_id, "message": str(e)})
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.finished += 1
+                self.failed += 0 if success else 1
+            emit({"event": "done", "job": job_id, "ok": bool(success),
+                  "seconds": round(time.perf_counter() - start, 3)})
+
+    async def handle_job(self, request):
+        options = job_options(request.json())
+        job_id = next(self._ids)
+        log_message(f"📥 Trabajo {job_id}: {Path(options['pdf_path']).name}")
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        with self._lock:
+            ahead = self.queued + self.running
+            self.queued += 1
+        loop.run_in_executor(self.jobs, self.run_job, job_id, options, emit, time.perf_counter())
+
+        async def stream(writer):
+            writer.write(ndjson_line({"event": "queued", "job": job_id, "ahead": ahead}))
+            await writer.drain()
+            while True:
+                event = await events.get()
+                writer.write(ndjson_line(event))
+                await writer.drain()
+                if event["event"] == "done":
+                    break
+
+        return StreamResponse(stream, content_type=NDJSON)
+
+    async def handle_health(self, request):
+        with self._lock:
+            return Response.json({
+                "workers": self.workers,
+                "poppler": self.poppler_path or "PATH",
+                "running": self.running,
+                "queued": self.queued,
+                "finished": self.finished,
+                "failed": self.failed,
+                "uptime": round(time.time() - self.started, 1),
+            })
+
+def build_server(workers=DEFAULT_WORKERS, jobs=DEFAULT_JOBS, window_size=DEFAULT_WINDOW_SIZE,
+                 encoders=DEFAULT_ENCODERS):
+    """Crear el servidor con el servicio de conversión ya arrancado"""
+    server = HTTPServer()
+    service = ConversionService(workers, jobs, window_size, encoders)
+    service.register(server)
+    return server, service
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Servicio de conversión de PDFs con procesos siempre arrancados")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Dirección de escucha (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Puerto (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", default=None,
+                        help="Escuchar en un socket Unix en lugar de host:puerto (p. ej. /tmp/pdf_convert.sock)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos de renderizado siempre arrancados (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Conversiones a la vez (default: {DEFAULT_JOBS})")
+    parser.add_argument("--window-size", type=int, default=DEFAULT_WINDOW_SIZE,
+                        help=f"Páginas decodificadas en memoria por proceso (default: {DEFAULT_WINDOW_SIZE})")
+    parser.add_argument("--encoders", type=int, default=DEFAULT_ENCODERS,
+                        help=f"Hilos de codificación por proceso, 0 = en serie (default: {DEFAULT_ENCODERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    if not PDF2IMAGE_AVAILABLE:
+        log_message("❌ Error: pdf2image no está instalado")
+        log_message("   Instalar con: pip install pdf2image")
+        return 1
+    if args.socket and not hasattr(asyncio, "start_unix_server"):
+        log_message("❌ Los sockets Unix no están disponibles en este sistema; usar --host/--port")
+        return 2
+
+    server, service = build_server(args.workers, args.jobs, args.window_size, args.encoders)
+    log_message(f"🔥 {service.workers} procesos de renderizado listos, {args.jobs} trabajos a la vez")
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        log_message(f"🌐 Servicio de conversión en {args.socket}")
+    else:
+        log_message(f"🌐 Servicio de conversión en http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port, unix_path=args.socket))
+    except KeyboardInterrupt:
+        log_message("🛑 Servicio detenido")
+    finally:
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,23 +5,61 @@ Convertidor automático del PDF de subasta a imágenes
 
 import os
 import sys
+import time
+import argparse
 from pathlib import Path
 from datetime import datetime
 
-try:
-    from pdf2image import convert_from_path
-    PDF2IMAGE_AVAILABLE = True
-except ImportError:
-    PDF2IMAGE_AVAILABLE = False
+from pdf_render import (
+    PDF2IMAGE_AVAILABLE,
+    DEFAULT_WINDOW_SIZE,
+    DEFAULT_WORKERS,
+    convert_pdf_pages,
+    find_poppler_path,
+    get_page_count,
+    page_filename,
+    plan_budget_dpi,
+)
+from page_pipeline import DEFAULT_ENCODERS, StageStats
+from page_cache import PYPDF_AVAILABLE, plan_incremental
+from page_variants import parse_variants, variant_filename, write_variants_manifest
+from conversion_metrics import METRIC_FORMATS, write_metrics
+from lot_extract import extract_lots
+from publish_images import publish_images
+from photo_crop import NUMPY_AVAILABLE, crop_rendered_pages, link_photos
+from page_dedupe import DuplicateIndex, finish_dedupe, index_manager
+from page_budget import parse_budget, write_budget_manifest
+from page_journal import PageJournal, journal_key
+from page_archive import pack_pages
+from job_queue import SHARD_PAGES, submit_job
 
 def log_message(message):
     """Imprimir mensaje con timestamp"""
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] {message}")
 
-def convert_auction_pdf():
+def convert_auction_pdf(workers=DEFAULT_WORKERS, encoders=DEFAULT_ENCODERS, incremental=False,
+                        variants=None, metrics_path=None, metrics_format=None, lots=False,
+                        publish=False, photos=False, dedupe=False, budget=None, resume=False,
+                        archive=False):
     """
     Convertir automáticamente el PDF de subasta a imágenes
+    
+    Args:
+        workers (int): Procesos de renderizado en paralelo
+        encoders (int): Hilos de codificación por proceso (0 = guardar en serie)
+        incremental (bool): Conservar las páginas sin cambios en lugar de limpiar la carpeta
+        variants (list): Variantes de salida por página (ver page_variants.parse_variants)
+        metrics_path (str): Archivo donde exportar las métricas por etapa y página (opcional)
+        metrics_format (str): "jsonl" o "prometheus" (default: según la extensión)
+        lots (bool): Extraer también los lotes a catalog.json y catalog.sqlite
+        publish (bool): Publicar las imágenes con nombres por contenido en static/ (publish_images)
+        photos (bool): Recortar la foto de cada lote a .photos/ y enlazarla en photos.json
+        dedupe (bool): No guardar páginas en blanco y guardar una sola vez las repetidas
+        budget (PageBudget): Píxeles o bytes por página en lugar de un DPI fijo (ver page_budget)
+        resume (bool): Continuar una conversión interrumpida: las páginas del diario
+            (ver page_journal) cuyos archivos siguen intactos no se renderizan de nuevo
+        archive (bool): Empaquetar también todas las páginas en {prefix}.pages (ver page_archive)
     """
     
     if not PDF2IMAGE_AVAILABLE:
@@ -29,6 +67,19 @@ def convert_auction_pdf():
         log_message("   Asegúrate de que el entorno virtual esté activo")
         return False
     
+    if photos and not NUMPY_AVAILABLE:
+        log_message("⚠️ numpy no está instalado: no se recortan las fotos de los lotes")
+        photos = False
+    if dedupe and not NUMPY_AVAILABLE:
+        log_message("⚠️ numpy no está instalado: se guardan también las páginas en blanco y repetidas")
+        dedupe = False
+    if budget is not None and budget.max_bytes and variants:
+        log_message("❌ Error: un presupuesto en bytes no se puede combinar con variantes (usar MP)")
+        return False
+    if resume and dedupe:
+        log_message("❌ Error: --resume no se puede combinar con --dedupe")
+        return False
+    
     # Configuración fija
     current_dir = Path(__file__).parent
     pdf_path = current_dir / "TUESDAY SAJAA AUCTION 24-JUNE-2025.pdf"
@@ -36,6 +87,7 @@ def convert_auction_pdf():
     dpi = 200
     format_type = "PNG"
     prefix = "auction_page"
+    window_size = DEFAULT_WINDOW_SIZE
     
     # Verificar que el PDF existe
     if not pdf_path.exists():
@@ -45,79 +97,182 @@ def convert_auction_pdf():
     # Crear carpeta si no existe
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    manager = None
+    journal = None
     try:
         print("=" * 60)
         print("🏁 CONVERTIDOR AUTOMÁTICO DE PDF DE SUBASTA")
         print("=" * 60)
         print()
         
+        wall_start = time.perf_counter()
         log_message("🚀 Iniciando conversión automática...")
         log_message(f"📄 PDF: {pdf_path.name}")
         log_message(f"📁 Carpeta de salida: {output_dir}")
-        log_message(f"🎨 Configuración: {dpi} DPI, formato {format_type}")
+        quality = f"presupuesto de {budget}" if budget is not None else f"{dpi} DPI"
+        if variants:
+            log_message(f"🎨 Configuración: {quality}, variantes: {', '.join(v.name for v in variants)}")
+        else:
+            log_message(f"🎨 Configuración: {quality}, formato {format_type}")
+        log_message(f"⚙️ Procesos de renderizado: {workers}, hilos de codificación: {encoders}")
         
-        # Limpiar carpeta de salida si existe
-        if output_dir.exists():
+        # Limpiar carpeta de salida si existe (en modo incremental o al reanudar se conserva)
+        if not incremental and not resume and output_dir.exists():
             for file in output_dir.glob("*"):
                 if file.is_file():
                     file.unlink()
             log_message("🧹 Carpeta de salida limpiada")
         
         # Verificar instalación local de Poppler
-        poppler_path = None
-        local_poppler_paths = [
-            current_dir / "poppler" / "bin",
-            current_dir / "poppler" / "Library" / "bin"
-        ]
-        
-        for path in local_poppler_paths:
-            if path.exists() and (path / "pdftoppm.exe").exists():
-                poppler_path = str(path)
-                log_message(f"🔧 Usando Poppler local: {poppler_path}")
-                break
-        
-        # Convertir PDF
-        log_message("🔄 Convirtiendo páginas del PDF...")
+        poppler_path = find_poppler_path(current_dir)
         if poppler_path:
-            images = convert_from_path(str(pdf_path), dpi=dpi, poppler_path=poppler_path)
-        else:
-            images = convert_from_path(str(pdf_path), dpi=dpi)
+            log_message(f"🔧 Usando Poppler local: {poppler_path}")
         
-        total_pages = len(images)
+        total_pages = get_page_count(pdf_path, poppler_path=poppler_path)
         log_message(f"📑 Encontradas {total_pages} páginas")
         
         if total_pages == 0:
             log_message("❌ No se encontraron páginas en el PDF")
             return False
         
-        # Guardar imágenes
+        # Con presupuesto, un DPI por página según su tamaño (pdfinfo, sin renderizar)
+        render_dpi = dpi
+        if budget is not None:
+            page_sizes, render_dpi = plan_budget_dpi(pdf_path, total_pages, budget, format_type,
+                                                     poppler_path=poppler_path)
+            log_message(f"📐 Presupuesto de {budget}: entre {min(render_dpi.values())} y "
+                        f"{max(render_dpi.values())} DPI según el tamaño de cada página")
+        
+        # Comparar con el manifiesto de la conversión anterior
+        plan = None
+        render_pages = None
+        if incremental:
+            if not PYPDF_AVAILABLE:
+                log_message("⚠️ pypdf no está instalado: solo se reaprovechan páginas si el PDF no cambió")
+            plan = plan_incremental(pdf_path, output_dir, total_pages,
+                                    budget.key if budget is not None else dpi, format_type, prefix,
+                                    variants=variants)
+            plan.apply_reuse()
+            render_pages = plan.render_pages
+            log_message(f"♻️ Incremental: {len(plan.unchanged)} sin cambios, "
+                        f"{len(plan.reused_pages)} reaprovechadas, {len(render_pages)} por renderizar")
+        
+        # Diario de páginas terminadas; al reanudar, saltar las que siguen intactas
+        if not dedupe:
+            journal = PageJournal(output_dir, journal_key(pdf_path, budget.key if budget is not None else dpi,
+                                                          format_type, prefix, variants)).open(resume)
+        if resume:
+            pending = render_pages if render_pages is not None else range(1, total_pages + 1)
+            finished = journal.completed_pages(pending)
+            render_pages = [page_no for page_no in pending if page_no not in finished]
+            log_message(f"⏩ Reanudando: {len(finished)} páginas ya terminadas (tamaño y hash verificados), "
+                        f"{len(render_pages)} por renderizar")
+        
+        # Convertir y guardar por ventanas de páginas
+        pages_to_render = total_pages if render_pages is None else len(render_pages)
         print()
-        log_message("💾 Guardando imágenes...")
-        for i, image in enumerate(images, 1):
-            filename = f"{prefix}_{i:03d}.{format_type.lower()}"
-            image_path = output_dir / filename
-            
-            # Optimizar imagen
-            if format_type.lower() == 'jpeg':
-                image.save(image_path, format_type.upper(), quality=95, optimize=True)
-            else:
-                image.save(image_path, format_type.upper())
-            
+        log_message(f"🔄 Convirtiendo páginas del PDF ({window_size} páginas en memoria)...")
+        stats = StageStats()
+        dedupe_index = None
+        if dedupe:
+            # Con varios procesos el índice de páginas vistas vive en un proceso aparte
+            manager = index_manager() if workers > 1 else None
+            dedupe_index = manager.DuplicateIndex() if manager else DuplicateIndex()
+        
+        def page_files(page_no):
+            if variants:
+                return [output_dir / variant_filename(prefix, page_no, variant) for variant in variants]
+            return [output_dir / page_filename(prefix, page_no, format_type)]
+        
+        pages = convert_pdf_pages(pdf_path, output_dir, total_pages, dpi=render_dpi,
+                                  format_type=format_type, prefix=prefix, workers=workers,
+                                  window_size=window_size, poppler_path=poppler_path,
+                                  encoders=encoders, stats=stats, pages=render_pages,
+                                  variants=variants, photos=photos, dedupe=dedupe_index,
+                                  max_bytes=budget.max_bytes if budget is not None else None)
+        for done, (i, image_path) in enumerate(pages, 1):
             # Mostrar progreso
-            progress = (i / total_pages) * 100
-            log_message(f"💾 [{progress:5.1f}%] Guardado: {filename}")
+            progress = (done / pages_to_render) * 100
+            if image_path is None:
+                log_message(f"⬜ [{progress:5.1f}%] Página {i} en blanco: no se guarda")
+            elif image_path != page_files(i)[0]:
+                log_message(f"🔁 [{progress:5.1f}%] Página {i} repetida: {image_path.name}")
+            else:
+                log_message(f"💾 [{progress:5.1f}%] Guardado: {image_path.name}")
+            if journal is not None:
+                journal.record(i, page_files(i))
+        
+        if plan is not None:
+            for filename in plan.finish():
+                log_message(f"🗑️ Eliminado archivo obsoleto: {filename}")
+        
+        if variants:
+            manifest_path = write_variants_manifest(output_dir, prefix, total_pages, variants, render_dpi)
+            log_message(f"🗂️ Manifiesto de variantes: {manifest_path.name}")
+        
+        if budget is not None:
+            manifest_path = write_budget_manifest(output_dir, prefix, budget, page_sizes, render_dpi,
+                                                  lambda page_no: page_files(page_no)[0])
+            log_message(f"📐 DPI de cada página: {manifest_path.name}")
+        
+        if dedupe_index is not None:
+            result = finish_dedupe(dedupe_index, output_dir, prefix, stats, page_files)
+            log_message(f"🔁 {result['blank']} páginas en blanco y {result['duplicates']} repetidas sin guardar: "
+                        f"≈{result['bytes'] / (1024 * 1024):.2f} MB y ≈{result['seconds']:.2f} s "
+                        f"de codificación ahorrados ({result['manifest'].name})")
         
         print()
         log_message("✅ ¡Conversión completada exitosamente!")
         log_message(f"📁 Imágenes guardadas en: {output_dir}")
-        log_message(f"📊 Total de imágenes: {total_pages}")
+        log_message(f"📊 Total de imágenes: {total_pages} ({pages_to_render} renderizadas)")
+        for line in stats.summary_lines():
+            log_message(f"⏱️ {line}")
+        if metrics_path:
+            metrics_file = write_metrics(metrics_path, stats, metrics_format, pdf=str(pdf_path),
+                                         dpi=budget.key if budget is not None else dpi,
+                                         format=format_type, workers=workers,
+                                         encoders=encoders, pages=pages_to_render,
+                                         wall_seconds=time.perf_counter() - wall_start)
+            log_message(f"📈 Métricas escritas en: {metrics_file}")
+        
+        if lots:
+            log_message("🏷️ Extrayendo lotes del catálogo...")
+            result = extract_lots(pdf_path, output_dir, prefix=prefix, format_type=format_type,
+                                  variants=variants, workers=workers, poppler_path=poppler_path,
+                                  total_pages=total_pages)
+            log_message(f"🏷️ {result['lots']} lotes ({result['parsed_pages']} páginas leídas, "
+                        f"{result['cached_pages']} sin cambios): {result['json'].name}, {result['db'].name}")
+        
+        if photos:
+            # Páginas sin cambios o reaprovechadas: analizar las que no tienen recortes al día
+            if not variants:
+                cropped, _ = crop_rendered_pages(output_dir, prefix, format_type,
+                                                 force_pages=set(plan.reused_pages) if plan else ())
+                if cropped:
+                    log_message(f"📷 Fotos recortadas de {cropped} páginas ya guardadas")
+            result = link_photos(output_dir, total_pages)
+            log_message(f"📷 {result['photos']} fotos recortadas, {result['lots']} enlazadas a su lote: "
+                        f"{result['json'].name}")
+        
+        if publish:
+            result = publish_images(output_dir, workers=workers)
+            log_message(f"🌐 {result['images']} imágenes publicadas en static/ "
+                        f"({result['published']} nuevas o cambiadas)")
+        
+        if archive:
+            result = pack_pages(output_dir, prefix, format_type, variants, total_pages)
+            log_message(f"🗃️ Archivo de páginas: {result['path'].name} ({result['added']} archivos nuevos "
+                        f"o cambiados, {result['bytes'] / (1024 * 1024):.2f} MB)")
         
         # Mostrar resumen de archivos
         print("\n" + "=" * 60)
         print("📋 RESUMEN DE ARCHIVOS CREADOS:")
         print("=" * 60)
         
-        image_files = sorted(output_dir.glob(f"{prefix}_*.{format_type.lower()}"))
+        if variants:
+            image_files = sorted(f for f in output_dir.glob(f"{prefix}_*") if f.suffix != ".json")
+        else:
+            image_files = sorted(output_dir.glob(f"{prefix}_*.{format_type.lower()}"))
         for img_file in image_files:
             size_mb = img_file.stat().st_size / (1024 * 1024)
             print(f"📄 {img_file.name} ({size_mb:.2f} MB)")
@@ -145,9 +300,86 @@ def convert_auction_pdf():
             print("4. Agrega la carpeta 'bin' de Poppler al PATH del sistema")
         
         return False
+    
+    finally:
+        if journal is not None:
+            journal.close()
+        if manager is not None:
+            manager.shutdown()
 
-def main():
+def submit_auction_pdf(queue_path, variants=None, shard_pages=SHARD_PAGES):
+    """
+    Enviar el PDF de subasta a la cola compartida (job_queue) en lugar de convertirlo aquí
+    
+    Usa la misma configuración fija que convert_auction_pdf. Los procesos
+    `python job_queue.py --queue <cola> worker` renderizan los bloques de
+    páginas en auction_images, que debe ser accesible para todos.
+    
+    Args:
+        queue_path (str): Base de datos SQLite de la cola
+        variants (list): Variantes de salida por página (ver page_variants.parse_variants)
+        shard_pages (int): Páginas por bloque de la cola
+    """
+    current_dir = Path(__file__).parent
+    pdf_path = current_dir / "TUESDAY SAJAA AUCTION 24-JUNE-2025.pdf"
+    output_dir = current_dir / "auction_images"
+    
+    if not pdf_path.exists():
+        log_message(f"❌ Error: PDF no encontrado: {pdf_path}")
+        return False
+    
+    try:
+        poppler_path = find_poppler_path(current_dir)
+        job_id, pages, shards = submit_job(queue_path, pdf_path, output_dir, 200, "PNG", "auction_page",
+                                           variants, shard_pages, poppler_path)
+    except Exception as e:
+        log_message(f"❌ Error al enviar el PDF a la cola: {e}")
+        return False
+    
+    log_message(f"📥 Trabajo {job_id}: {pdf_path.name}, {pages} páginas en {shards} bloques")
+    log_message(f"📋 Procesarlo con: python job_queue.py --queue {queue_path} worker")
+    return True
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Convertidor automático del PDF de subasta a imágenes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos de renderizado en paralelo (default: {DEFAULT_WORKERS}, núcleos de CPU)")
+    parser.add_argument("--encoders", type=int, default=DEFAULT_ENCODERS,
+                        help=f"Hilos de codificación por proceso, 0 = en serie (default: {DEFAULT_ENCODERS})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Renderizar solo las páginas que cambiaron desde la última conversión")
+    parser.add_argument("--variants", type=parse_variants, default=None,
+                        help="Varias salidas por página desde un solo renderizado, "
+                             "p. ej. \"thumb:webp:320,large:jpeg:1024,full:png\"")
+    parser.add_argument("--metrics", default=None,
+                        help="Archivo de métricas por etapa y página (.jsonl se añade, .prom para Prometheus)")
+    parser.add_argument("--metrics-format", choices=METRIC_FORMATS, default=None,
+                        help="Formato de --metrics (default: según la extensión)")
+    parser.add_argument("--lots", action="store_true",
+                        help="Extraer los lotes a catalog.json y catalog.sqlite junto a las imágenes")
+    parser.add_argument("--publish", action="store_true",
+                        help="Publicar las imágenes con nombres por contenido (static/) para cacheo permanente")
+    parser.add_argument("--budget", type=parse_budget, default=None,
+                        help="DPI por página para un presupuesto de píxeles o bytes por página "
+                             "en lugar de 200 DPI fijos, p. ej. 4mp o 800kb")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="No guardar páginas en blanco y guardar una sola vez las páginas repetidas")
+    parser.add_argument("--photos", action="store_true",
+                        help="Recortar la foto de cada lote (.photos/) y enlazarla al catálogo (con --lots)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar una conversión interrumpida sin repetir las páginas ya terminadas")
+    parser.add_argument("--archive", action="store_true",
+                        help="Empaquetar también todas las páginas en un solo archivo {prefix}.pages")
+    parser.add_argument("--queue", default=None,
+                        help="Enviar el PDF a una cola compartida (job_queue.py) en lugar de convertirlo aquí")
+    parser.add_argument("--shard-pages", type=int, default=SHARD_PAGES,
+                        help=f"Páginas por bloque de la cola (default: {SHARD_PAGES})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Función principal"""
+    args = parse_args(argv)
     
     # Verificar entorno virtual
     if not hasattr(sys, 'real_prefix') and not (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix):
@@ -155,7 +387,25 @@ def main():
         print("   Se recomienda activar el entorno virtual con: venv\\Scripts\\activate")
         print()
     
-    success = convert_auction_pdf()
+    if args.queue:
+        # Extraer lotes, publicar, empaquetar, etc. necesitan todas las páginas aquí
+        unsupported = [flag for flag, value in (("--incremental", args.incremental), ("--budget", args.budget),
+                                                ("--dedupe", args.dedupe), ("--resume", args.resume),
+                                                ("--archive", args.archive), ("--metrics", args.metrics),
+                                                ("--lots", args.lots), ("--publish", args.publish),
+                                                ("--photos", args.photos))
+                       if value]
+        if unsupported:
+            log_message(f"❌ Error: {', '.join(unsupported)} no se puede combinar con --queue")
+            return 2
+        return 0 if submit_auction_pdf(args.queue, args.variants, args.shard_pages) else 1
+    
+    success = convert_auction_pdf(workers=args.workers, encoders=args.encoders,
+                                  incremental=args.incremental, variants=args.variants,
+                                  metrics_path=args.metrics, metrics_format=args.metrics_format,
+                                  lots=args.lots, publish=args.publish, photos=args.photos,
+                                  dedupe=args.dedupe, budget=args.budget, resume=args.resume,
+                                  archive=args.archive)
     
     if success:
         print("\n🎉 ¡CONVERSIÓN COMPLETADA EXITOSAMENTE!")
@@ -1,129 +1,360 @@
 #!/usr/bin/env python3
 """
 Instalador automático de Poppler para Windows
+
+La descarga se reanuda con peticiones Range si la conexión se corta, se
+comprueba con SHA-256 y el ZIP verificado se guarda en una caché local, así
+que reinstalar no vuelve a descargar nada. Del ZIP solo se extraen `bin/` y
+`share/`.
 """
 
 import os
 import sys
-import urllib.request
-import zipfile
+import json
+import time
 import shutil
+import hashlib
+import argparse
+import zipfile
+import urllib.error
+import urllib.request
 from pathlib import Path
 
-def download_file(url, dest_path, chunk_size=8192):
-    """Descargar archivo con barra de progreso"""
+# URL de descarga (versión estable)
+POPPLER_URL = "https://github.com/oschwartz10612/poppler-windows/releases/download/v23.08.0-0/Release-23.08.0-0.zip"
+
+# SHA-256 esperado del ZIP (también --sha256 o la variable POPPLER_SHA256). Sin
+# él, el hash de la primera descarga queda registrado en la caché y las
+# siguientes instalaciones se comprueban contra ese hash.
+POPPLER_SHA256 = os.environ.get("POPPLER_SHA256")
+
+# Caché de ZIPs verificados, compartida entre proyectos
+DEFAULT_CACHE_DIR = Path(os.environ.get("POPPLER_CACHE_DIR") or Path.home() / ".cache" / "poppler-installer")
+CACHE_INDEX = "index.json"
+
+# Bloques de lectura: empiezan pequeños y crecen mientras la conexión responde rápido
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 0.5
+
+# Reintentos de la descarga (cada uno continúa donde quedó el anterior)
+DOWNLOAD_ATTEMPTS = 8
+RETRY_DELAY = 1.0
+TIMEOUT = 30
+
+# Carpetas del ZIP que se extraen (dentro de la carpeta raíz del ZIP)
+NEEDED_DIRS = ("bin/", "share/", "Library/bin/", "Library/share/")
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _load_part_info(info_path):
     try:
-        with urllib.request.urlopen(url) as response:
-            total_size = int(response.headers.get('content-length', 0))
-            
-            with open(dest_path, 'wb') as file:
-                downloaded = 0
-                
-                while True:
-                    chunk = response.read(chunk_size)
-                    if not chunk:
-                        break
-                    
-                    file.write(chunk)
-                    downloaded += len(chunk)
-                    
-                    if total_size > 0:
-                        progress = (downloaded / total_size) * 100
-                        print(f"\r📥 Descargando: {progress:.1f}%", end='', flush=True)
-                
-                print(f"\r📥 Descarga completada: {dest_path.name}")
-                return True
-                
-    except Exception as e:
-        print(f"\n❌ Error al descargar: {e}")
-        return False
+        with open(info_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def _save_part_info(info_path, info):
+    with open(info_path, "w", encoding="utf-8") as file:
+        json.dump(info, file)
+
+def _next_chunk_size(chunk_size, seconds):
+    """Duplicar el bloque si la lectura fue rápida y reducirlo a la mitad si fue lenta"""
+    if seconds < TARGET_CHUNK_SECONDS / 2:
+        return min(MAX_CHUNK_SIZE, chunk_size * 2)
+    if seconds > TARGET_CHUNK_SECONDS * 2:
+        return max(MIN_CHUNK_SIZE, chunk_size // 2)
+    return chunk_size
+
+def download_file(url, dest_path, expected_sha256=None, attempts=DOWNLOAD_ATTEMPTS):
+    """
+    Descargar un archivo, reanudando si la conexión se corta
+
+    Los bytes se escriben en `<dest>.part`; si la descarga se interrumpe,
+    el siguiente intento (o la siguiente ejecución) pide solo lo que falta con
+    `Range`, y con `If-Range` para empezar de cero si el archivo del servidor
+    cambió. El SHA-256 se calcula mientras se descarga. Solo si coincide con
+    `expected_sha256` (cuando se indica) el archivo pasa a `dest_path`.
+
+    Returns:
+        str | None: SHA-256 del archivo descargado, o None si falló
+    """
+    dest_path = Path(dest_path)
+    part_path = dest_path.with_name(dest_path.name + ".part")
+    info_path = dest_path.with_name(dest_path.name + ".part.json")
+    info = _load_part_info(info_path)
+    if info.get("url") != url and part_path.exists():
+        part_path.unlink()
+
+    for attempt in range(1, attempts + 1):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+            if info.get("validator"):
+                request.add_header("If-Range", info["validator"])
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                if offset and response.status != 206:
+                    # El servidor no admite Range o el archivo cambió: empezar de cero
+                    offset = 0
+                length = int(response.headers.get("content-length") or 0)
+                total_size = offset + length if length else 0
+                info = {"url": url, "validator": response.headers.get("ETag") or response.headers.get("Last-Modified")}
+                _save_part_info(info_path, info)
+
+                digest = hashlib.sha256()
+                if offset:
+                    with open(part_path, "rb") as file:
+                        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                            digest.update(chunk)
+                    print(f"⏩ Reanudando desde {offset / (1024 * 1024):.1f} MB")
+
+                downloaded = offset
+                chunk_size = MIN_CHUNK_SIZE
+                started = time.perf_counter()
+                with open(part_path, "ab" if offset else "wb") as file:
+                    while True:
+                        read_start = time.perf_counter()
+                        chunk = response.read(chunk_size)
+                        if not chunk:
+                            break
+                        chunk_size = _next_chunk_size(chunk_size, time.perf_counter() - read_start)
+                        file.write(chunk)
+                        digest.update(chunk)
+                        downloaded += len(chunk)
+
+                        speed = (downloaded - offset) / max(1e-6, time.perf_counter() - started) / (1024 * 1024)
+                        if total_size > 0:
+                            progress = (downloaded / total_size) * 100
+                            print(f"\r📥 Descargando: {progress:.1f}% ({speed:.1f} MB/s)", end='', flush=True)
+
+                if total_size and downloaded < total_size:
+                    raise ConnectionError(f"conexión cerrada a los {downloaded} de {total_size} bytes")
+
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset:
+                # El .part ya tiene todo el archivo (o más): comprobarlo por el hash
+                digest = hashlib.sha256()
+                with open(part_path, "rb") as file:
+                    for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                        digest.update(chunk)
+            else:
+                print(f"\n❌ Error al descargar (HTTP {e.code}): {e.reason}")
+                if e.code < 500 and e.code != 429:
+                    return None
+                time.sleep(RETRY_DELAY * attempt)
+                continue
+
+        except (OSError, ConnectionError) as e:
+            print(f"\n⚠️ Descarga interrumpida (intento {attempt}/{attempts}): {e}")
+            time.sleep(RETRY_DELAY * attempt)
+            continue
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 and sha256 != expected_sha256.lower():
+            print(f"\n❌ SHA-256 incorrecto: {sha256} (esperado {expected_sha256})")
+            part_path.unlink()
+            if info_path.exists():
+                info_path.unlink()
+            return None
+
+        os.replace(part_path, dest_path)
+        if info_path.exists():
+            info_path.unlink()
+        print(f"\r📥 Descarga completada: {dest_path.name}" + " " * 20)
+        return sha256
+
+    print(f"\n❌ Error al descargar: {attempts} intentos fallidos (lo descargado se conserva para reanudar)")
+    return None
+
+class ArchiveCache:
+    """
+    ZIPs verificados, guardados por su SHA-256
+
+    `index.json` relaciona cada URL con el hash de su archivo, de modo que
+    una URL ya descargada se resuelve sin red y se comprueba de nuevo antes
+    de usarla.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def _index(self):
+        try:
+            with open(self.cache_dir / CACHE_INDEX, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def archive_path(self, sha256):
+        return self.cache_dir / f"{sha256}.zip"
 
-def install_poppler():
+    def lookup(self, url, expected_sha256=None):
+        """ZIP en caché para una URL (o un hash), comprobado; None si no hay o no coincide"""
+        sha256 = (expected_sha256 or self._index().get(url) or "").lower()
+        path = self.archive_path(sha256) if sha256 else None
+        if path is None or not path.is_file():
+            return None
+        if file_sha256(path) != sha256:
+            print("⚠️ El ZIP en caché está dañado: se descarga de nuevo")
+            path.unlink()
+            return None
+        return path
+
+    def fetch(self, url, expected_sha256=None):
+        """
+        ZIP verificado de una URL: de la caché o descargándolo
+
+        Returns:
+            Path | None: Ruta del ZIP en caché
+        """
+        path = self.lookup(url, expected_sha256)
+        if path is not None:
+            print(f"📦 Usando ZIP en caché: {path}")
+            return path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        download_path = self.cache_dir / "download.zip"
+        sha256 = download_file(url, download_path, expected_sha256)
+        if sha256 is None:
+            return None
+        if not expected_sha256:
+            print(f"🔐 SHA-256: {sha256} (fijarlo con --sha256 o POPPLER_SHA256)")
+
+        path = self.archive_path(sha256)
+        os.replace(download_path, path)
+        index = self._index()
+        index[url] = sha256
+        temp_path = self.cache_dir / (CACHE_INDEX + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file, indent=2)
+        os.replace(temp_path, self.cache_dir / CACHE_INDEX)
+        return path
+
+def extract_needed(zip_path, target_dir, needed_dirs=NEEDED_DIRS):
+    """
+    Extraer del ZIP solo `bin/` y `share/`, miembro a miembro
+
+    Cada miembro se copia por bloques desde el ZIP a su destino, sin
+    descomprimir el archivo entero en una carpeta temporal. Se quita la
+    carpeta raíz del ZIP (`poppler-23.08.0/`).
+
+    Returns:
+        int: Archivos extraídos
+    """
+    target_dir = Path(target_dir)
+    root = target_dir.resolve()
+    extracted = 0
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            if member.is_dir():
+                continue
+            parts = member.filename.replace("\\", "/").split("/", 1)
+            relative = parts[1] if len(parts) == 2 else parts[0]
+            if not relative.startswith(needed_dirs):
+                continue
+            destination = target_dir / relative
+            if root not in destination.resolve().parents:
+                raise ValueError(f"Ruta no permitida en el ZIP: {member.filename}")
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            with archive.open(member) as source, open(destination, "wb") as file:
+                shutil.copyfileobj(source, file, 1024 * 1024)
+            extracted += 1
+    return extracted
+
+def find_bin_dir(poppler_dir):
+    """Carpeta de binarios de una instalación (`bin/` o `Library/bin/`), o None"""
+    for bin_dir in (poppler_dir / "bin", poppler_dir / "Library" / "bin"):
+        if (bin_dir / "pdftoppm.exe").exists():
+            return bin_dir
+    return None
+
+def install_poppler(url=POPPLER_URL, sha256=POPPLER_SHA256, cache_dir=DEFAULT_CACHE_DIR,
+                    project_dir=None, force=False):
     """Instalar Poppler en Windows"""
-    
+
     print("=" * 60)
     print("🛠️  INSTALADOR AUTOMÁTICO DE POPPLER")
     print("=" * 60)
     print()
-    
+
     # Rutas
-    project_dir = Path(__file__).parent
+    project_dir = Path(project_dir or Path(__file__).parent)
     poppler_dir = project_dir / "poppler"
-    temp_dir = project_dir / "temp"
-    
-    # URL de descarga (versión estable)
-    poppler_url = "https://github.com/oschwartz10612/poppler-windows/releases/download/v23.08.0-0/Release-23.08.0-0.zip"
-    zip_file = temp_dir / "poppler.zip"
-    
+    staging_dir = project_dir / "poppler.installing"
+
     try:
-        # Crear directorio temporal
-        temp_dir.mkdir(exist_ok=True)
-        
         # Verificar si ya está instalado
-        if poppler_dir.exists() and (poppler_dir / "bin" / "pdftoppm.exe").exists():
+        bin_dir = find_bin_dir(poppler_dir)
+        if bin_dir is not None and not force:
             print("✅ Poppler ya está instalado en el proyecto")
-            return str(poppler_dir / "bin")
-        
+            return str(bin_dir)
+
         print("📥 Descargando Poppler...")
-        print(f"   URL: {poppler_url}")
-        
-        # Descargar Poppler
-        if not download_file(poppler_url, zip_file):
+        print(f"   URL: {url}")
+
+        # Descargar Poppler (o tomarlo de la caché)
+        zip_file = ArchiveCache(cache_dir).fetch(url, sha256)
+        if zip_file is None:
             return None
-        
-        print("📦 Extrayendo archivos...")
-        
-        # Extraer ZIP
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        # Encontrar carpeta extraída
-        extracted_dirs = [d for d in temp_dir.iterdir() if d.is_dir() and d.name.startswith("poppler")]
-        
-        if not extracted_dirs:
-            print("❌ No se encontró la carpeta de Poppler extraída")
+
+        print("📦 Extrayendo bin/ y share/...")
+
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        extracted = extract_needed(zip_file, staging_dir)
+
+        if find_bin_dir(staging_dir) is None:
+            print("❌ Error: pdftoppm.exe no encontrado en el ZIP")
+            shutil.rmtree(staging_dir, ignore_errors=True)
             return None
-        
-        extracted_dir = extracted_dirs[0]
-        
-        # Mover a la ubicación final
+
+        # Reemplazar la instalación anterior solo cuando la nueva está completa
         if poppler_dir.exists():
             shutil.rmtree(poppler_dir)
-        
-        shutil.move(str(extracted_dir), str(poppler_dir))
-        
-        # Limpiar archivos temporales
-        shutil.rmtree(temp_dir)
-        
-        # Verificar instalación
-        bin_dir = poppler_dir / "bin"
-        if not (bin_dir / "pdftoppm.exe").exists():
-            print("❌ Error: pdftoppm.exe no encontrado después de la instalación")
-            return None
-        
-        print("✅ Poppler instalado exitosamente")
+        os.replace(staging_dir, poppler_dir)
+
+        bin_dir = find_bin_dir(poppler_dir)
+        print(f"✅ Poppler instalado exitosamente ({extracted} archivos)")
         print(f"📁 Ubicación: {poppler_dir}")
         print(f"📁 Binarios: {bin_dir}")
-        
+
         return str(bin_dir)
-        
+
     except Exception as e:
         print(f"❌ Error durante la instalación: {e}")
-        
-        # Limpiar en caso de error
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        
+
+        # Limpiar la extracción a medias (la descarga parcial se conserva en la caché)
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
         return None
 
-def main():
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Instalar Poppler en la carpeta del proyecto")
+    parser.add_argument("--url", default=POPPLER_URL, help="URL del ZIP de Poppler")
+    parser.add_argument("--sha256", default=POPPLER_SHA256, help="SHA-256 esperado del ZIP")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR),
+                        help=f"Caché de ZIPs verificados (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--force", action="store_true", help="Reinstalar aunque Poppler ya esté instalado")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Función principal"""
-    
+    args = parse_args(argv)
+
     print("🚀 Iniciando instalación de Poppler...")
     print()
-    
-    bin_path = install_poppler()
-    
+
+    bin_path = install_poppler(args.url, args.sha256, args.cache_dir, force=args.force)
+
     if bin_path:
         print()
         print("🎉 ¡POPPLER INSTALADO EXITOSAMENTE!")
@@ -135,7 +366,7 @@ def main():
         print("3. Ejecuta: python convert_auction_pdf.py")
         print()
         print(f"📁 Poppler instalado en: {bin_path}")
-        
+
         return 0
     else:
         print()
@@ -144,8 +375,8 @@ def main():
         print("1. Instala manualmente desde: https://github.com/oschwartz10612/poppler-windows/releases")
         print("2. O usa conda: conda install -c conda-forge poppler")
         print("3. O usa chocolatey: choco install poppler")
-        
+
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())
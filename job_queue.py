@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Cola de conversiones compartida entre varias máquinas (SQLite, sin broker)
+
+Cada PDF enviado se divide en bloques de páginas (shards). Cualquier número de
+procesos, en esta máquina o en otras que vean la misma carpeta compartida, los
+reclaman con un alquiler (lease) que renuevan con latidos mientras renderizan.
+Si un proceso muere o pierde la red, su alquiler caduca y otro retoma el
+bloque. Cada bloque se renderiza en una carpeta propia (`.shards/`) y al
+terminar sus páginas se mueven a la salida normal `{prefix}_{i:03d}`. El
+proceso que termina el último bloque escribe `{prefix}_complete.json`.
+
+La cola es un archivo SQLite en modo rollback (no WAL, que necesita memoria
+compartida entre procesos y no funciona en carpetas de red); las carpetas
+compartidas deben admitir bloqueos de archivo (NFSv4, SMB). Los PDFs y las
+carpetas de salida deben estar en rutas que vean todas las máquinas.
+
+Uso:
+    python batch_convert.py "catalogs/*.pdf" --output "/srv/auction/{stem}" --queue /srv/auction/queue.sqlite
+    python job_queue.py --queue /srv/auction/queue.sqlite worker --processes 4
+    python job_queue.py --queue /srv/auction/queue.sqlite status
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+from pdf_render import (
+    PDF2IMAGE_AVAILABLE,
+    DEFAULT_WINDOW_SIZE,
+    DEFAULT_WORKERS,
+    find_poppler_path,
+    get_page_count,
+    page_filename,
+    render_chunk,
+)
+from page_pipeline import DEFAULT_ENCODERS
+from page_variants import Variant, variant_filename, write_variants_manifest
+from render_control import RenderControl
+
+DEFAULT_QUEUE = "conversion_queue.sqlite"
+
+# Páginas por bloque: bastantes bloques por PDF para repartirlos entre muchos procesos
+SHARD_PAGES = 8
+
+# Un alquiler dura LEASE_SECONDS y se renueva cada HEARTBEAT_SECONDS
+LEASE_SECONDS = 60.0
+HEARTBEAT_SECONDS = 15.0
+
+# Veces que se reclama un bloque antes de darlo por fallido
+MAX_ATTEMPTS = 3
+
+# Espera entre consultas de un proceso sin trabajo
+POLL_SECONDS = 2.0
+
+# Espera máxima por el bloqueo de la base de datos
+BUSY_TIMEOUT = 60.0
+
+SHARDS_DIR = ".shards"
+MANIFEST_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    pdf TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    dpi INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    variants TEXT,
+    total_pages INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    first_page INTEGER NOT NULL,
+    last_page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    heartbeat REAL,
+    started REAL,
+    finished REAL,
+    seconds REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS shards_claim ON shards (status, job_id, first_page);
+CREATE INDEX IF NOT EXISTS shards_job ON shards (job_id, status);
+"""
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def connect(queue_path):
+    """Conexión con la cola (crea las tablas si no existen)"""
+    connection = sqlite3.connect(str(queue_path), timeout=BUSY_TIMEOUT, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    return connection
+
+@contextmanager
+def immediate(connection):
+    """Transacción que toma el bloqueo de escritura desde el principio"""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+def load_variants(text):
+    """Variantes guardadas en la cola (JSON de Variant.to_dict) o None"""
+    if not text:
+        return None
+    return [Variant(v["name"], v["format"], v["max_width"], v["quality"]) for v in json.loads(text)]
+
+def page_files(prefix, page_no, format_type, variants):
+    """Nombres de los archivos de una página"""
+    if variants:
+        return [variant_filename(prefix, page_no, variant) for variant in variants]
+    return [page_filename(prefix, page_no, format_type)]
+
+def submit_job(queue_path, pdf_path, output_dir, dpi=200, format_type="PNG", prefix="page", variants=None,
+               shard_pages=SHARD_PAGES, poppler_path=None):
+    """
+    Añadir un PDF a la cola, dividido en bloques de `shard_pages` páginas
+
+    Returns:
+        tuple: (id del trabajo, páginas, bloques)
+    """
+    pdf_path = Path(pdf_path).resolve()
+    total_pages = get_page_count(pdf_path, poppler_path=poppler_path)
+    shard_pages = max(1, int(shard_pages))
+    ranges = [(first, min(first + shard_pages - 1, total_pages))
+              for first in range(1, total_pages + 1, shard_pages)]
+
+    connection = connect(queue_path)
+    try:
+        with immediate(connection):
+            job_id = connection.execute(
+                "INSERT INTO jobs (pdf, output_dir, dpi, format, prefix, variants, total_pages, status, submitted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(pdf_path), str(Path(output_dir).resolve()), dpi, format_type.upper(), prefix,
+                 json.dumps([variant.to_dict() for variant in variants]) if variants else None,
+                 total_pages, "pending" if ranges else "done", time.time())).lastrowid
+            connection.executemany(
+                "INSERT INTO shards (job_id, first_page, last_page, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, first, last) for first, last in ranges])
+    finally:
+        connection.close()
+    return job_id, total_pages, len(ranges)
+
+def queue_status(queue_path):
+    """
+    Estado de los trabajos de la cola
+
+    Returns:
+        list: Un dict por trabajo con sus bloques por estado y los procesos que los tienen
+    """
+    connection = connect(queue_path)
+    try:
+        jobs = []
+        now = time.time()
+        for job in connection.execute("SELECT * FROM jobs ORDER BY id"):
+            shards = connection.execute("SELECT * FROM shards WHERE job_id = ?", (job["id"],)).fetchall()
+            counts = {"pending": 0, "leased": 0, "expired": 0, "done": 0, "failed": 0}
+            for shard in shards:
+                expired = shard["status"] == "leased" and shard["lease_until"] < now
+                counts["expired" if expired else shard["status"]] += 1
+            jobs.append({
+                "job": job["id"],
+                "pdf": job["pdf"],
+                "output_dir": job["output_dir"],
+                "status": job["status"],
+                "pages": job["total_pages"],
+                "shards": counts,
+                "workers": sorted({shard["worker"] for shard in shards if shard["status"] == "leased"}),
+                "seconds": round(job["finished"] - job["started"], 3) if job["finished"] and job["started"] else None,
+                "error": job["error"],
+            })
+        return jobs
+    finally:
+        connection.close()
+
+def write_completion_manifest(connection, job_id):
+    """
+    Escribir {prefix}_complete.json cuando todos los bloques de un trabajo terminaron
+
+    Returns:
+        Path: Ruta del manifiesto
+    """
+    job = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    shards = connection.execute("SELECT * FROM shards WHERE job_id = ? ORDER BY first_page", (job_id,)).fetchall()
+    output_dir = Path(job["output_dir"])
+    variants = load_variants(job["variants"])
+
+    pages = []
+    missing = []
+    for page_no in range(1, job["total_pages"] + 1):
+        files = []
+        for name in page_files(job["prefix"], page_no, job["format"], variants):
+            path = output_dir / name
+            if path.is_file():
+                files.append({"file": name, "bytes": path.stat().st_size})
+            else:
+                missing.append(name)
+        pages.append({"page": page_no, "files": files})
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "job": job_id,
+        "pdf": job["pdf"],
+        "settings": {
+            "dpi": job["dpi"],
+            "format": job["format"],
+            "prefix": job["prefix"],
+            "variants": json.loads(job["variants"]) if job["variants"] else None,
+        },
+        "status": job["status"],
+        "pages": pages,
+        "missing": missing,
+        "shards": [
+            {"first_page": shard["first_page"], "last_page": shard["last_page"], "status": shard["status"],
+             "worker": shard["worker"], "attempts": shard["attempts"], "seconds": shard["seconds"],
+             "error": shard["error"]}
+            for shard in shards
+        ],
+        "submitted": datetime.fromtimestamp(job["submitted"]).isoformat(timespec="seconds"),
+        "finished": datetime.fromtimestamp(job["finished"] or time.time()).isoformat(timespec="seconds"),
+        "wall_seconds": round((job["finished"] or time.time()) - (job["started"] or job["submitted"]), 3),
+        "render_seconds": round(sum(shard["seconds"] or 0.0 for shard in shards), 3),
+    }
+    manifest_path = output_dir / f"{job['prefix']}_complete.json"
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+class QueueWorker:
+    """
+    Proceso que reclama bloques de la cola y los renderiza
+
+    Un bloque se reclama si está pendiente o si el alquiler de otro proceso
+    caducó. Mientras se renderiza, un hilo renueva el alquiler; si la
+    renovación falla porque otro proceso ya retomó el bloque, la conversión se
+    cancela en el siguiente límite de página (ver render_control) y sus
+    páginas se descartan. Cada intento escribe en su propia carpeta
+    `.shards/<bloque>-<intento>`, así que un proceso que se creía dueño del
+    bloque nunca pisa las páginas del que lo retomó.
+    """
+
+    def __init__(self, queue_path=DEFAULT_QUEUE, worker_id=None, window_size=DEFAULT_WINDOW_SIZE,
+                 encoders=DEFAULT_ENCODERS, poppler_path=None):
+        self.queue_path = queue_path
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.window_size = window_size
+        self.encoders = encoders
+        self.poppler_path = poppler_path
+        self.connection = connect(queue_path)
+        self.shards_done = 0
+
+    def claim(self):
+        """
+        Reclamar el siguiente bloque (el de menor página del trabajo más antiguo)
+
+        Returns:
+            sqlite3.Row | None: Bloque con los datos de su trabajo, o None si no hay
+        """
+        while True:
+            now = time.time()
+            with immediate(self.connection):
+                shard = self.connection.execute(
+                    "SELECT shards.id AS shard_id, shards.first_page, shards.last_page, shards.attempts, "
+                    "jobs.* FROM shards JOIN jobs ON jobs.id = shards.job_id "
+                    "WHERE jobs.status != 'failed' AND (shards.status = 'pending' "
+                    "OR (shards.status = 'leased' AND shards.lease_until < ?)) "
+                    "ORDER BY shards.job_id, shards.first_page LIMIT 1", (now,)).fetchone()
+                if shard is None:
+                    return None
+                if shard["attempts"] >= MAX_ATTEMPTS:
+                    # El último intento también se quedó sin renovar su alquiler
+                    self._fail(shard, "alquiler caducado en todos los intentos")
+                    continue
+                self.connection.execute(
+                    "UPDATE shards SET status = 'leased', worker = ?, attempts = attempts + 1, "
+                    "lease_until = ?, heartbeat = ?, started = ? WHERE id = ?",
+                    (self.worker_id, now + LEASE_SECONDS, now, now, shard["shard_id"]))
+                self.connection.execute(
+                    "UPDATE jobs SET status = 'running', started = COALESCE(started, ?) "
+                    "WHERE id = ? AND status = 'pending'", (now, shard["id"]))
+                return shard
+
+    def _fail(self, shard, error):
+        self.connection.execute(
+            "UPDATE shards SET status = 'failed', lease_until = NULL, error = ? WHERE id = ?",
+            (error, shard["shard_id"]))
+        self.connection.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = COALESCE(error, ?) WHERE id = ?",
+            (time.time(), f"páginas {shard['first_page']}-{shard['last_page']}: {error}", shard["id"]))
+
+    def _owns(self, shard):
+        row = self.connection.execute(
+            "SELECT status, worker, attempts FROM shards WHERE id = ?", (shard["shard_id"],)).fetchone()
+        return tuple(row) == ("leased", self.worker_id, shard["attempts"] + 1)
+
+    def _heartbeat(self, shard, control, stop):
+        connection = connect(self.queue_path)
+        try:
+            while not stop.wait(HEARTBEAT_SECONDS):
+                now = time.time()
+                try:
+                    renewed = connection.execute(
+                        "UPDATE shards SET lease_until = ?, heartbeat = ? "
+                        "WHERE id = ? AND status = 'leased' AND worker = ? AND attempts = ?",
+                        (now + LEASE_SECONDS, now, shard["shard_id"], self.worker_id,
+                         shard["attempts"] + 1)).rowcount
+                except sqlite3.OperationalError:
+                    # Base de datos ocupada: se reintenta en el siguiente latido
+                    continue
+                if not renewed:
+                    log_message(f"⚠️ Alquiler perdido: páginas {shard['first_page']}-{shard['last_page']}")
+                    control.cancel()
+                    return
+        finally:
+            connection.close()
+
+    def run_shard(self, shard):
+        """Renderizar un bloque reclamado y entregar sus páginas a la salida"""
+        output_dir = Path(shard["output_dir"])
+        staging_dir = output_dir / SHARDS_DIR / f"{shard['shard_id']}-{shard['attempts'] + 1}"
+        variants = load_variants(shard["variants"])
+        control = RenderControl()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(shard, control, stop), daemon=True)
+        heartbeat.start()
+        start = time.perf_counter()
+        try:
+            if not Path(shard["pdf"]).is_file():
+                raise FileNotFoundError(f"PDF no encontrado: {shard['pdf']}")
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            render_chunk(shard["pdf"], str(staging_dir), shard["dpi"], shard["format"], shard["prefix"],
+                         self.window_size, self.poppler_path, self.encoders, variants, False, None, None,
+                         control, shard["first_page"], shard["last_page"])
+        except Exception as e:
+            stop.set()
+            self.release(shard, str(e))
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            log_message(f"❌ {Path(shard['pdf']).name} páginas {shard['first_page']}-{shard['last_page']}: {e}")
+            return False
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if control.cancelled():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return False
+        return self.complete(shard, staging_dir, variants, time.perf_counter() - start)
+
+    def complete(self, shard, staging_dir, variants, seconds):
+        """
+        Mover las páginas del bloque a la salida y marcarlo como terminado
+
+        Se hace en una sola transacción y solo si el alquiler sigue siendo de
+        este proceso. El proceso que termina el último bloque del trabajo
+        escribe el manifiesto de finalización.
+        """
+        output_dir = Path(shard["output_dir"])
+        with immediate(self.connection):
+            if not self._owns(shard):
+                log_message(f"⚠️ Páginas {shard['first_page']}-{shard['last_page']} ya retomadas por otro proceso")
+                owned = False
+            else:
+                owned = True
+                for page_no in range(shard["first_page"], shard["last_page"] + 1):
+                    for name in page_files(shard["prefix"], page_no, shard["format"], variants):
+                        if (staging_dir / name).is_file():
+                            os.replace(staging_dir / name, output_dir / name)
+                now = time.time()
+                self.connection.execute(
+                    "UPDATE shards SET status = 'done', lease_until = NULL, finished = ?, seconds = ?, "
+                    "error = NULL WHERE id = ?", (now, round(seconds, 3), shard["shard_id"]))
+                remaining = self.connection.execute(
+                    "SELECT COUNT(*) FROM shards WHERE job_id = ? AND status != 'done'", (shard["id"],)).fetchone()[0]
+                if remaining == 0:
+                    self.connection.execute("UPDATE jobs SET status = 'done', finished = ? WHERE id = ?",
+                                            (now, shard["id"]))
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        if not owned:
+            return False
+
+        self.shards_done += 1
+        log_message(f"✅ {Path(shard['pdf']).name}: páginas {shard['first_page']}-{shard['last_page']} "
+                    f"en {seconds:.2f} s")
+        if remaining == 0:
+            if variants:
+                write_variants_manifest(output_dir, shard["prefix"], shard["total_pages"], variants, shard["dpi"])
+            manifest_path = write_completion_manifest(self.connection, shard["id"])
+            shutil.rmtree(output_dir / SHARDS_DIR, ignore_errors=True)
+            log_message(f"🏁 Trabajo {shard['id']} terminado: {manifest_path}")
+        return True
+
+    def release(self, shard, error=None):
+        """
+        Devolver un bloque a la cola
+
+        Con `error` el intento cuenta y, si era el último, el bloque y su
+        trabajo quedan fallidos; sin él (el proceso se detiene) el intento no
+        cuenta.
+        """
+        with immediate(self.connection):
+            if not self._owns(shard):
+                return
+            if error is not None and shard["attempts"] + 1 >= MAX_ATTEMPTS:
+                self._fail(shard, error)
+            elif error is not None:
+                self.connection.execute(
+                    "UPDATE shards SET status = 'pending', worker = NULL, lease_until = NULL, error = ? "
+                    "WHERE id = ?", (error, shard["shard_id"]))
+            else:
+                self.connection.execute(
+                    "UPDATE shards SET status = 'pending', worker = NULL, lease_until = NULL, "
+                    "attempts = attempts - 1 WHERE id = ?", (shard["shard_id"],))
+
+    def run(self, idle_exit=False):
+        """
+        Procesar bloques hasta que se interrumpa (o hasta vaciar la cola con `idle_exit`)
+
+        Returns:
+            int: Bloques terminados por este proceso
+        """
+        shard = None
+        try:
+            while True:
+                shard = self.claim()
+                if shard is None:
+                    if idle_exit:
+                        return self.shards_done
+                    time.sleep(POLL_SECONDS)
+                    continue
+                self.run_shard(shard)
+                shard = None
+        except KeyboardInterrupt:
+            if shard is not None:
+                self.release(shard)
+            return self.shards_done
+        finally:
+            self.connection.close()
+
+def _run_worker(queue_path, window_size, encoders, poppler_path, idle_exit):
+    worker = QueueWorker(queue_path, window_size=window_size, encoders=encoders, poppler_path=poppler_path)
+    return worker.run(idle_exit)
+
+def run_workers(queue_path=DEFAULT_QUEUE, processes=DEFAULT_WORKERS, window_size=DEFAULT_WINDOW_SIZE,
+                encoders=DEFAULT_ENCODERS, poppler_path=None, idle_exit=False):
+    """Arrancar `processes` procesos de la cola en esta máquina y esperar a que terminen"""
+    if processes <= 1:
+        return _run_worker(queue_path, window_size, encoders, poppler_path, idle_exit)
+    children = [multiprocessing.Process(target=_run_worker,
+                                        args=(queue_path, window_size, encoders, poppler_path, idle_exit))
+                for _ in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        # Cada proceso recibe también Ctrl+C y devuelve su bloque a la cola
+        for child in children:
+            child.join()
+    return None
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Procesar la cola de conversiones compartida entre varias "
+                                                 "máquinas (los PDFs se envían con batch_convert.py --queue)")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE,
+                        help=f"Base de datos de la cola en la carpeta compartida (default: {DEFAULT_QUEUE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser("worker", help="Procesar bloques de la cola")
+    worker.add_argument("--processes", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos en esta máquina (default: {DEFAULT_WORKERS})")
+    worker.add_argument("--window", type=int, default=DEFAULT_WINDOW_SIZE,
+                        help=f"Páginas decodificadas en memoria por proceso (default: {DEFAULT_WINDOW_SIZE})")
+    worker.add_argument("--encoders", type=int, default=DEFAULT_ENCODERS,
+                        help=f"Hilos de codificación por proceso, 0 = en serie (default: {DEFAULT_ENCODERS})")
+    worker.add_argument("--exit-when-idle", action="store_true",
+                        help="Terminar cuando no quede ningún bloque por reclamar")
+
+    commands.add_parser("status", help="Mostrar el estado de los trabajos (JSON)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+
+    if args.command == "status":
+        print(json.dumps(queue_status(args.queue), indent=2, ensure_ascii=False))
+        return 0
+
+    if not PDF2IMAGE_AVAILABLE:
+        log_message("❌ Error: pdf2image no está instalado")
+        return 2
+    poppler_path = find_poppler_path(Path(__file__).parent)
+
+    log_message(f"⚙️ {max(1, args.processes)} procesos leyendo la cola {args.queue}")
+    run_workers(args.queue, max(1, args.processes), max(1, args.window), args.encoders, poppler_path,
+                args.exit_when_idle)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
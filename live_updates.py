@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Difusión en tiempo real de cambios por lote (Server-Sent Events)
+"""
+
+import json
+import asyncio
+import itertools
+
+# Segundos entre comentarios de keep-alive (detectan también clientes desconectados)
+HEARTBEAT_INTERVAL = 15.0
+
+# Segundos que se espera a que un cliente lento vacíe su socket antes de desconectarlo
+SLOW_CONSUMER_TIMEOUT = 30.0
+
+# Lotes a los que puede suscribirse un cliente a la vez
+MAX_SUBSCRIBED_LOTS = 500
+
+def format_event(event, data, event_id=None):
+    """Codificar un evento SSE"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+class Subscriber:
+    """
+    Cliente conectado al flujo de eventos
+
+    Los cambios pendientes se guardan en un dict por lote: si el cliente va
+    lento, un cambio nuevo de un lote reemplaza al anterior en vez de
+    acumularse, así que la memoria por cliente está acotada por los lotes
+    suscritos y el cliente recibe siempre el último estado.
+    """
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.lots = set()
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, lot, delta):
+        if lot in self.pending:
+            self.dropped += 1
+        self.pending[lot] = delta
+        self.ready.set()
+
+    def take(self):
+        pending, self.pending = self.pending, {}
+        self.ready.clear()
+        return pending
+
+class LiveHub:
+    """
+    Reparto de cambios de lote a los clientes suscritos
+
+    `publish` nunca espera a ningún cliente: solo apunta el cambio en los
+    suscriptores de ese lote y los despierta. Cada conexión vacía su propia
+    cola con `stream`, que es la única que espera al socket (drain), de modo
+    que un cliente lento solo se retrasa a sí mismo.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.by_lot = {}
+        self._ids = itertools.count(1)
+        self.stats = {"published": 0, "delivered": 0, "coalesced": 0, "slow_disconnects": 0}
+
+    def connect(self):
+        subscriber = Subscriber(f"c{next(self._ids)}")
+        self.subscribers[subscriber.client_id] = subscriber
+        return subscriber
+
+    def disconnect(self, subscriber):
+        self.subscribers.pop(subscriber.client_id, None)
+        self.subscribe(subscriber, [])
+
+    def subscribe(self, subscriber, lots):
+        """Reemplazar los lotes que sigue un cliente (los que tiene en pantalla)"""
+        lots = set(list(lots)[:MAX_SUBSCRIBED_LOTS])
+        for lot in subscriber.lots - lots:
+            followers = self.by_lot.get(lot)
+            if followers is not None:
+                followers.discard(subscriber)
+                if not followers:
+                    del self.by_lot[lot]
+        for lot in lots - subscriber.lots:
+            self.by_lot.setdefault(lot, set()).add(subscriber)
+        subscriber.lots = lots
+
+    def publish(self, lot, delta):
+        """Enviar el nuevo estado de un lote a sus suscriptores (no bloquea)"""
+        self.stats["published"] += 1
+        for subscriber in self.by_lot.get(lot, ()):
+            subscriber.push(lot, delta)
+
+    async def stream(self, subscriber, writer):
+        """
+        Escribir los eventos de un cliente hasta que se desconecte
+
+        Args:
+            subscriber (Subscriber): Cliente registrado con connect()
+            writer (asyncio.StreamWriter): Socket del cliente
+        """
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                else:
+                    pending = subscriber.take()
+                    for lot, delta in pending.items():
+                        writer.write(format_event("lot", delta, delta.get("seq")))
+                    self.stats["delivered"] += len(pending)
+                try:
+                    await asyncio.wait_for(writer.drain(), SLOW_CONSUMER_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.stats["slow_disconnects"] += 1
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.stats["coalesced"] += subscriber.dropped
+            self.disconnect(subscriber)
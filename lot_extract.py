@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Extraer los lotes de la subasta del PDF a un catálogo estructurado (JSON + índice SQLite)
+"""
+
+import os
+import re
+import sys
+import html
+import json
+import time
+import sqlite3
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_render import DEFAULT_WORKERS, find_poppler_path, get_page_count, page_filename
+from page_cache import page_fingerprints
+from page_variants import parse_variants, variant_filename
+from page_dedupe import load_page_refs
+
+# Archivos del catálogo, junto a las imágenes de las páginas
+CATALOG_JSON = "catalog.json"
+CATALOG_DB = "catalog.sqlite"
+
+# Caché de lotes por página (hash de la página -> lotes ya extraídos)
+LOTS_CACHE_NAME = ".lots_cache.json"
+
+# Cambiar al modificar el parser para invalidar la caché de lotes
+PARSER_VERSION = 1
+
+# Separación horizontal (en puntos) a partir de la cual dos palabras de la misma línea son columnas distintas
+COLUMN_GAP = 24.0
+
+KNOWN_MAKES = {
+    "ACURA", "AUDI", "BMW", "BUICK", "CADILLAC", "CHERY", "CHEVROLET", "CHRYSLER", "DODGE",
+    "FORD", "GEELY", "GMC", "HONDA", "HYUNDAI", "INFINITI", "ISUZU", "JEEP", "KIA", "LEXUS",
+    "LAND", "MAZDA", "MERCEDES", "MERCEDES-BENZ", "MG", "MITSUBISHI", "NISSAN", "PEUGEOT",
+    "PORSCHE", "RAM", "RENAULT", "SUBARU", "SUZUKI", "TESLA", "TOYOTA", "VOLKSWAGEN", "VOLVO",
+}
+
+_WORD_RE = re.compile(
+    r'<word xMin="([\d.]+)" yMin="([\d.]+)" xMax="([\d.]+)" yMax="([\d.]+)">(.*?)</word>', re.S)
+_PAGE_RE = re.compile(r'<page width="([\d.]+)" height="([\d.]+)">(.*?)</page>', re.S)
+_LOT_RE = re.compile(r"^LOT\b\s*(?:NO\.?|#)?\s*:?\s*(\d+)\b", re.I)
+_YEAR_RE = re.compile(r"\b(19[5-9]\d|20\d\d)\b")
+_MILEAGE_RE = re.compile(r"\b(\d{1,3}(?:[,.]\d{3})+|\d+)\s*(KM|KMS|MI|MILES)\b", re.I)
+# \b solo antes de las siglas: "$" no es una letra y "\b$" no coincidiría tras un espacio
+_PRICE_RE = re.compile(r"(?:\b(AED|USD|SAR|EUR)|(\$))\s*(\d{1,3}(?:[,.]\d{3})+|\d+)\b", re.I)
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def _number(text):
+    return int(re.sub(r"[,.]", "", text))
+
+def read_page_words(pdf_path, page_no, poppler_path=None):
+    """
+    Leer las palabras de una página con su posición (pdftotext -bbox)
+
+    Returns:
+        tuple: (ancho, alto, lista de (x0, y0, x1, y1, texto)) en puntos
+    """
+    tool = os.path.join(poppler_path, "pdftotext") if poppler_path else "pdftotext"
+    completed = subprocess.run(
+        [tool, "-bbox", "-f", str(page_no), "-l", str(page_no), str(pdf_path), "-"],
+        capture_output=True, check=True,
+    )
+    output = completed.stdout.decode("utf-8", errors="replace")
+    page = _PAGE_RE.search(output)
+    if page is None:
+        return 0.0, 0.0, []
+
+    words = [
+        (float(x0), float(y0), float(x1), float(y1), html.unescape(text))
+        for x0, y0, x1, y1, text in _WORD_RE.findall(page.group(3))
+    ]
+    return float(page.group(1)), float(page.group(2)), words
+
+def group_lines(words):
+    """
+    Agrupar palabras en segmentos de línea
+
+    Las palabras con la misma altura forman una línea; dentro de la línea, un
+    hueco mayor que COLUMN_GAP separa columnas (p. ej. pies de foto en una
+    cuadrícula). Devuelve los segmentos en orden de lectura.
+
+    Returns:
+        list: (x0, y0, x1, y1, texto) por segmento
+    """
+    lines = []
+    for word in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        middle = (word[1] + word[3]) / 2
+        if lines and abs(middle - lines[-1]["middle"]) <= (word[3] - word[1]) / 2:
+            lines[-1]["words"].append(word)
+        else:
+            lines.append({"middle": middle, "words": [word]})
+
+    segments = []
+    for line in lines:
+        current = []
+        for word in sorted(line["words"], key=lambda w: w[0]):
+            if current and word[0] - current[-1][2] > COLUMN_GAP:
+                segments.append(current)
+                current = []
+            current.append(word)
+        segments.append(current)
+
+    return [
+        (min(w[0] for w in seg), min(w[1] for w in seg), max(w[2] for w in seg),
+         max(w[3] for w in seg), " ".join(w[4] for w in seg))
+        for seg in segments
+    ]
+
+def parse_lot_text(text):
+    """
+    Leer los campos de un lote a partir de su texto
+
+    Ejemplo: "LOT 12 2019 TOYOTA CAMRY 35,000 KM AED 15,000"
+
+    Returns:
+        dict | None: Campos del lote, o None si el texto no empieza por un número de lote
+    """
+    match = _LOT_RE.match(text.strip())
+    if match is None:
+        return None
+
+    rest = text.strip()[match.end():]
+    lot = {
+        "lot": int(match.group(1)),
+        "year": None,
+        "make": None,
+        "model": None,
+        "mileage_km": None,
+        "starting_price": None,
+        "currency": None,
+    }
+
+    mileage = _MILEAGE_RE.search(rest)
+    if mileage:
+        value = _number(mileage.group(1))
+        lot["mileage_km"] = round(value * 1.609344) if mileage.group(2).upper().startswith("MI") else value
+
+    price = _PRICE_RE.search(rest)
+    if price:
+        lot["currency"] = "USD" if price.group(2) else price.group(1).upper()
+        lot["starting_price"] = _number(price.group(3))
+
+    # Marca y modelo: las palabras tras el año, hasta el kilometraje o el precio
+    year = _YEAR_RE.search(rest)
+    if year:
+        lot["year"] = int(year.group(1))
+        end = min([m.start() for m in (mileage, price) if m and m.start() > year.end()] or [len(rest)])
+        vehicle = rest[year.end():end].split()
+        if vehicle:
+            make_words = 2 if vehicle[0].upper() == "LAND" and len(vehicle) > 1 else 1
+            if vehicle[0].upper() in KNOWN_MAKES or len(vehicle) > 1:
+                lot["make"] = " ".join(vehicle[:make_words]).title()
+                lot["model"] = " ".join(vehicle[make_words:]).title() or None
+
+    parts = [str(lot["year"]) if lot["year"] else None, lot["make"], lot["model"]]
+    lot["title"] = " ".join(part for part in parts if part) or f"Lot {lot['lot']}"
+    return lot
+
+def extract_page_lots(pdf_path, page_no, poppler_path=None):
+    """
+    Extraer los lotes de una página
+
+    Cada segmento que empieza por "LOT n" abre un lote nuevo; los segmentos
+    siguientes se añaden al lote de la misma columna, de modo que un lote
+    puede ocupar varias líneas.
+
+    Returns:
+        list: Lotes de la página con su texto y su rectángulo relativo a la página
+    """
+    width, height, words = read_page_words(pdf_path, page_no, poppler_path=poppler_path)
+    lots = []
+    for x0, y0, x1, y1, text in group_lines(words):
+        if _LOT_RE.match(text):
+            lots.append({"text": text, "box": [x0, y0, x1, y1]})
+            continue
+
+        # Continuación: el último lote cuya columna se solapa con el segmento
+        for lot in reversed(lots):
+            if x0 < lot["box"][2] and x1 > lot["box"][0]:
+                lot["text"] += " " + text
+                box = lot["box"]
+                lot["box"] = [min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1)]
+                break
+
+    results = []
+    for lot in lots:
+        fields = parse_lot_text(lot["text"])
+        if fields is None:
+            continue
+        x0, y0, x1, y1 = lot["box"]
+        fields["page"] = page_no
+        fields["text"] = lot["text"]
+        if width and height:
+            fields["bbox"] = [round(x0 / width, 4), round(y0 / height, 4),
+                              round(x1 / width, 4), round(y1 / height, 4)]
+        results.append(fields)
+    return results
+
+def _page_images(page_no, prefix, format_type, variants):
+    if variants:
+        return {variant.name: variant_filename(prefix, page_no, variant) for variant in variants}
+    return {"page": page_filename(prefix, page_no, format_type)}
+
+def _load_cache(output_dir):
+    try:
+        with open(Path(output_dir) / LOTS_CACHE_NAME, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("pages", {}) if cache.get("version") == PARSER_VERSION else {}
+
+def _write_atomic(path, write):
+    temp_path = path.with_name(path.name + ".tmp")
+    if temp_path.exists():
+        temp_path.unlink()
+    write(temp_path)
+    os.replace(temp_path, path)
+
+def write_catalog_db(db_path, lots):
+    """Escribir el índice SQLite de lotes (se reemplaza completo de forma atómica)"""
+    def write(temp_path):
+        connection = sqlite3.connect(temp_path)
+        try:
+            with connection:
+                connection.execute("""
+                    CREATE TABLE lots (
+                        lot INTEGER PRIMARY KEY,
+                        title TEXT NOT NULL,
+                        make TEXT,
+                        model TEXT,
+                        year INTEGER,
+                        mileage_km INTEGER,
+                        starting_price INTEGER,
+                        currency TEXT,
+                        page INTEGER NOT NULL,
+                        image TEXT,
+                        images TEXT,
+                        bbox TEXT,
+                        text TEXT
+                    )""")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO lots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(lot["lot"], lot["title"], lot["make"], lot["model"], lot["year"],
+                      lot["mileage_km"], lot["starting_price"], lot["currency"], lot["page"],
+                      lot["image"], json.dumps(lot["images"]), json.dumps(lot.get("bbox")), lot["text"])
+                     for lot in lots])
+                connection.execute("CREATE INDEX lots_make_model ON lots (make, model)")
+                connection.execute("CREATE INDEX lots_year ON lots (year)")
+                connection.execute("CREATE INDEX lots_price ON lots (starting_price)")
+                connection.execute("CREATE INDEX lots_page ON lots (page)")
+        finally:
+            connection.close()
+
+    _write_atomic(Path(db_path), write)
+
+def extract_lots(pdf_path, output_dir, prefix="page", format_type="PNG", variants=None,
+                 workers=DEFAULT_WORKERS, poppler_path=None, total_pages=None):
+    """
+    Extraer todos los lotes del PDF y escribir catalog.json y catalog.sqlite
+
+    Las páginas se leen en paralelo con pdftotext. Cada página se guarda en
+    una caché con su hash de contenido (el mismo que usa la conversión
+    incremental), así que al volver a publicar un catálogo solo se leen las
+    páginas que cambiaron. Cada lote se enlaza con la imagen de su página.
+
+    Args:
+        pdf_path (str): Ruta del archivo PDF
+        output_dir (str): Carpeta de las imágenes, donde se escribe el catálogo
+        prefix (str): Prefijo de los archivos de página
+        format_type (str): Formato de las imágenes de página
+        variants (list): Variantes de salida por página (opcional)
+        workers (int): Páginas leídas a la vez
+        poppler_path (str): Carpeta de binarios de Poppler (opcional)
+        total_pages (int): Número de páginas, si ya se conoce
+
+    Returns:
+        dict: Resumen (lotes, páginas leídas, páginas reaprovechadas, rutas)
+    """
+    pdf_path = Path(pdf_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    if total_pages is None:
+        total_pages = get_page_count(pdf_path, poppler_path=poppler_path)
+    fingerprints = page_fingerprints(pdf_path, total_pages)
+    cache = _load_cache(output_dir)
+
+    page_lots = {}
+    pending = []
+    for page_no, fingerprint in enumerate(fingerprints, 1):
+        entry = cache.get(fingerprint)
+        if entry is not None:
+            page_lots[page_no] = [dict(lot, page=page_no) for lot in entry]
+        else:
+            pending.append((page_no, fingerprint))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(pending)))) as executor:
+            results = executor.map(lambda item: extract_page_lots(pdf_path, item[0], poppler_path),
+                                   pending)
+            for (page_no, _), lots in zip(pending, results):
+                page_lots[page_no] = lots
+
+    # Una página repetida que no se guardó (page_dedupe) usa la imagen de la original
+    _, duplicates = load_page_refs(output_dir, prefix)
+    lots = {}
+    for page_no in range(1, total_pages + 1):
+        images = _page_images(duplicates.get(page_no, page_no), prefix, format_type, variants)
+        for lot in page_lots.get(page_no, []):
+            lot = dict(lot, images=images, image=next(iter(images.values())))
+            # Un número de lote repetido (p. ej. en el índice del catálogo) conserva su primera aparición
+            lots.setdefault(lot["lot"], lot)
+    lots = [lots[number] for number in sorted(lots)]
+
+    catalog = {
+        "pdf": pdf_path.name,
+        "pages": total_pages,
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "lots": lots,
+    }
+    json_path = output_dir / CATALOG_JSON
+    db_path = output_dir / CATALOG_DB
+
+    def write_json(temp_path):
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(catalog, file, ensure_ascii=False, separators=(",", ":"))
+
+    _write_atomic(json_path, write_json)
+    write_catalog_db(db_path, lots)
+
+    # La caché queda con las páginas actuales; las de versiones anteriores se descartan
+    new_cache = {
+        fingerprint: [{k: v for k, v in lot.items() if k != "page"} for lot in page_lots[page_no]]
+        for page_no, fingerprint in enumerate(fingerprints, 1)
+    }
+
+    def write_cache(temp_path):
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": PARSER_VERSION, "pages": new_cache}, file, separators=(",", ":"))
+
+    _write_atomic(output_dir / LOTS_CACHE_NAME, write_cache)
+
+    return {
+        "lots": len(lots),
+        "pages": total_pages,
+        "parsed_pages": len(pending),
+        "cached_pages": total_pages - len(pending),
+        "seconds": round(time.perf_counter() - start, 3),
+        "json": json_path,
+        "db": db_path,
+    }
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Extraer los lotes del PDF de subasta a catalog.json y catalog.sqlite")
+    parser.add_argument("pdf", help="PDF del catálogo")
+    parser.add_argument("--output", default="auction_images",
+                        help="Carpeta de las imágenes de página, donde se escribe el catálogo (default: auction_images)")
+    parser.add_argument("--prefix", default="auction_page", help="Prefijo de las imágenes (default: auction_page)")
+    parser.add_argument("--format", dest="format_type", default="PNG", type=str.upper,
+                        choices=["PNG", "JPEG", "TIFF"], help="Formato de las imágenes (default: PNG)")
+    parser.add_argument("--variants", type=parse_variants, default=None,
+                        help="Variantes generadas por página, p. ej. \"thumb:webp:320,large:jpeg:1024,full:png\"")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Páginas leídas en paralelo (default: {DEFAULT_WORKERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    if not Path(args.pdf).is_file():
+        log_message(f"❌ Error: PDF no encontrado: {args.pdf}")
+        return 1
+
+    try:
+        result = extract_lots(args.pdf, args.output, prefix=args.prefix, format_type=args.format_type,
+                              variants=args.variants, workers=max(1, args.workers),
+                              poppler_path=find_poppler_path(Path(__file__).parent))
+    except Exception as e:
+        log_message(f"❌ Error extrayendo lotes: {e}")
+        return 1
+
+    log_message(f"🏷️ {result['lots']} lotes en {result['pages']} páginas "
+                f"({result['parsed_pages']} leídas, {result['cached_pages']} sin cambios) "
+                f"en {result['seconds']:.1f} s")
+    log_message(f"🗂️ Catálogo: {result['json']} y {result['db']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Archivo único con todas las páginas de un catálogo (`{prefix}.pages`)
+
+Cientos de imágenes sueltas gastan inodos, hacen lenta la copia a los
+servidores web y obligan a muchas lecturas pequeñas. Este formato guarda todas
+las páginas y variantes en un solo archivo al que solo se le añaden datos:
+
+    PGARCHV1 | bytes de cada archivo... | meta JSON | índice | pie (40 bytes)
+
+El índice es una tabla de entradas de tamaño fijo (offset, longitud, CRC32),
+una por página y variante: la entrada de la página p en la variante v está en
+la posición (p - 1) * variantes + v, así que encontrar una página es una sola
+lectura. El pie, al final del archivo, indica dónde empiezan el índice y los
+metadatos. Al volver a empaquetar solo se añaden los archivos que cambiaron,
+seguidos de un índice y un pie nuevos; el índice anterior queda como espacio
+muerto y un lector que ya tenía el archivo abierto sigue viendo su versión.
+El pie se escribe después de sincronizar los datos y el índice: si el proceso
+muere a mitad de una actualización, el final del archivo no es un pie válido y
+el lector usa el último pie completo, es decir, la versión anterior.
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import zlib
+import struct
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+from page_dedupe import load_page_refs
+from page_variants import parse_variants
+
+ARCHIVE_SUFFIX = ".pages"
+ARCHIVE_VERSION = 1
+MAGIC = b"PGARCHV1"
+FOOTER_MAGIC = b"PGINDEX1"
+
+# offset, longitud, CRC32 (4 bytes de relleno para alinear a 8)
+ENTRY = struct.Struct("<QQI4x")
+# offset del índice, offset y longitud de los metadatos, páginas, variantes, marca
+FOOTER = struct.Struct("<QQIII4x8s")
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def archive_path_for(output_dir, prefix="page"):
+    """Ruta del archivo de páginas de una carpeta de salida: {prefix}.pages"""
+    return Path(output_dir) / f"{prefix}{ARCHIVE_SUFFIX}"
+
+def archive_slots(format_type="PNG", variants=None):
+    """
+    Variantes que guarda el archivo, en el orden del índice
+
+    Sin variantes hay una sola, sin nombre: el archivo {prefix}_{i:03d}.{formato}.
+    """
+    if variants:
+        return [{"name": variant.name, "extension": variant.extension} for variant in variants]
+    return [{"name": "", "extension": format_type.lower()}]
+
+def slot_filename(prefix, page_no, slot):
+    """Nombre del archivo suelto equivalente (como page_filename y variant_filename)"""
+    if slot["name"]:
+        return f"{prefix}_{page_no:03d}_{slot['name']}.{slot['extension']}"
+    return f"{prefix}_{page_no:03d}.{slot['extension']}"
+
+class PageArchive:
+    """
+    Lector de un archivo de páginas mapeado en memoria
+
+    `page()` devuelve un memoryview sobre el mapa, sin copiar los bytes. Los
+    memoryview devueltos deben liberarse (o dejar de usarse) antes de llamar a
+    `close()`; un servidor que recarga el archivo puede simplemente soltar la
+    instancia anterior y el mapa se cierra cuando ya nadie lo usa.
+
+    Si el final del archivo es una actualización cortada a medias, se usa la
+    última versión completa; `end` es donde termina y `torn_bytes` lo que
+    sobra detrás.
+
+    Raises:
+        ValueError: Si el archivo no es un archivo de páginas válido
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < len(MAGIC) + FOOTER.size:
+                raise ValueError(f"No es un archivo de páginas: {self.path}")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._map[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"No es un archivo de páginas: {self.path}")
+            end = len(self._map)
+            while True:
+                try:
+                    index_offset, meta, pages = self._read_footer(end)
+                    break
+                except (ValueError, KeyError, struct.error):
+                    # Buscar el pie anterior a una actualización cortada
+                    found = self._map.rfind(FOOTER_MAGIC, len(MAGIC), end - 1)
+                    if found < 0:
+                        raise ValueError(f"No es un archivo de páginas: {self.path}") from None
+                    end = found + len(FOOTER_MAGIC)
+        except (ValueError, KeyError, struct.error):
+            self._map.close()
+            raise
+
+        self.end = end
+        self.torn_bytes = len(self._map) - end
+        self.prefix = meta["prefix"]
+        self.slots = meta["slots"]
+        self.page_count = pages
+        self.created = meta.get("created")
+        self._slot_index = {slot["name"]: index for index, slot in enumerate(self.slots)}
+        self._view = memoryview(self._map)
+        self._index = self._view[index_offset:index_offset + pages * len(self.slots) * ENTRY.size]
+        self.names = {slot_filename(self.prefix, page_no, slot): (page_no, index)
+                      for page_no in range(1, pages + 1) for index, slot in enumerate(self.slots)}
+
+    def _read_footer(self, end):
+        """(offset del índice, metadatos, páginas) de la versión que termina en `end`"""
+        if end < len(MAGIC) + FOOTER.size:
+            raise ValueError(f"No es un archivo de páginas: {self.path}")
+        footer_offset = end - FOOTER.size
+        index_offset, meta_offset, meta_length, pages, slot_count, magic = FOOTER.unpack_from(
+            self._map, footer_offset)
+        # El índice va justo antes del pie y los metadatos justo antes del índice
+        if (magic != FOOTER_MAGIC or meta_offset < len(MAGIC) or meta_offset + meta_length != index_offset
+                or index_offset + pages * slot_count * ENTRY.size != footer_offset):
+            raise ValueError(f"Pie de índice no válido: {self.path}")
+        meta = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        if meta.get("version") != ARCHIVE_VERSION or len(meta["slots"]) != slot_count:
+            raise ValueError(f"Versión de archivo de páginas no soportada: {self.path}")
+        return index_offset, meta, pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def size(self):
+        return len(self._map)
+
+    def entry(self, page_no, slot=0):
+        """(offset, longitud, crc32) de una página y variante, o None si no está guardada"""
+        if not 1 <= page_no <= self.page_count:
+            return None
+        entry = ENTRY.unpack_from(self._index, ((page_no - 1) * len(self.slots) + slot) * ENTRY.size)
+        return entry if entry[1] else None
+
+    def page(self, page_no, variant=None):
+        """
+        Bytes de una página como memoryview (sin copia)
+
+        Args:
+            variant (str): Nombre de la variante (None = la primera)
+
+        Returns:
+            memoryview | None: None si la página no está en el archivo
+        """
+        entry = self.entry(page_no, self._slot_index[variant] if variant is not None else 0)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        return self._view[offset:offset + length]
+
+    def find(self, filename):
+        """(página, índice de variante) del archivo suelto `filename`, o None"""
+        return self.names.get(filename)
+
+    def lookup(self, filename):
+        """
+        Bytes del archivo suelto `filename` sin copia, para servirlos
+
+        Returns:
+            tuple | None: (memoryview, crc32), o None si no está en el archivo
+        """
+        found = self.names.get(filename)
+        entry = self.entry(*found) if found else None
+        if entry is None:
+            return None
+        offset, length, crc = entry
+        return self._view[offset:offset + length], crc
+
+    def entries(self):
+        """Todas las entradas guardadas: (página, variante) -> (offset, longitud, crc32)"""
+        found = {}
+        for page_no in range(1, self.page_count + 1):
+            for slot in range(len(self.slots)):
+                entry = self.entry(page_no, slot)
+                if entry is not None:
+                    found[(page_no, slot)] = entry
+        return found
+
+    def live_bytes(self):
+        """Bytes de datos a los que apunta el índice actual (las páginas repetidas cuentan una vez)"""
+        return sum(length for _, length, _ in set(self.entries().values()))
+
+    def close(self):
+        self._index.release()
+        self._view.release()
+        self._map.close()
+
+class PageArchiveWriter:
+    """
+    Escritor de un archivo de páginas
+
+    Si el archivo ya existe con el mismo prefijo y variantes, se abre para
+    añadir: los archivos iguales (misma longitud y CRC32) no se vuelven a
+    escribir. Si no existe, es de otra configuración o más de la mitad de su
+    contenido ya no se usa, se escribe uno nuevo en `{nombre}.tmp` que
+    reemplaza al anterior al cerrar. Lo que quedó detrás del último pie válido
+    (una actualización cortada) se recorta antes de añadir.
+    """
+
+    def __init__(self, path, prefix, slots):
+        self.path = Path(path)
+        self.prefix = prefix
+        self.slots = list(slots)
+        self.entries = {}
+        self.added = 0
+        self.added_bytes = 0
+        self._slot_index = {slot["name"]: index for index, slot in enumerate(self.slots)}
+        self._file = None
+        self._target = None
+        self._start_size = None
+        self._previous = None
+
+    def _existing_entries(self):
+        try:
+            with PageArchive(self.path) as archive:
+                if archive.prefix != self.prefix or archive.slots != self.slots:
+                    return None
+                if archive.live_bytes() * 2 < archive.end - len(MAGIC):
+                    return None
+                return archive.entries(), archive.page_count, archive.end
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def open(self):
+        existing = self._existing_entries() if self.path.is_file() else None
+        if existing is not None:
+            entries, page_count, end = existing
+            self.entries = dict(entries)
+            self._previous = (entries, page_count)
+            self._target = self.path
+            self._file = open(self.path, "r+b")
+            self._file.truncate(end)
+            self._start_size = self._file.seek(end)
+        else:
+            self._target = self.path.with_name(self.path.name + ".tmp")
+            self._file = open(self._target, "wb")
+            self._file.write(MAGIC)
+        return self
+
+    def add(self, page_no, variant, data):
+        """
+        Añadir los bytes de una página y variante
+
+        Returns:
+            bool: False si el archivo ya guardaba exactamente esos bytes
+        """
+        key = (page_no, self._slot_index[variant])
+        crc = zlib.crc32(data)
+        previous = self.entries.get(key)
+        if previous is not None and previous[1] == len(data) and previous[2] == crc:
+            return False
+        offset = self._file.tell()
+        self._file.write(data)
+        self.entries[key] = (offset, len(data), crc)
+        self.added += 1
+        self.added_bytes += len(data)
+        return True
+
+    def remove(self, page_no, variant):
+        """Quitar una página y variante del índice (p. ej. una página que ahora está en blanco)"""
+        self.entries.pop((page_no, self._slot_index[variant]), None)
+
+    def alias(self, page_no, same_as):
+        """Hacer que una página repetida apunte a los bytes de la original (sin copiarlos)"""
+        for slot in range(len(self.slots)):
+            entry = self.entries.get((same_as, slot))
+            if entry is None:
+                self.entries.pop((page_no, slot), None)
+            else:
+                self.entries[(page_no, slot)] = entry
+
+    def close(self, page_count):
+        """Escribir metadatos, índice y pie; las páginas por encima de `page_count` se descartan"""
+        if self._previous == (self.entries, page_count):
+            # Nada cambió: el índice que ya tiene el archivo sigue valiendo
+            self._file.close()
+            self._file = None
+            return
+        meta = json.dumps({
+            "version": ARCHIVE_VERSION,
+            "prefix": self.prefix,
+            "slots": self.slots,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }).encode("utf-8")
+        empty = (0, 0, 0)
+        index = bytearray(page_count * len(self.slots) * ENTRY.size)
+        for page_no in range(1, page_count + 1):
+            for slot in range(len(self.slots)):
+                entry = self.entries.get((page_no, slot), empty)
+                ENTRY.pack_into(index, ((page_no - 1) * len(self.slots) + slot) * ENTRY.size, *entry)
+
+        meta_offset = self._file.tell()
+        self._file.write(meta)
+        index_offset = self._file.tell()
+        self._file.write(index)
+        # Datos e índice en disco antes del pie: un pie válido nunca apunta a bytes perdidos
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.write(FOOTER.pack(index_offset, meta_offset, len(meta), page_count, len(self.slots),
+                                     FOOTER_MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        if self._target != self.path:
+            os.replace(self._target, self.path)
+
+    def abort(self):
+        """Descartar lo añadido: se borra el archivo nuevo o se recorta el existente a su tamaño anterior"""
+        if self._file is None:
+            return
+        if self._target == self.path:
+            self._file.truncate(self._start_size)
+            self._file.close()
+        else:
+            self._file.close()
+            try:
+                self._target.unlink()
+            except FileNotFoundError:
+                pass
+        self._file = None
+
+_PAGE_NUMBER_RE = re.compile(r"_(\d{3,})(?:_[^.]+)?\.[^.]+$")
+
+def _count_pages(output_dir, prefix, slots):
+    last = 0
+    for slot in slots:
+        pattern = f"{prefix}_*_{slot['name']}.{slot['extension']}" if slot["name"] else \
+            f"{prefix}_*.{slot['extension']}"
+        for path in Path(output_dir).glob(pattern):
+            match = _PAGE_NUMBER_RE.search(path.name[len(prefix):])
+            if match:
+                last = max(last, int(match.group(1)))
+    return last
+
+def pack_pages(output_dir, prefix="page", format_type="PNG", variants=None, total_pages=None,
+               archive_path=None):
+    """
+    Empaquetar las páginas de una carpeta de salida en {prefix}.pages
+
+    Las páginas repetidas anotadas por page_dedupe apuntan a los bytes de la
+    original y las páginas en blanco quedan sin entrada.
+
+    Args:
+        total_pages (int): Páginas del documento (default: la última encontrada en la carpeta)
+        archive_path (str): Archivo de destino (default: {output_dir}/{prefix}.pages)
+
+    Returns:
+        dict: path, pages, files (entradas guardadas), added (archivos escritos
+            en esta llamada), added_bytes y bytes (tamaño del archivo)
+    """
+    output_dir = Path(output_dir)
+    slots = archive_slots(format_type, variants)
+    blank, duplicates = load_page_refs(output_dir, prefix)
+    if total_pages is None:
+        total_pages = max([_count_pages(output_dir, prefix, slots), *blank, *duplicates])
+    archive_path = Path(archive_path) if archive_path else archive_path_for(output_dir, prefix)
+
+    writer = PageArchiveWriter(archive_path, prefix, slots).open()
+    try:
+        for page_no in range(1, total_pages + 1):
+            if page_no in duplicates:
+                continue
+            for slot in slots:
+                image_path = output_dir / slot_filename(prefix, page_no, slot)
+                try:
+                    data = image_path.read_bytes()
+                except FileNotFoundError:
+                    writer.remove(page_no, slot["name"])
+                    continue
+                writer.add(page_no, slot["name"], data)
+        for page_no, original in duplicates.items():
+            if page_no <= total_pages:
+                writer.alias(page_no, original)
+        writer.close(total_pages)
+    except BaseException:
+        writer.abort()
+        raise
+
+    return {
+        "path": archive_path,
+        "pages": total_pages,
+        "files": sum(1 for page_no, _ in writer.entries if page_no <= total_pages),
+        "added": writer.added,
+        "added_bytes": writer.added_bytes,
+        "bytes": archive_path.stat().st_size,
+    }
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Empaquetar las páginas convertidas en un solo archivo .pages")
+    parser.add_argument("output", nargs="?", default="auction_images",
+                        help="Carpeta de las imágenes convertidas (default: auction_images)")
+    parser.add_argument("--prefix", default="page", help="Prefijo de los archivos (default: page)")
+    parser.add_argument("--format", dest="format_type", default="PNG", type=str.upper,
+                        choices=["PNG", "JPEG", "TIFF"], help="Formato de las páginas (default: PNG)")
+    parser.add_argument("--variants", type=parse_variants, default=None,
+                        help="Variantes de la conversión, p. ej. \"thumb:webp:320,full:png\"")
+    parser.add_argument("--archive", default=None,
+                        help="Archivo de destino (default: <carpeta>/<prefijo>.pages)")
+    parser.add_argument("--list", action="store_true", help="Mostrar el contenido de un archivo ya creado")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    archive_path = Path(args.archive) if args.archive else archive_path_for(args.output, args.prefix)
+
+    if args.list:
+        try:
+            archive = PageArchive(archive_path)
+        except (OSError, ValueError) as e:
+            log_message(f"❌ Error: {e}")
+            return 1
+        with archive:
+            for name, (page_no, slot) in archive.names.items():
+                entry = archive.entry(page_no, slot)
+                if entry is not None:
+                    print(f"{name}\t{entry[1]}\t{entry[2]:08x}")
+            log_message(f"🗃️ {archive.page_count} páginas, {len(archive.slots)} variantes, "
+                        f"{archive.size / (1024 * 1024):.2f} MB")
+        return 0
+
+    if not Path(args.output).is_dir():
+        log_message(f"❌ Error: carpeta no encontrada: {args.output}")
+        return 1
+    result = pack_pages(args.output, args.prefix, args.format_type, args.variants, archive_path=archive_path)
+    log_message(f"🗃️ {result['files']} archivos de {result['pages']} páginas en {result['path']} "
+                f"({result['added']} nuevos o cambiados, {result['bytes'] / (1024 * 1024):.2f} MB)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
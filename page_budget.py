@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de píxeles o de bytes por página: un DPI distinto para cada página
+
+Con un DPI fijo una página A3 desplegable da una imagen cuatro veces mayor que
+una A5. Con un presupuesto cada página se renderiza al DPI que la deja en el
+número de píxeles (o el tamaño de archivo) indicado, sea cual sea su tamaño.
+"""
+
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Límites del DPI elegido para una página
+MIN_DPI = 36
+MAX_DPI = 600
+
+# Bytes por píxel de partida de cada formato, si no se puede medir una página de muestra
+DEFAULT_BYTES_PER_PIXEL = {"png": 1.0, "jpeg": 0.3, "tiff": 3.0}
+
+_UNITS = {
+    "px": ("pixels", 1), "mp": ("pixels", 1_000_000),
+    "b": ("bytes", 1), "kb": ("bytes", 1024), "mb": ("bytes", 1024 * 1024),
+}
+
+class PageBudget:
+    """
+    Presupuesto por página
+
+    Attributes:
+        pixels (int): Píxeles por página (None si el presupuesto es de bytes)
+        max_bytes (int): Tamaño máximo del archivo de cada página (None si es de píxeles)
+        bytes_per_pixel (float): Estimación usada para pasar de bytes a píxeles
+    """
+
+    def __init__(self, pixels=None, max_bytes=None):
+        if (pixels is None) == (max_bytes is None):
+            raise ValueError("El presupuesto es de píxeles o de bytes")
+        self.pixels = pixels
+        self.max_bytes = max_bytes
+        self.bytes_per_pixel = None
+
+    @property
+    def key(self):
+        """Texto estable para la caché incremental (ocupa el lugar del DPI)"""
+        return f"px:{self.pixels}" if self.pixels else f"bytes:{self.max_bytes}"
+
+    def target_pixels(self, format_type):
+        if self.pixels:
+            return self.pixels
+        bytes_per_pixel = self.bytes_per_pixel or DEFAULT_BYTES_PER_PIXEL.get(format_type.lower(), 1.0)
+        return self.max_bytes / bytes_per_pixel
+
+    def page_dpi(self, width_pt, height_pt, format_type="PNG"):
+        """DPI con el que una página de `width_pt` x `height_pt` puntos cabe en el presupuesto"""
+        dpi = 72 * math.sqrt(self.target_pixels(format_type) / max(1.0, width_pt * height_pt))
+        return int(min(MAX_DPI, max(MIN_DPI, math.floor(dpi))))
+
+    def to_dict(self):
+        return {"pixels": self.pixels, "max_bytes": self.max_bytes,
+                "bytes_per_pixel": self.bytes_per_pixel}
+
+    def __str__(self):
+        if self.pixels:
+            return f"{self.pixels / 1_000_000:g} MP por página"
+        return f"{self.max_bytes / 1024:g} KB por página"
+
+def parse_budget(spec):
+    """
+    Leer un presupuesto: "4mp", "6000000px", "800kb", "1.5mb"
+
+    Raises:
+        ValueError: Si el texto no es un presupuesto válido
+    """
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([a-zA-Z]+)\s*", spec or "")
+    if not match or match.group(2).lower() not in _UNITS:
+        raise ValueError(f"Presupuesto inválido: {spec!r} (p. ej. 4mp, 6000000px, 800kb, 1.5mb)")
+    kind, factor = _UNITS[match.group(2).lower()]
+    value = int(float(match.group(1)) * factor)
+    if value <= 0:
+        raise ValueError(f"Presupuesto inválido: {spec!r}")
+    return PageBudget(**{"pixels" if kind == "pixels" else "max_bytes": value})
+
+def plan_page_dpi(page_sizes, budget, format_type="PNG"):
+    """
+    Elegir el DPI de cada página
+
+    Args:
+        page_sizes (dict): Página -> (ancho, alto) en puntos (ver pdf_render.get_page_sizes)
+        budget (PageBudget): Presupuesto por página
+
+    Returns:
+        dict: Página -> DPI
+    """
+    return {page_no: budget.page_dpi(width, height, format_type)
+            for page_no, (width, height) in page_sizes.items()}
+
+def budget_manifest_filename(prefix):
+    """Manifiesto del presupuesto: {prefix}_budget.json"""
+    return f"{prefix}_budget.json"
+
+def write_budget_manifest(output_dir, prefix, budget, page_sizes, page_dpi, page_files):
+    """
+    Escribir {prefix}_budget.json con el DPI elegido para cada página
+
+    `effective_dpi` es el DPI real del archivo guardado: menor que `dpi` si la
+    página se redujo para no pasar del tamaño máximo.
+
+    Args:
+        page_files (callable): page_no -> archivo principal (Path) de la página
+
+    Returns:
+        Path: Ruta del manifiesto
+    """
+    entries = []
+    for page_no in sorted(page_dpi):
+        width_pt, height_pt = page_sizes[page_no]
+        entry = {"page": page_no, "size_pt": [width_pt, height_pt], "dpi": page_dpi[page_no]}
+        image_path = Path(page_files(page_no))
+        if PIL_AVAILABLE and image_path.is_file():
+            with Image.open(image_path) as image:
+                width, height = image.size
+            entry.update({
+                "file": image_path.name,
+                "width": width,
+                "height": height,
+                "bytes": image_path.stat().st_size,
+                # Con el área no importa si la página está girada
+                "effective_dpi": round(72 * math.sqrt(width * height / (width_pt * height_pt)), 1),
+            })
+        entries.append(entry)
+
+    manifest = {"budget": budget.to_dict(), "pages": entries}
+    manifest_path = Path(output_dir) / budget_manifest_filename(prefix)
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Caché incremental de páginas renderizadas basada en hashes de contenido
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from pdf_render import page_filename
+from page_variants import variant_filename, variants_key
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# Manifiesto con el hash de cada página generada, guardado en la carpeta de salida
+MANIFEST_NAME = ".conversion_manifest.json"
+MANIFEST_VERSION = 1
+
+def _hash_stream(digest, obj, seen):
+    """Acumular en `digest` los datos de un stream y de sus XObjects anidados"""
+    obj = obj.get_object()
+    key = id(obj)
+    if key in seen:
+        return
+    seen.add(key)
+
+    if hasattr(obj, "get_data"):
+        digest.update(obj.get_data())
+
+    resources = obj.get("/Resources")
+    if resources is None:
+        return
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects):
+        digest.update(name.encode("utf-8"))
+        _hash_stream(digest, xobjects[name], seen)
+
+def _page_fingerprint(page):
+    """Hash del contenido de una página: stream de contenido, imágenes y geometría"""
+    digest = hashlib.sha256()
+    digest.update(repr([float(v) for v in page.mediabox]).encode("ascii"))
+    digest.update(str(page.get("/Rotate", 0)).encode("ascii"))
+
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    _hash_stream(digest, page, set())
+    return digest.hexdigest()
+
+def _file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 de un archivo completo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def page_fingerprints(pdf_path, total_pages):
+    """
+    Calcular un hash de contenido por página
+
+    Con pypdf el hash cubre el stream de contenido de cada página y los
+    XObjects (imágenes) que usa, de modo que una página sin cambios conserva
+    su hash aunque el resto del catálogo cambie. Sin pypdf se usa el hash del
+    archivo completo: solo se reaprovechan páginas si el PDF es idéntico.
+
+    Returns:
+        list: Hash hexadecimal de cada página, en orden (índice 0 = página 1)
+    """
+    if PYPDF_AVAILABLE:
+        reader = PdfReader(str(pdf_path))
+        return [_page_fingerprint(page) for page in reader.pages[:total_pages]]
+
+    file_hash = _file_digest(pdf_path)
+    return [f"{file_hash}:{page_no}" for page_no in range(1, total_pages + 1)]
+
+def render_key(fingerprint, dpi, format_type, prefix, extra=""):
+    """Clave de caché de una página: contenido más configuración de renderizado"""
+    settings = f"{fingerprint}|{dpi}|{format_type.lower()}|{prefix}|{extra}"
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+def load_manifest(output_dir):
+    """Leer el manifiesto de la carpeta de salida (vacío si no existe o está dañado)"""
+    manifest_path = Path(output_dir) / MANIFEST_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "files": {}}
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+def save_manifest(output_dir, manifest):
+    """Escribir el manifiesto de forma atómica (archivo temporal + rename)"""
+    manifest_path = Path(output_dir) / MANIFEST_NAME
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def invalidate_manifest(output_dir):
+    """Borrar el manifiesto tras una conversión completa no incremental"""
+    manifest_path = Path(output_dir) / MANIFEST_NAME
+    if manifest_path.is_file():
+        manifest_path.unlink()
+
+class IncrementalPlan:
+    """
+    Plan de una conversión incremental
+
+    Attributes:
+        render_pages (list): Páginas que hay que renderizar
+        unchanged (list): Páginas cuyos archivos ya existen con el mismo hash
+        reused_pages (list): Páginas que se copian de archivos ya renderizados
+        reused (list): (archivo destino, archivo origen) de cada copia
+        stale (list): Archivos del manifiesto anterior que ya no se usan
+    """
+
+    def __init__(self, output_dir, old_files, new_files):
+        self.output_dir = Path(output_dir)
+        self.old_files = old_files
+        self.new_files = new_files
+        self.render_pages = []
+        self.unchanged = []
+        self.reused_pages = []
+        self.reused = []
+        self.stale = sorted(set(old_files) - set(new_files))
+
+    def apply_reuse(self):
+        """
+        Copiar archivos ya renderizados a las páginas que ahora tienen ese contenido
+
+        Las copias pasan por archivos temporales para que un archivo que es a la
+        vez origen y destino no se sobrescriba antes de copiarse.
+        """
+        temp_paths = []
+        for filename, source in self.reused:
+            target = self.output_dir / filename
+            temp_path = target.with_name(target.name + ".reuse.tmp")
+            shutil.copy2(self.output_dir / source, temp_path)
+            temp_paths.append((temp_path, target))
+
+        for temp_path, target in temp_paths:
+            os.replace(temp_path, target)
+
+    def finish(self):
+        """Guardar el manifiesto nuevo y borrar los archivos que ya no se referencian"""
+        save_manifest(self.output_dir, {"version": MANIFEST_VERSION, "files": self.new_files})
+        removed = []
+        for filename in self.stale:
+            path = self.output_dir / filename
+            if path.is_file():
+                path.unlink()
+                removed.append(filename)
+        return removed
+
+def plan_incremental(pdf_path, output_dir, total_pages, dpi, format_type, prefix, variants=None):
+    """
+    Comparar el PDF con el manifiesto de la carpeta de salida
+
+    Una página se omite si sus archivos existen y el manifiesto registra la
+    misma clave (contenido + DPI + formato + prefijo, y la variante si se usan
+    variantes). Si las mismas claves aparecen en otros archivos (p. ej. un lote
+    que cambió de página), se copian esos archivos en lugar de renderizar de nuevo.
+
+    Returns:
+        IncrementalPlan: Páginas a renderizar, reaprovechar y archivos obsoletos
+    """
+    output_dir = Path(output_dir)
+    old_files = load_manifest(output_dir)["files"]
+    old_by_key = {}
+    for filename, entry in old_files.items():
+        if (output_dir / filename).is_file():
+            old_by_key.setdefault(entry["key"], filename)
+
+    fingerprints = page_fingerprints(pdf_path, total_pages)
+    new_files = {}
+    page_files = {}
+    for page_no, fingerprint in enumerate(fingerprints, 1):
+        if variants:
+            files = [
+                (variant_filename(prefix, page_no, variant),
+                 render_key(fingerprint, dpi, variant.format_type, prefix, variants_key([variant])))
+                for variant in variants
+            ]
+        else:
+            files = [(page_filename(prefix, page_no, format_type),
+                      render_key(fingerprint, dpi, format_type, prefix))]
+
+        page_files[page_no] = files
+        for filename, key in files:
+            new_files[filename] = {"page": page_no, "key": key}
+
+    plan = IncrementalPlan(output_dir, old_files, new_files)
+    for page_no, files in page_files.items():
+        unchanged = all(
+            old_files.get(filename, {}).get("key") == key and (output_dir / filename).is_file()
+            for filename, key in files
+        )
+        if unchanged:
+            plan.unchanged.append(page_no)
+        elif all(key in old_by_key for _, key in files):
+            plan.reused_pages.append(page_no)
+            plan.reused.extend((filename, old_by_key[key]) for filename, key in files)
+        else:
+            plan.render_pages.append(page_no)
+    return plan
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Detectar páginas en blanco y páginas repetidas antes de codificarlas
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from multiprocessing.managers import BaseManager
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Ancho aproximado (px) de la versión reducida en la que se analiza la página
+ANALYSIS_WIDTH = 256
+
+# Una página está en blanco si casi no tiene píxeles que se aparten del tono
+# medio (desviación típica baja o muy pocos píxeles de "tinta")
+BLANK_MAX_STD = 3.0
+INK_THRESHOLD = 48
+BLANK_MAX_INK = 0.0005
+
+# Hash perceptual: DCT de la página a HASH_SIZE x HASH_SIZE, se conservan las
+# 8x8 frecuencias más bajas (64 bits)
+HASH_SIZE = 32
+HASH_BITS = 8
+
+# Candidatas a la misma página: hashes que difieren en pocos bits y miniaturas
+# que difieren de media en pocos niveles de gris. El hash y la miniatura no
+# distinguen dos páginas de lotes con la misma maqueta (cambian el número, la
+# marca y el precio), así que solo sirven para descartar rápido
+MAX_HASH_DISTANCE = 6
+THUMB_WIDTH = 128
+MAX_THUMB_DIFF = 1.5
+
+# Confirmación a la resolución de análisis: ningún píxel puede cambiar más de
+# PIXEL_TOLERANCE niveles de gris. Una página repetida del mismo PDF se
+# renderiza idéntica; una sola cifra distinta cambia algún píxel mucho más
+PIXEL_TOLERANCE = 24
+
+BLANK = "blank"
+DUPLICATE = "duplicate"
+
+def _dct_matrix(size):
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+_DCT = _dct_matrix(HASH_SIZE) if NUMPY_AVAILABLE else None
+
+class PageSignature:
+    """Resumen de una página para compararla: tono medio, contraste, hash, miniatura y versión reducida"""
+
+    __slots__ = ("mean", "std", "ink", "phash", "thumb", "thumb_shape", "gray", "gray_shape")
+
+    def __init__(self, mean, std, ink, phash, thumb, thumb_shape, gray, gray_shape):
+        self.mean = mean
+        self.std = std
+        self.ink = ink
+        self.phash = phash
+        self.thumb = thumb
+        self.thumb_shape = thumb_shape
+        self.gray = gray
+        self.gray_shape = gray_shape
+
+    @property
+    def blank(self):
+        return self.std <= BLANK_MAX_STD or self.ink <= BLANK_MAX_INK
+
+def page_signature(image):
+    """
+    Calcular la firma de una página renderizada
+
+    Todo se mide sobre una versión reducida en escala de grises (unos 256 px
+    de ancho), así que el coste es de pocos milisegundos por página.
+    """
+    factor = max(1, image.width // ANALYSIS_WIDTH)
+    small = image.reduce(factor) if factor > 1 else image
+    small = small.convert("L")
+    gray = np.asarray(small, dtype=np.float32)
+
+    mean = float(gray.mean())
+    std = float(gray.std())
+    ink = float((np.abs(gray - mean) > INK_THRESHOLD).mean())
+
+    pixels = np.asarray(small.resize((HASH_SIZE, HASH_SIZE)), dtype=np.float32)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_BITS, :HASH_BITS].ravel()
+    bits = low > np.median(low[1:])
+    phash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    height = max(1, round(small.height * THUMB_WIDTH / small.width))
+    thumb = small.resize((THUMB_WIDTH, height))
+    return PageSignature(mean, std, ink, phash, thumb.tobytes(), (height, THUMB_WIDTH),
+                         small.tobytes(), (small.height, small.width))
+
+class DuplicateIndex:
+    """
+    Páginas ya vistas en una conversión, para reconocer las repetidas
+
+    `match` es atómica (con un lock), de modo que dos hilos o procesos que
+    reciben la misma página a la vez no la guardan los dos. Puede compartirse
+    entre procesos con index_manager().
+    """
+
+    def __init__(self):
+        self._pages = []
+        self._blank = set()
+        self._duplicates = {}
+        self._lock = threading.Lock()
+
+    def match(self, page_no, phash, thumb, thumb_shape, gray, gray_shape):
+        """
+        Buscar una página ya vista con el mismo contenido; si no hay, registrar esta
+
+        El hash y la miniatura eligen las candidatas; solo es repetida si además
+        coincide píxel a píxel (con tolerancia) a la resolución de análisis.
+
+        Returns:
+            int | None: Número de la página original, o None si la página es nueva
+        """
+        current = np.frombuffer(thumb, dtype=np.uint8).astype(np.int16)
+        pixels = np.frombuffer(gray, dtype=np.uint8)
+        with self._lock:
+            for other_no, other_hash, other_thumb, other_shape, other_pixels, other_gray_shape in self._pages:
+                if (bin(phash ^ other_hash).count("1") > MAX_HASH_DISTANCE or other_shape != thumb_shape
+                        or other_gray_shape != gray_shape):
+                    continue
+                if np.abs(current - other_thumb).mean() > MAX_THUMB_DIFF:
+                    continue
+                diff = np.abs(pixels.astype(np.int16) - other_pixels.astype(np.int16))
+                if diff.max() <= PIXEL_TOLERANCE:
+                    self._duplicates[page_no] = other_no
+                    return other_no
+            self._pages.append((page_no, phash, current, thumb_shape, pixels, gray_shape))
+        return None
+
+    def add_blank(self, page_no):
+        with self._lock:
+            self._blank.add(page_no)
+
+    def refs(self):
+        """
+        Páginas omitidas hasta ahora
+
+        Returns:
+            tuple: (lista de páginas en blanco, dict página repetida -> página original)
+        """
+        with self._lock:
+            return sorted(self._blank), dict(self._duplicates)
+
+class _IndexManager(BaseManager):
+    pass
+
+_IndexManager.register("DuplicateIndex", DuplicateIndex)
+
+def index_manager():
+    """
+    Proceso que guarda los índices compartidos por los procesos de renderizado
+
+    Cada `manager.DuplicateIndex()` crea un índice (uno por documento) cuyo
+    proxy puede pasarse a los procesos del pool. Llamar a `manager.shutdown()`
+    al terminar.
+    """
+    manager = _IndexManager()
+    manager.start()
+    return manager
+
+def classify_page(image, page_no, index, stats=None):
+    """
+    Decidir si una página se guarda, se omite (en blanco) o es repetida
+
+    Returns:
+        tuple: (None | BLANK | DUPLICATE, número de la página original o None)
+    """
+    start = time.perf_counter()
+    signature = page_signature(image)
+    if signature.blank:
+        index.add_blank(page_no)
+        result = (BLANK, None)
+    else:
+        original = index.match(page_no, signature.phash, signature.thumb, signature.thumb_shape,
+                               signature.gray, signature.gray_shape)
+        result = (DUPLICATE, original) if original is not None else (None, None)
+    if stats is not None:
+        stats.add("dedupe", time.perf_counter() - start, page_no=page_no)
+    return result
+
+def page_refs_filename(prefix):
+    """Manifiesto de páginas omitidas: {prefix}_refs.json"""
+    return f"{prefix}_refs.json"
+
+def write_page_refs(output_dir, prefix, blank, duplicates, files):
+    """
+    Escribir {prefix}_refs.json con las páginas en blanco y las repetidas
+
+    Args:
+        blank (list): Páginas en blanco (sin archivo)
+        duplicates (dict): Página repetida -> página original
+        files (dict): Página original -> nombre de su archivo
+
+    Returns:
+        Path: Ruta del manifiesto
+    """
+    manifest = {
+        "prefix": prefix,
+        "blank": sorted(blank),
+        "duplicates": {
+            str(page_no): {"same_as": original, "file": files.get(original)}
+            for page_no, original in sorted(duplicates.items())
+        },
+    }
+    manifest_path = Path(output_dir) / page_refs_filename(prefix)
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+def load_page_refs(output_dir, prefix):
+    """
+    Leer {prefix}_refs.json
+
+    Returns:
+        tuple: (set de páginas en blanco, dict página repetida -> página original)
+    """
+    try:
+        with open(Path(output_dir) / page_refs_filename(prefix), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return set(), {}
+    duplicates = {int(page_no): entry["same_as"] for page_no, entry in manifest.get("duplicates", {}).items()}
+    return set(manifest.get("blank", [])), duplicates
+
+def estimate_savings(stats, skipped_pages, duplicate_files):
+    """
+    Salida y tiempo de codificación ahorrados al omitir páginas
+
+    Los bytes son los de los archivos originales de cada página repetida (las
+    páginas en blanco no cuentan); el tiempo es el de codificar y escribir una
+    página media de esta conversión por cada página omitida.
+
+    Args:
+        stats (StageStats): Tiempos de la conversión
+        skipped_pages (int): Páginas en blanco más repetidas
+        duplicate_files (list): Archivo original de cada página repetida (con repeticiones)
+
+    Returns:
+        dict: pages, bytes, seconds
+    """
+    saved_pages = stats.pages.get("encode", 0)
+    work = sum(stats.seconds.get(stage, 0.0) for stage in ("resize", "encode", "write"))
+    per_page = work / saved_pages if saved_pages else 0.0
+    return {
+        "pages": skipped_pages,
+        "bytes": sum(Path(path).stat().st_size for path in duplicate_files if Path(path).is_file()),
+        "seconds": skipped_pages * per_page,
+    }
+
+def finish_dedupe(index, output_dir, prefix, stats, page_files):
+    """
+    Escribir {prefix}_refs.json al terminar una conversión y estimar lo ahorrado
+
+    Args:
+        index (DuplicateIndex): Índice usado en la conversión (o su proxy)
+        page_files (callable): page_no -> lista de archivos (Path) de una página
+
+    Returns:
+        dict: blank, duplicates, pages, bytes, seconds, manifest (ruta)
+    """
+    blank, duplicates = index.refs()
+    files = {original: page_files(original) for original in set(duplicates.values())}
+    manifest_path = write_page_refs(output_dir, prefix, blank, duplicates,
+                                    {original: paths[0].name for original, paths in files.items()})
+    savings = estimate_savings(stats, len(blank) + len(duplicates),
+                               [path for original in duplicates.values() for path in files[original]])
+    return dict(savings, blank=len(blank), duplicates=len(duplicates), manifest=manifest_path)
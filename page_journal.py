@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Diario de páginas terminadas para reanudar una conversión interrumpida
+
+Cada página se escribe de forma atómica (ver page_pipeline.write_atomic) y,
+cuando ya está en disco, se anota en `.conversion_journal.jsonl` con el
+tamaño y el SHA-256 de sus archivos. Con `--resume` solo se renderizan las
+páginas que faltan en el diario o cuyos archivos ya no coinciden.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from page_variants import variants_key
+
+JOURNAL_NAME = ".conversion_journal.jsonl"
+JOURNAL_VERSION = 1
+
+# Temporales que puede dejar una conversión interrumpida: escrituras atómicas
+# a medias (page_pipeline.write_atomic) y páginas de poppler sin renombrar
+# (pdf_render.iter_direct_pages)
+LEFTOVER_PATTERNS = ("*.tmp", ".*_direct_*")
+
+# Hilos que comprueban los hashes de las páginas ya terminadas al reanudar
+VERIFY_THREADS = 4
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def journal_key(pdf_path, dpi, format_type, prefix, variants=None):
+    """
+    Identificador de una conversión: contenido del PDF y configuración de salida
+
+    `dpi` puede ser el DPI o la clave de un presupuesto (PageBudget.key). Si
+    cambia cualquiera de estos datos, el diario anterior no sirve para reanudar.
+    """
+    settings = f"{dpi}|{format_type.lower()}|{prefix}|{variants_key(variants) if variants else ''}"
+    return f"{file_sha256(pdf_path)}|{settings}"
+
+class PageJournal:
+    """
+    Diario de una carpeta de salida
+
+    Es un archivo JSON lines: una cabecera con la clave de la conversión y
+    una línea por página terminada. Las líneas se escriben sin fsync: tras un
+    corte de luz puede perderse el final del diario (esas páginas se vuelven a
+    renderizar) o quedar una última línea a medias, que se descarta al leerlo.
+    Una página anotada cuyo archivo quedó vacío o distinto tampoco se da por
+    buena, porque al reanudar se comprueban el tamaño y el hash.
+    """
+
+    def __init__(self, output_dir, job_key):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / JOURNAL_NAME
+        self.job_key = job_key
+        self.pages = {}
+        self._file = None
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                lines = file.read().split("\n")
+        except OSError:
+            return {}
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return {}
+        if header.get("version") != JOURNAL_VERSION or header.get("key") != self.job_key:
+            return {}
+
+        pages = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Última línea a medio escribir
+                break
+            pages[entry["page"]] = entry["files"]
+        return pages
+
+    def open(self, resume=False):
+        """
+        Abrir el diario para anotar páginas
+
+        Con `resume` se conservan las páginas anotadas por una conversión
+        anterior con la misma clave y se borran los temporales que dejó; si
+        no, el diario empieza vacío. En ambos casos se reescribe compacto (sin
+        líneas repetidas ni a medias).
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if resume:
+            self.remove_leftovers()
+        self.pages = self._load() if resume else {}
+        temp_path = self.path.with_name(JOURNAL_NAME + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"version": JOURNAL_VERSION, "key": self.job_key}) + "\n")
+            for page_no in sorted(self.pages):
+                file.write(json.dumps({"page": page_no, "files": self.pages[page_no]}) + "\n")
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def remove_leftovers(self):
+        """
+        Borrar los temporales de una conversión interrumpida
+
+        Returns:
+            int: Archivos borrados
+        """
+        removed = 0
+        for pattern in LEFTOVER_PATTERNS:
+            for path in self.output_dir.glob(pattern):
+                try:
+                    if path.is_file():
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def record(self, page_no, paths):
+        """Anotar una página terminada con el tamaño y el hash de cada uno de sus archivos"""
+        files = [{"file": Path(path).name, "bytes": os.path.getsize(path), "sha256": file_sha256(path)}
+                 for path in paths]
+        self.pages[page_no] = files
+        self._file.write(json.dumps({"page": page_no, "files": files}) + "\n")
+        self._file.flush()
+
+    def verify(self, page_no):
+        """Comprobar que los archivos anotados de una página siguen en disco, completos e iguales"""
+        files = self.pages.get(page_no)
+        if not files:
+            return False
+        for entry in files:
+            path = self.output_dir / entry["file"]
+            try:
+                if path.stat().st_size != entry["bytes"] or file_sha256(path) != entry["sha256"]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def completed_pages(self, pages):
+        """
+        Páginas de `pages` ya terminadas y verificadas
+
+        Returns:
+            set: Números de página que no hace falta volver a renderizar
+        """
+        candidates = [page_no for page_no in pages if page_no in self.pages]
+        with ThreadPoolExecutor(max_workers=VERIFY_THREADS) as executor:
+            results = executor.map(self.verify, candidates)
+            return {page_no for page_no, ok in zip(candidates, results) if ok}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Pipeline productor/consumidor para codificar y escribir páginas renderizadas
+"""
+
+import io
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+# Hilos de codificación por proceso de renderizado (los encoders de Pillow liberan el GIL)
+DEFAULT_ENCODERS = min(4, os.cpu_count() or 1)
+
+# Señal de fin de trabajo para los hilos de codificación
+_STOP = object()
+
+class StageStats:
+    """
+    Tiempo acumulado y páginas procesadas por etapa (render, encode, write, ...)
+
+    Además del total por etapa guarda el tiempo de cada página en cada etapa,
+    para poder señalar las páginas más lentas, y la memoria máxima (MB) que
+    registren los procesos que participan en la conversión.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.pages = defaultdict(int)
+        self.threads = defaultdict(int)
+        self.page_seconds = {}
+        self.peak_rss_mb = None
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, pages=1, page_no=None):
+        """Registrar `seconds` de trabajo de una etapa (y de una página concreta, si se indica)"""
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.pages[stage] += pages
+            if page_no is not None:
+                timings = self.page_seconds.setdefault(page_no, {})
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def set_threads(self, stage, threads):
+        """Registrar cuántos hilos o procesos trabajan en paralelo en una etapa"""
+        with self._lock:
+            self.threads[stage] = max(self.threads[stage], threads)
+
+    def set_peak_memory(self, peak_rss_mb):
+        """Registrar la memoria máxima de un proceso (se conserva el mayor valor)"""
+        if peak_rss_mb is None:
+            return
+        with self._lock:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, peak_rss_mb)
+
+    def merge(self, other):
+        """Acumular estadísticas de otro proceso (StageStats o dict de to_dict)"""
+        data = other.to_dict() if isinstance(other, StageStats) else other
+        with self._lock:
+            for stage, values in data["stages"].items():
+                self.seconds[stage] += values["seconds"]
+                self.pages[stage] += values["pages"]
+                self.threads[stage] = max(self.threads[stage], values.get("threads", 0))
+            for page_no, timings in data.get("pages", {}).items():
+                merged = self.page_seconds.setdefault(int(page_no), {})
+                for stage, seconds in timings.items():
+                    merged[stage] = merged.get(stage, 0.0) + seconds
+        self.set_peak_memory(data.get("peak_rss_mb"))
+
+    def to_dict(self):
+        """Estadísticas serializables (para devolverlas desde un proceso del pool)"""
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {
+                        "seconds": self.seconds[stage],
+                        "pages": self.pages[stage],
+                        "threads": self.threads[stage],
+                    }
+                    for stage in self.seconds
+                },
+                "pages": {page_no: dict(timings) for page_no, timings in self.page_seconds.items()},
+                "peak_rss_mb": self.peak_rss_mb,
+            }
+
+    def throughput(self, stage):
+        """Páginas por segundo de trabajo efectivo de un solo hilo en la etapa"""
+        seconds = self.seconds.get(stage, 0.0)
+        return self.pages.get(stage, 0) / seconds if seconds > 0 else 0.0
+
+    def slowest_pages(self, count=5):
+        """
+        Páginas con más tiempo sumado entre todas las etapas
+
+        Returns:
+            list: (número de página, segundos totales, dict de segundos por etapa)
+        """
+        with self._lock:
+            totals = [(page_no, sum(timings.values()), dict(timings))
+                      for page_no, timings in self.page_seconds.items()]
+        totals.sort(key=lambda item: (-item[1], item[0]))
+        return totals[:count]
+
+    def summary_lines(self, slowest=5):
+        """Resumen legible de cada etapa, la memoria y las páginas más lentas para el log"""
+        lines = []
+        for stage in sorted(self.seconds):
+            if not self.pages[stage]:
+                lines.append(f"{stage}: {self.seconds[stage]:.2f} s")
+                continue
+
+            threads = self.threads[stage]
+            line = (f"{stage}: {self.pages[stage]} páginas en {self.seconds[stage]:.2f} s "
+                    f"({self.throughput(stage):.2f} páginas/s por hilo")
+            if threads > 1:
+                line += f", {threads} hilos ≈ {self.throughput(stage) * threads:.2f} páginas/s"
+            lines.append(line + ")")
+
+        if self.peak_rss_mb is not None:
+            lines.append(f"memoria máxima: {self.peak_rss_mb:.1f} MB por proceso")
+
+        for page_no, total, timings in self.slowest_pages(slowest):
+            detail = ", ".join(f"{stage} {seconds:.2f} s" for stage, seconds in sorted(timings.items()))
+            lines.append(f"página lenta {page_no}: {total:.2f} s ({detail})")
+        return lines
+
+def write_atomic(path, data):
+    """
+    Escribir un archivo completo o nada: temporal junto al destino + rename
+
+    Si el proceso muere a mitad de la escritura solo queda el `.tmp`, nunca
+    una página truncada con el nombre definitivo.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+def encode_and_write(image, image_path, format_name, stats=None, page_no=None, pages=1, **params):
+    """
+    Codificar una imagen en memoria y escribirla, midiendo cada etapa por separado
+
+    Separar la compresión de Pillow ("encode") de la escritura en disco
+    ("write") permite ver si una conversión lenta es de CPU o de disco. Con
+    varias salidas por página, `pages=0` evita contar la página más de una vez.
+
+    Returns:
+        Path | str: La ruta escrita
+    """
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    image.save(buffer, format_name, **params)
+    encoded = time.perf_counter()
+    write_atomic(image_path, buffer.getbuffer())
+    written = time.perf_counter()
+
+    if stats is not None:
+        stats.add("encode", encoded - start, pages=pages, page_no=page_no)
+        stats.add("write", written - encoded, pages=pages, page_no=page_no)
+    return image_path
+
+def encode_within_bytes(image, image_path, format_name, max_bytes, stats=None, page_no=None,
+                        attempts=6, **params):
+    """
+    Codificar y escribir una imagen reduciéndola hasta que ocupe como máximo `max_bytes`
+
+    Cada intento reduce la página original en memoria (sin volver a renderizar)
+    con la escala que, según el intento anterior, la deja por debajo del
+    máximo. Al reducir, cada píxel suele ocupar algo más, así que pueden hacer
+    falta varios intentos; si tras `attempts` no cabe, se escribe el último.
+
+    Returns:
+        Path | str: La ruta escrita
+    """
+    start = time.perf_counter()
+    scale = 1.0
+    for attempt in range(attempts):
+        if scale < 1.0:
+            current = image.resize((max(1, round(image.width * scale)),
+                                    max(1, round(image.height * scale))), reducing_gap=3.0)
+        else:
+            current = image
+        buffer = io.BytesIO()
+        try:
+            current.save(buffer, format_name, **params)
+        finally:
+            if current is not image:
+                current.close()
+        size = buffer.tell()
+        if size <= max_bytes:
+            break
+        scale *= (max_bytes / size) ** 0.5 * 0.95
+    encoded = time.perf_counter()
+    write_atomic(image_path, buffer.getbuffer())
+    written = time.perf_counter()
+
+    if stats is not None:
+        stats.add("encode", encoded - start, page_no=page_no)
+        stats.add("write", written - encoded, page_no=page_no)
+    return image_path
+
+class PageEncoderPool:
+    """
+    Pool de hilos que codifica y escribe páginas mientras se renderizan las siguientes
+
+    Las páginas entran por una cola acotada: si los encoders no dan abasto,
+    `submit` bloquea al productor y la memoria queda limitada a
+    `queue_size + encoders` páginas. Cada hilo cierra la imagen al terminar de
+    guardarla. `completed()` devuelve las páginas terminadas en orden de encolado.
+    `save_func` registra sus propios tiempos (encode, write) en `stats`; el pool
+    solo mide la espera del productor en la cola.
+    """
+
+    def __init__(self, save_func, encoders=DEFAULT_ENCODERS, queue_size=None, stats=None):
+        self.save_func = save_func
+        self.encoders = max(1, int(encoders))
+        self.stats = stats if stats is not None else StageStats()
+        self.stats.set_threads("encode", self.encoders)
+        self.stats.set_threads("write", self.encoders)
+        self._queue = queue.Queue(maxsize=queue_size or self.encoders * 2)
+        self._done = {}
+        self._done_lock = threading.Lock()
+        self._pending = deque()
+        self._error = None
+        self._threads = [
+            threading.Thread(target=self._run, name=f"page-encoder-{n}", daemon=True)
+            for n in range(self.encoders)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            page_no, image, args = item
+            try:
+                if self._error is None:
+                    result = self.save_func(image, *args)
+                    with self._done_lock:
+                        self._done[page_no] = result
+            except Exception as e:
+                self._error = e
+            finally:
+                image.close()
+
+    def submit(self, page_no, image, *args):
+        """Encolar una página; bloquea mientras la cola esté llena"""
+        self._raise_error()
+        self._pending.append(page_no)
+
+        start = time.perf_counter()
+        self._queue.put((page_no, image, args))
+        self.stats.add("queue_wait", time.perf_counter() - start, pages=0)
+
+    def completed(self):
+        """Sacar las páginas ya guardadas, en el mismo orden en que se encolaron"""
+        self._raise_error()
+        results = []
+        with self._done_lock:
+            while self._pending and self._pending[0] in self._done:
+                page_no = self._pending.popleft()
+                results.append((page_no, self._done.pop(page_no)))
+        return results
+
+    def close(self):
+        """Esperar a que terminen todas las páginas encoladas y devolver las pendientes"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        return self.completed()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
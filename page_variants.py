@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Varias salidas por página (miniatura, tamaño web, original) desde un solo renderizado
+"""
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from page_pipeline import encode_and_write
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Ejemplo de configuración: miniatura WebP, JPEG para la web y PNG a resolución completa
+EXAMPLE_VARIANTS = "thumb:webp:320,large:jpeg:1024,full:png"
+
+# Extensión y calidad por defecto de cada formato
+FORMAT_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp", "tiff": "tiff"}
+DEFAULT_QUALITY = {"jpeg": 85, "webp": 80}
+
+class Variant:
+    """
+    Una salida por página
+
+    Attributes:
+        name (str): Nombre corto usado en el archivo (thumb, large, full...)
+        format_type (str): Formato de imagen (png, jpeg, webp, tiff)
+        max_width (int): Ancho máximo en píxeles (None = resolución completa)
+        quality (int): Calidad para formatos con pérdida (None = por defecto)
+    """
+
+    def __init__(self, name, format_type, max_width=None, quality=None):
+        self.name = name
+        self.format_type = format_type.lower()
+        self.max_width = max_width
+        self.quality = quality if quality is not None else DEFAULT_QUALITY.get(self.format_type)
+
+    @property
+    def extension(self):
+        return FORMAT_EXTENSIONS[self.format_type]
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "format": self.format_type,
+            "max_width": self.max_width,
+            "quality": self.quality,
+        }
+
+    def __repr__(self):
+        return f"Variant({self.name!r}, {self.format_type!r}, {self.max_width!r}, {self.quality!r})"
+
+def parse_variants(spec):
+    """
+    Leer una lista de variantes "nombre:formato[:ancho[:calidad]],..."
+
+    Ejemplo: "thumb:webp:320,large:jpeg:1024,full:png"
+
+    Raises:
+        ValueError: Si alguna variante está mal escrita
+    """
+    variants = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+
+        parts = item.split(":")
+        if len(parts) < 2 or len(parts) > 4:
+            raise ValueError(f"Variante inválida: {item!r} (usar nombre:formato[:ancho[:calidad]])")
+
+        name, format_type = parts[0], parts[1].lower()
+        if not re.fullmatch(r"[A-Za-z0-9-]+", name):
+            raise ValueError(f"Nombre de variante inválido: {name!r}")
+        if format_type == "jpg":
+            format_type = "jpeg"
+        if format_type not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Formato no soportado en la variante {name!r}: {format_type}")
+
+        max_width = int(parts[2]) if len(parts) > 2 and parts[2] else None
+        quality = int(parts[3]) if len(parts) > 3 and parts[3] else None
+        variants.append(Variant(name, format_type, max_width or None, quality))
+
+    names = [variant.name for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("Los nombres de las variantes deben ser únicos")
+    if not variants:
+        raise ValueError("No se indicó ninguna variante")
+    return variants
+
+def variants_key(variants):
+    """Texto estable que identifica la configuración de variantes (para la caché)"""
+    return ",".join(
+        f"{v.name}:{v.format_type}:{v.max_width or ''}:{v.quality or ''}" for v in variants
+    )
+
+def variant_filename(prefix, page_no, variant):
+    """Nombre de archivo de una variante: {prefix}_{page_no:03d}_{nombre}.{ext}"""
+    return f"{prefix}_{page_no:03d}_{variant.name}.{variant.extension}"
+
+def _save_variant(image, image_path, variant, stats=None, page_no=None, pages=1):
+    if variant.format_type == "jpeg":
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        encode_and_write(image, image_path, "JPEG", stats=stats, page_no=page_no, pages=pages,
+                         quality=variant.quality, optimize=True, progressive=True)
+    elif variant.format_type == "webp":
+        encode_and_write(image, image_path, "WEBP", stats=stats, page_no=page_no, pages=pages,
+                         quality=variant.quality, method=4)
+    else:
+        encode_and_write(image, image_path, variant.format_type.upper(), stats=stats,
+                         page_no=page_no, pages=pages)
+
+def save_page_variants(image, output_dir, prefix, page_no, variants, stats=None):
+    """
+    Escribir todas las variantes de una página a partir de una sola imagen
+
+    Las variantes se generan de mayor a menor ancho y cada reducción parte de
+    la anterior, de modo que las miniaturas no vuelven a procesar la página a
+    resolución completa. Con `stats` se registran las etapas "resize",
+    "encode" y "write" de la página.
+
+    Returns:
+        Path: Ruta de la primera variante configurada (para el log)
+    """
+    output_dir = Path(output_dir)
+    ordered = sorted(variants, key=lambda v: -(v.max_width or image.width))
+    source = image
+    resized = []
+    try:
+        for index, variant in enumerate(ordered):
+            target = source
+            if variant.max_width and variant.max_width < source.width:
+                height = max(1, round(source.height * variant.max_width / source.width))
+                resize_start = time.perf_counter()
+                target = source.resize((variant.max_width, height), Image.LANCZOS, reducing_gap=3.0)
+                if stats is not None:
+                    stats.add("resize", time.perf_counter() - resize_start, pages=0, page_no=page_no)
+                resized.append(target)
+            _save_variant(target, output_dir / variant_filename(prefix, page_no, variant), variant,
+                          stats=stats, page_no=page_no, pages=1 if index == 0 else 0)
+            source = target
+    finally:
+        for extra in resized:
+            extra.close()
+
+    return output_dir / variant_filename(prefix, page_no, variants[0])
+
+def write_variants_manifest(output_dir, prefix, total_pages, variants, dpi, pages=None):
+    """
+    Escribir {prefix}_variants.json con las variantes generadas de cada página
+
+    Solo lee la cabecera de cada imagen para obtener sus dimensiones. Con un
+    DPI por página (dict, ver page_budget) cada página guarda el suyo.
+
+    Returns:
+        Path: Ruta del manifiesto
+    """
+    output_dir = Path(output_dir)
+    page_numbers = pages if pages is not None else range(1, total_pages + 1)
+    entries = []
+    for page_no in page_numbers:
+        files = {}
+        for variant in variants:
+            image_path = output_dir / variant_filename(prefix, page_no, variant)
+            if not image_path.is_file():
+                continue
+            with Image.open(image_path) as image:
+                width, height = image.size
+            files[variant.name] = {
+                "file": image_path.name,
+                "width": width,
+                "height": height,
+                "bytes": image_path.stat().st_size,
+            }
+        entry = {"page": page_no, "files": files}
+        if isinstance(dpi, dict):
+            entry["dpi"] = dpi.get(page_no)
+        entries.append(entry)
+
+    manifest = {
+        "prefix": prefix,
+        "dpi": None if isinstance(dpi, dict) else dpi,
+        "variants": [variant.to_dict() for variant in variants],
+        "pages": entries,
+    }
+    manifest_path = output_dir / f"{prefix}_variants.json"
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
@@ -10,15 +10,26 @@ import os
 import sys
 from pathlib import Path
 import threading
+import queue
 import time
 from datetime import datetime
 
 # Importaciones condicionales para manejo de errores
-try:
-    from pdf2image import convert_from_path
-    PDF2IMAGE_AVAILABLE = True
-except ImportError:
-    PDF2IMAGE_AVAILABLE = False
+from pdf_render import (
+    PDF2IMAGE_AVAILABLE,
+    DEFAULT_WINDOW_SIZE,
+    DEFAULT_WORKERS,
+    convert_pdf_pages,
+    find_poppler_path,
+    get_page_count,
+    page_filename,
+)
+from page_pipeline import DEFAULT_ENCODERS, StageStats
+from page_cache import invalidate_manifest, plan_incremental
+from page_variants import EXAMPLE_VARIANTS, parse_variants, variant_filename, write_variants_manifest
+from render_control import RenderControl, control_manager
+from page_dedupe import NUMPY_AVAILABLE, DuplicateIndex, finish_dedupe, index_manager
+from page_journal import PageJournal, journal_key
 
 try:
     from PIL import Image
@@ -26,6 +37,12 @@ try:
 except ImportError:
     PIL_AVAILABLE = False
 
+# Milisegundos entre vaciados de la cola de eventos de la conversión
+EVENT_POLL_MS = 100
+
+# Eventos atendidos como máximo en cada vaciado (el resto espera al siguiente)
+MAX_EVENTS_PER_POLL = 1000
+
 class PDFConverterApp:
     def __init__(self, root):
         self.root = root
@@ -39,8 +56,22 @@ class PDFConverterApp:
         self.dpi_var = tk.IntVar(value=200)
         self.format_var = tk.StringVar(value="PNG")
         self.prefix_var = tk.StringVar(value="page")
+        self.window_var = tk.IntVar(value=DEFAULT_WINDOW_SIZE)
+        self.workers_var = tk.IntVar(value=DEFAULT_WORKERS)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.dedupe_var = tk.BooleanVar(value=False)
+        self.resume_var = tk.BooleanVar(value=False)
+        self.variants_var = tk.StringVar(value="")
         self.is_converting = False
         
+        # El hilo de conversión no toca Tk: publica eventos en esta cola y el
+        # bucle principal los vacía por lotes cada EVENT_POLL_MS
+        self.events = queue.Queue()
+        self.control = None
+        self.control_manager = None
+        self.progress_total = 0
+        self.progress_started = None
+        
         # Configurar la interfaz
         self.setup_ui()
         
@@ -49,6 +80,8 @@ class PDFConverterApp:
         
         # Configurar PDF por defecto
         self.set_default_pdf()
+        
+        self.root.after(EVENT_POLL_MS, self.drain_events)
     
     def setup_ui(self):
         """Configurar la interfaz de usuario"""
@@ -98,13 +131,38 @@ class PDFConverterApp:
         ttk.Label(config_frame, text="Filename Prefix:").grid(row=2, column=0, sticky=tk.W, pady=2)
         ttk.Entry(config_frame, textvariable=self.prefix_var, width=20).grid(row=2, column=1, sticky=tk.W, pady=2, padx=(5, 0))
         
-        # Botón de conversión
-        self.convert_btn = ttk.Button(main_frame, text="🔄 Convert PDF to Images", 
+        # Páginas en memoria
+        ttk.Label(config_frame, text="Pages in Memory:").grid(row=3, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(config_frame, from_=1, to=64, textvariable=self.window_var, width=5).grid(row=3, column=1, sticky=tk.W, pady=2, padx=(5, 0))
+        
+        # Procesos de renderizado
+        ttk.Label(config_frame, text="Workers:").grid(row=4, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(config_frame, from_=1, to=max(64, DEFAULT_WORKERS), textvariable=self.workers_var, width=5).grid(row=4, column=1, sticky=tk.W, pady=2, padx=(5, 0))
+        
+        # Conversión incremental y páginas en blanco o repetidas
+        options_frame = ttk.Frame(config_frame)
+        options_frame.grid(row=5, column=1, sticky=tk.W, pady=2, padx=(5, 0))
+        ttk.Checkbutton(options_frame, text="Incremental (skip unchanged pages)", variable=self.incremental_var).grid(row=0, column=0, sticky=tk.W)
+        ttk.Checkbutton(options_frame, text="Skip blank and repeated pages", variable=self.dedupe_var).grid(row=0, column=1, sticky=tk.W, padx=(10, 0))
+        ttk.Checkbutton(options_frame, text="Resume interrupted conversion", variable=self.resume_var).grid(row=1, column=0, sticky=tk.W)
+        
+        # Variantes (vacío = un solo archivo en el formato elegido)
+        ttk.Label(config_frame, text="Variants:").grid(row=6, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(config_frame, textvariable=self.variants_var, width=40).grid(row=6, column=1, sticky=tk.W, pady=2, padx=(5, 0))
+        ttk.Label(config_frame, text=f"e.g. {EXAMPLE_VARIANTS}").grid(row=7, column=1, sticky=tk.W, padx=(5, 0))
+        
+        # Botones de conversión y cancelación
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=4, column=0, columnspan=3, pady=20)
+        self.convert_btn = ttk.Button(button_frame, text="🔄 Convert PDF to Images", 
                                      command=self.start_conversion, style="Accent.TButton")
-        self.convert_btn.grid(row=4, column=0, columnspan=3, pady=20)
+        self.convert_btn.grid(row=0, column=0, padx=5)
+        self.cancel_btn = ttk.Button(button_frame, text="⏹️ Cancel", command=self.cancel_conversion,
+                                    state="disabled")
+        self.cancel_btn.grid(row=0, column=1, padx=5)
         
-        # Barra de progreso
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
+        # Barra de progreso (páginas guardadas / páginas a renderizar)
+        self.progress = ttk.Progressbar(main_frame, mode='determinate')
         self.progress.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
         
         # Log de salida
@@ -125,6 +183,9 @@ class PDFConverterApp:
         self.status_label = ttk.Label(status_frame, text="Ready")
         self.status_label.grid(row=0, column=0, sticky=tk.W)
         
+        self.rate_label = ttk.Label(status_frame, text="")
+        self.rate_label.grid(row=0, column=1, sticky=tk.E)
+        
     def check_dependencies(self):
         """Verificar si las dependencias están instaladas"""
         missing_deps = []
@@ -185,15 +246,67 @@ class PDFConverterApp:
             self.log(f"📁 Output folder: {folder}")
     
     def log(self, message):
-        """Agregar mensaje al log"""
+        """Agregar mensaje al log (desde cualquier hilo)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.events.put(("log", f"[{timestamp}] {message}\n"))
     
     def update_status(self, message):
-        """Actualizar barra de estado"""
-        self.status_label.configure(text=message)
+        """Actualizar barra de estado (desde cualquier hilo)"""
+        self.events.put(("status", message))
+    
+    def call_in_ui(self, func):
+        """Ejecutar `func` en el hilo de Tk en el siguiente vaciado de la cola"""
+        self.events.put(("call", func))
+    
+    def drain_events(self):
+        """
+        Vaciar la cola de eventos en el hilo de Tk
+        
+        Los mensajes de un vaciado se insertan en el log de una sola vez y solo
+        se aplica el último estado, así que el coste de redibujar no depende de
+        cuántas páginas se guardaron desde el vaciado anterior.
+        """
+        lines = []
+        status = None
+        calls = []
+        for _ in range(MAX_EVENTS_PER_POLL):
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                lines.append(value)
+            elif kind == "status":
+                status = value
+            elif kind == "start":
+                self.progress_total = value
+                self.progress_started = time.perf_counter()
+                self.progress.configure(maximum=max(1, value), value=0)
+            elif kind == "call":
+                calls.append(value)
+        
+        if lines:
+            self.log_text.insert(tk.END, "".join(lines))
+            self.log_text.see(tk.END)
+        if status is not None:
+            self.status_label.configure(text=status)
+        if self.control is not None and self.progress_started is not None:
+            self.show_progress(self.control.pages_done())
+        for func in calls:
+            func()
+        
+        self.root.after(EVENT_POLL_MS, self.drain_events)
+    
+    def show_progress(self, done):
+        """Actualizar la barra de progreso, las páginas por segundo y el tiempo restante"""
+        self.progress.configure(value=done)
+        elapsed = time.perf_counter() - self.progress_started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        text = f"{done}/{self.progress_total} pages"
+        if rate > 0:
+            remaining = (self.progress_total - done) / rate
+            text += f" · {rate:.1f} pages/s · ETA {int(remaining) // 60}:{int(remaining) % 60:02d}"
+        self.rate_label.configure(text=text)
     
     def start_conversion(self):
         """Iniciar conversión en un hilo separado"""
@@ -213,61 +326,182 @@ class PDFConverterApp:
             messagebox.showerror("Error", "PDF file does not exist")
             return
         
-        # Deshabilitar botón y mostrar progreso
+        if self.resume_var.get() and self.dedupe_var.get():
+            messagebox.showerror("Error", "Resume cannot be combined with skipping blank and repeated pages")
+            return
+        
+        try:
+            variants = parse_variants(self.variants_var.get()) if self.variants_var.get().strip() else None
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        # Leer la configuración aquí: el hilo de conversión no toca variables de Tk
+        settings = {
+            "pdf_file": self.pdf_path.get(),
+            "output_dir": Path(self.output_folder.get()),
+            "dpi": self.dpi_var.get(),
+            "format_type": self.format_var.get().lower(),
+            "prefix": self.prefix_var.get(),
+            "window_size": max(1, self.window_var.get()),
+            "workers": max(1, self.workers_var.get()),
+            "incremental": self.incremental_var.get(),
+            "dedupe": self.dedupe_var.get(),
+            "resume": self.resume_var.get(),
+            "variants": variants,
+        }
+        
+        # Con varios procesos el control vive en un proceso aparte para compartirlo con ellos
+        if settings["workers"] > 1:
+            self.control_manager = control_manager()
+            self.control = self.control_manager.RenderControl()
+        else:
+            self.control = RenderControl()
+        
+        # Deshabilitar botón y reiniciar el progreso
         self.convert_btn.configure(state="disabled", text="Converting...")
-        self.progress.start()
+        self.cancel_btn.configure(state="normal")
+        self.progress.configure(value=0)
+        self.progress_started = None
+        self.rate_label.configure(text="")
         self.is_converting = True
         
         # Ejecutar conversión en hilo separado
-        thread = threading.Thread(target=self.convert_pdf)
+        thread = threading.Thread(target=self.convert_pdf, args=(settings, self.control))
         thread.daemon = True
         thread.start()
     
-    def convert_pdf(self):
-        """Convertir PDF a imágenes"""
+    def cancel_conversion(self):
+        """Pedir que la conversión se detenga en la siguiente página"""
+        if self.is_converting and self.control is not None:
+            self.control.cancel()
+            self.cancel_btn.configure(state="disabled")
+            self.log("⏹️ Cancelling after the current page...")
+    
+    def convert_pdf(self, settings, control):
+        """Convertir PDF a imágenes (en el hilo de conversión)"""
+        manager = None
+        journal = None
         try:
-            pdf_file = self.pdf_path.get()
-            output_dir = Path(self.output_folder.get())
-            dpi = self.dpi_var.get()
-            format_type = self.format_var.get().lower()
-            prefix = self.prefix_var.get()
+            pdf_file = settings["pdf_file"]
+            output_dir = settings["output_dir"]
+            dpi = settings["dpi"]
+            format_type = settings["format_type"]
+            prefix = settings["prefix"]
+            window_size = settings["window_size"]
+            workers = settings["workers"]
+            incremental = settings["incremental"]
+            dedupe = settings["dedupe"]
+            resume = settings["resume"]
+            variants = settings["variants"]
             
             self.log(f"🚀 Starting conversion...")
             self.log(f"📄 PDF: {os.path.basename(pdf_file)}")
             self.log(f"📁 Output: {output_dir}")
-            self.log(f"🎨 Settings: {dpi} DPI, {format_type.upper()} format")
+            if variants:
+                self.log(f"🎨 Settings: {dpi} DPI, variants {', '.join(v.name for v in variants)}, {workers} workers")
+            else:
+                self.log(f"🎨 Settings: {dpi} DPI, {format_type.upper()} format, {workers} workers")
+            
+            if dedupe and not NUMPY_AVAILABLE:
+                self.log("⚠️ numpy is not installed: blank and repeated pages are saved too")
+                dedupe = False
             
             # Crear carpeta de salida si no existe
             output_dir.mkdir(parents=True, exist_ok=True)
             
             self.update_status("Converting PDF...")
             
-            # Convertir PDF a imágenes
-            self.log("🔄 Converting pages...")
-            images = convert_from_path(pdf_file, dpi=dpi)
-            
-            total_pages = len(images)
+            poppler_path = find_poppler_path(Path(__file__).parent)
+            total_pages = get_page_count(pdf_file, poppler_path=poppler_path)
             self.log(f"📑 Found {total_pages} pages")
             
-            # Guardar cada imagen
-            for i, image in enumerate(images, 1):
-                filename = f"{prefix}_{i:03d}.{format_type}"
-                image_path = output_dir / filename
-                
-                # Optimizar calidad para JPEG
-                if format_type == 'jpeg':
-                    image.save(image_path, format_type.upper(), quality=95, optimize=True)
+            # Comparar con el manifiesto de la conversión anterior
+            plan = None
+            render_pages = None
+            if incremental:
+                plan = plan_incremental(pdf_file, output_dir, total_pages, dpi, format_type, prefix,
+                                        variants=variants)
+                plan.apply_reuse()
+                render_pages = plan.render_pages
+                self.log(f"♻️ Incremental: {len(plan.unchanged)} unchanged, "
+                         f"{len(plan.reused_pages)} reused, {len(render_pages)} to render")
+            else:
+                invalidate_manifest(output_dir)
+            
+            # Diario de páginas terminadas; al reanudar, saltar las que siguen intactas
+            if not dedupe:
+                journal = PageJournal(output_dir, journal_key(pdf_file, dpi, format_type, prefix, variants)).open(resume)
+            if resume:
+                pending = render_pages if render_pages is not None else range(1, total_pages + 1)
+                finished = journal.completed_pages(pending)
+                render_pages = [page_no for page_no in pending if page_no not in finished]
+                self.log(f"⏩ Resuming: {len(finished)} pages already finished, {len(render_pages)} to render")
+            
+            # Convertir y guardar por ventanas de páginas
+            self.log(f"🔄 Converting pages ({window_size} in memory)...")
+            self.events.put(("start", total_pages if render_pages is None else len(render_pages)))
+            stats = StageStats()
+            dedupe_index = None
+            if dedupe:
+                # Con varios procesos el índice de páginas vistas vive en un proceso aparte
+                manager = index_manager() if workers > 1 else None
+                dedupe_index = manager.DuplicateIndex() if manager else DuplicateIndex()
+            
+            def page_files(page_no):
+                if variants:
+                    return [output_dir / variant_filename(prefix, page_no, variant) for variant in variants]
+                return [output_dir / page_filename(prefix, page_no, format_type)]
+            
+            pages = convert_pdf_pages(pdf_file, output_dir, total_pages, dpi=dpi,
+                                      format_type=format_type, prefix=prefix, workers=workers,
+                                      window_size=window_size, poppler_path=poppler_path,
+                                      encoders=DEFAULT_ENCODERS, stats=stats, pages=render_pages,
+                                      variants=variants, dedupe=dedupe_index, control=control)
+            saved = 0
+            for i, image_path in pages:
+                saved += 1
+                if image_path is None:
+                    self.log(f"⬜ Page {i} is blank: not saved")
+                elif image_path != page_files(i)[0]:
+                    self.log(f"🔁 Page {i} repeats {image_path.name}")
                 else:
-                    image.save(image_path, format_type.upper())
-                
-                self.log(f"💾 Saved: {filename}")
+                    self.log(f"💾 Saved: {image_path.name}")
+                if journal is not None:
+                    journal.record(i, page_files(i))
                 self.update_status(f"Saved page {i}/{total_pages}")
             
+            if control.cancelled():
+                # Las páginas ya guardadas quedan en la carpeta, pero el manifiesto
+                # no las describiría bien: la próxima conversión incremental las rehace
+                invalidate_manifest(output_dir)
+                self.log(f"⏹️ Conversion cancelled: {saved} pages saved")
+                if journal is not None:
+                    self.log("⏩ Tick \"Resume interrupted conversion\" to continue where it stopped")
+                self.update_status("Cancelled")
+                return
+            
+            if plan is not None:
+                for filename in plan.finish():
+                    self.log(f"🗑️ Removed stale file: {filename}")
+            
+            if variants:
+                manifest_path = write_variants_manifest(output_dir, prefix, total_pages, variants, dpi)
+                self.log(f"🗂️ Variants manifest: {manifest_path.name}")
+            
+            if dedupe_index is not None:
+                result = finish_dedupe(dedupe_index, output_dir, prefix, stats, page_files)
+                self.log(f"🔁 {result['blank']} blank and {result['duplicates']} repeated pages not saved: "
+                         f"≈{result['bytes'] / (1024 * 1024):.2f} MB and ≈{result['seconds']:.2f} s "
+                         f"of encoding saved ({result['manifest'].name})")
+            
             self.log(f"✅ Conversion completed successfully!")
             self.log(f"📁 Images saved to: {output_dir}")
+            for line in stats.summary_lines():
+                self.log(f"⏱️ {line}")
             
             # Mostrar mensaje de éxito
-            self.root.after(0, lambda: messagebox.showinfo(
+            self.call_in_ui(lambda: messagebox.showinfo(
                 "Success", 
                 f"PDF converted successfully!\n{total_pages} images saved to:\n{output_dir}"
             ))
@@ -275,21 +509,31 @@ class PDFConverterApp:
         except ImportError as e:
             error_msg = "Missing required dependencies. Please install pdf2image and Pillow."
             self.log(f"❌ Error: {error_msg}")
-            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
+            self.call_in_ui(lambda: messagebox.showerror("Error", error_msg))
             
         except Exception as e:
             error_msg = f"Error during conversion: {str(e)}"
             self.log(f"❌ Error: {error_msg}")
-            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
+            self.call_in_ui(lambda: messagebox.showerror("Error", error_msg))
             
         finally:
+            if journal is not None:
+                journal.close()
+            if manager is not None:
+                manager.shutdown()
             # Restaurar UI
-            self.root.after(0, self.conversion_finished)
+            self.call_in_ui(self.conversion_finished)
     
     def conversion_finished(self):
         """Restaurar UI después de la conversión"""
-        self.progress.stop()
+        if self.progress_started is not None:
+            self.show_progress(self.control.pages_done())
+        self.control = None
+        if self.control_manager is not None:
+            self.control_manager.shutdown()
+            self.control_manager = None
         self.convert_btn.configure(state="normal", text="🔄 Convert PDF to Images")
+        self.cancel_btn.configure(state="disabled")
         self.update_status("Ready")
         self.is_converting = False
 
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Utilidades de renderizado compartidas por los convertidores de PDF
+"""
+
+import io
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import time
+from pathlib import Path
+
+from page_pipeline import DEFAULT_ENCODERS, PageEncoderPool, StageStats, encode_and_write, encode_within_bytes
+from conversion_metrics import peak_rss_mb
+from page_variants import save_page_variants, variant_filename
+from photo_crop import save_page_photos
+from page_budget import plan_page_dpi
+from page_dedupe import BLANK, DUPLICATE, classify_page
+from render_control import until_cancelled
+
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+
+# Número de páginas decodificadas que se mantienen en memoria a la vez
+DEFAULT_WINDOW_SIZE = 4
+
+# Procesos de renderizado en paralelo (uno por núcleo de CPU)
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Bloques de páginas por proceso, para repartir la carga entre páginas pesadas y ligeras
+CHUNKS_PER_WORKER = 4
+
+# Páginas por llamada a poppler cuando escribe directamente a disco (sin imágenes en memoria)
+DIRECT_WINDOW_SIZE = 16
+
+# Formato de pdf2image/pdftoppm para cada formato de salida
+DIRECT_FORMATS = {"png": "png", "jpeg": "jpeg", "tiff": "tiff"}
+
+def find_poppler_path(base_dir):
+    """
+    Buscar una instalación local de Poppler junto al proyecto
+
+    Returns:
+        str | None: Carpeta con los binarios de Poppler, o None para usar el PATH
+    """
+    base_dir = Path(base_dir)
+    local_poppler_paths = [
+        base_dir / "poppler" / "bin",
+        base_dir / "poppler" / "Library" / "bin"
+    ]
+
+    for path in local_poppler_paths:
+        if path.exists() and (path / "pdftoppm.exe").exists():
+            return str(path)
+
+    return None
+
+def get_page_count(pdf_path, poppler_path=None):
+    """Obtener el número de páginas del PDF sin renderizarlo"""
+    info = pdfinfo_from_path(str(pdf_path), poppler_path=poppler_path)
+    return int(info["Pages"])
+
+def get_page_sizes(pdf_path, first_page=1, last_page=None, poppler_path=None):
+    """
+    Leer el tamaño de cada página con pdfinfo, sin renderizar
+
+    Returns:
+        dict: Página -> (ancho, alto) en puntos
+    """
+    if last_page is None:
+        last_page = get_page_count(pdf_path, poppler_path=poppler_path)
+    info = pdfinfo_from_path(str(pdf_path), poppler_path=poppler_path,
+                             first_page=first_page, last_page=last_page)
+    sizes = {}
+    for key, value in info.items():
+        page = re.fullmatch(r"Page\s+(\d+) size", key)
+        size = re.match(r"([0-9.]+) x ([0-9.]+)", value) if page else None
+        if size:
+            sizes[int(page.group(1))] = (float(size.group(1)), float(size.group(2)))
+    if len(sizes) != last_page - first_page + 1:
+        raise RuntimeError(f"pdfinfo no devolvió el tamaño de todas las páginas ({len(sizes)} de "
+                           f"{last_page - first_page + 1})")
+    return sizes
+
+def plan_budget_dpi(pdf_path, total_pages, budget, format_type="PNG", poppler_path=None, samples=3):
+    """
+    Elegir el DPI de cada página para un presupuesto (ver page_budget)
+
+    Con un presupuesto de bytes se renderizan a 72 DPI hasta `samples` páginas
+    repartidas por el documento para medir cuántos bytes ocupa un píxel en el
+    formato de salida, y se usa la más cara.
+
+    Returns:
+        tuple: (dict página -> (ancho, alto) en puntos, dict página -> DPI)
+    """
+    sizes = get_page_sizes(pdf_path, 1, total_pages, poppler_path=poppler_path)
+    if budget.max_bytes:
+        sample_pages = sorted({1, (total_pages + 1) // 2, total_pages})[:samples]
+        measured = []
+        for page_no in sample_pages:
+            images = convert_from_path(str(pdf_path), dpi=72, first_page=page_no, last_page=page_no,
+                                       poppler_path=poppler_path)
+            for image in images:
+                buffer = io.BytesIO()
+                image.save(buffer, format_type.upper(), **save_params(format_type))
+                measured.append(buffer.tell() / (image.width * image.height))
+                image.close()
+        if measured:
+            budget.bytes_per_pixel = max(measured)
+    return sizes, plan_page_dpi(sizes, budget, format_type)
+
+def dpi_windows(first_page, last_page, window_size, dpi):
+    """
+    Rangos de como mucho `window_size` páginas con el mismo DPI
+
+    Args:
+        dpi (int | dict): DPI fijo o DPI de cada página
+
+    Yields:
+        tuple: (primera página, última página, DPI)
+    """
+    if not isinstance(dpi, dict):
+        for start in range(first_page, last_page + 1, window_size):
+            yield start, min(start + window_size - 1, last_page), dpi
+        return
+
+    start = first_page
+    for page_no in range(first_page + 1, last_page + 2):
+        if page_no > last_page or page_no - start == window_size or dpi[page_no] != dpi[start]:
+            yield start, page_no - 1, dpi[start]
+            start = page_no
+
+def iter_pdf_pages(pdf_path, dpi=200, window_size=DEFAULT_WINDOW_SIZE, poppler_path=None,
+                   first_page=1, last_page=None, stats=None):
+    """
+    Renderizar el PDF por ventanas de páginas
+
+    Cada llamada a poppler renderiza como máximo `window_size` páginas, de modo
+    que la memoria máxima depende del tamaño de la ventana y no del total de
+    páginas. El generador suelta cada imagen al entregarla; el consumidor debe
+    cerrarla (`image.close()`) en cuanto la haya guardado.
+
+    Args:
+        pdf_path (str): Ruta del archivo PDF
+        dpi (int | dict): Calidad en DPI, o el DPI de cada página (ver page_budget);
+            una ventana nunca mezcla páginas con distinto DPI
+        window_size (int): Páginas renderizadas por llamada a poppler
+        poppler_path (str): Carpeta de binarios de Poppler (opcional)
+        first_page (int): Primera página a renderizar (1-based)
+        last_page (int): Última página a renderizar (default: última del PDF)
+        stats (StageStats): Acumulador de tiempos de la etapa "render" (opcional);
+            el tiempo de cada ventana se reparte a partes iguales entre sus páginas
+
+    Yields:
+        tuple: (número de página, imagen PIL)
+    """
+    if last_page is None:
+        last_page = get_page_count(pdf_path, poppler_path=poppler_path)
+    window_size = max(1, int(window_size))
+
+    for start, end, window_dpi in dpi_windows(first_page, last_page, window_size, dpi):
+        render_start = time.perf_counter()
+        images = convert_from_path(str(pdf_path), dpi=window_dpi, first_page=start,
+                                   last_page=end, poppler_path=poppler_path)
+        if stats is not None and images:
+            per_page = (time.perf_counter() - render_start) / len(images)
+            for page_no in range(start, start + len(images)):
+                stats.add("render", per_page, page_no=page_no)
+
+        for offset in range(len(images)):
+            image = images[offset]
+            # Soltar la referencia de la lista para que la página se libere al cerrarla
+            images[offset] = None
+            yield start + offset, image
+
+        del images
+
+def page_filename(prefix, page_no, format_type):
+    """Nombre de archivo de una página: {prefix}_{page_no:03d}.{formato}"""
+    return f"{prefix}_{page_no:03d}.{format_type.lower()}"
+
+def save_params(format_type):
+    """Opciones de Pillow con las que se guarda cada formato de página"""
+    if format_type.lower() == 'jpeg':
+        return {"quality": 95, "optimize": True}
+    return {}
+
+def save_page_image(image, image_path, format_type, page_no=None, stats=None, max_bytes=None):
+    """
+    Guardar una página con la optimización propia de cada formato
+
+    Con `max_bytes` la página se reduce en memoria hasta que el archivo quepa.
+    """
+    params = save_params(format_type)
+    if max_bytes:
+        return encode_within_bytes(image, image_path, format_type.upper(), max_bytes, stats=stats,
+                                   page_no=page_no, **params)
+    return encode_and_write(image, image_path, format_type.upper(), stats=stats, page_no=page_no,
+                            **params)
+
+def iter_direct_pages(pdf_path, output_dir, dpi=200, format_type="PNG", prefix="page",
+                      window_size=DIRECT_WINDOW_SIZE, poppler_path=None, first_page=1,
+                      last_page=None, stats=None, control=None):
+    """
+    Renderizar un rango de páginas dejando que poppler escriba los archivos finales
+
+    pdftoppm codifica cada página directamente en la carpeta de salida con un
+    nombre temporal único (`.{prefix}_direct_<uuid>_<página>`, que pdf2image no
+    confunde con restos de una conversión interrumpida ni con los archivos de
+    otro proceso) y aquí solo se renombra al nombre definitivo: las páginas
+    no se decodifican en Python ni se vuelven a codificar con Pillow. Solo
+    sirve cuando no hay que procesar la imagen (variantes, fotos, páginas
+    repetidas). Los tiempos de render incluyen la codificación y la escritura.
+    Tras una cancelación (`control`) se borran los archivos temporales de las
+    páginas que ya no se entregan.
+
+    Yields:
+        tuple: (número de página, ruta del archivo guardado)
+    """
+    output_dir = Path(output_dir)
+    fmt = DIRECT_FORMATS[format_type.lower()]
+    jpegopt = {"quality": 95, "optimize": True} if fmt == "jpeg" else None
+    if last_page is None:
+        last_page = get_page_count(pdf_path, poppler_path=poppler_path)
+    window_size = max(1, int(window_size))
+
+    for start, end, window_dpi in dpi_windows(first_page, last_page, window_size, dpi):
+        # pdf2image recoge todos los archivos que empiezan por el nombre temporal:
+        # único por ventana y de ancho fijo, no es prefijo de ningún otro
+        stem = f".{prefix}_direct_{uuid.uuid4().hex}_{start:06d}"
+        render_start = time.perf_counter()
+        paths = convert_from_path(str(pdf_path), dpi=window_dpi, first_page=start, last_page=end,
+                                  poppler_path=poppler_path, output_folder=str(output_dir),
+                                  output_file=stem, fmt=fmt, jpegopt=jpegopt, paths_only=True)
+        if len(paths) != end - start + 1:
+            raise RuntimeError(f"poppler escribió {len(paths)} páginas de {end - start + 1} "
+                               f"(páginas {start}-{end})")
+        if stats is not None:
+            per_page = (time.perf_counter() - render_start) / len(paths)
+            for page_no in range(start, end + 1):
+                stats.add("render", per_page, page_no=page_no)
+
+        pending = list(zip(range(start, end + 1), paths))
+        try:
+            while pending:
+                if control is not None and control.cancelled():
+                    return
+                page_no, path = pending.pop(0)
+                image_path = output_dir / page_filename(prefix, page_no, format_type)
+                os.replace(path, image_path)
+                yield page_no, image_path
+        finally:
+            for _, path in pending:
+                if os.path.exists(path):
+                    os.unlink(path)
+
+def split_page_range(first_page, last_page, chunks):
+    """Dividir un rango de páginas en como máximo `chunks` bloques contiguos"""
+    total = last_page - first_page + 1
+    if total <= 0:
+        return []
+
+    chunks = max(1, min(chunks, total))
+    size, extra = divmod(total, chunks)
+    ranges = []
+    start = first_page
+    for index in range(chunks):
+        end = start + size - 1 + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+def group_page_ranges(page_numbers):
+    """Agrupar números de página en rangos contiguos: [1, 2, 3, 7] -> [(1, 3), (7, 7)]"""
+    ranges = []
+    for page_no in sorted(set(page_numbers)):
+        if ranges and ranges[-1][1] == page_no - 1:
+            ranges[-1] = (ranges[-1][0], page_no)
+        else:
+            ranges.append((page_no, page_no))
+    return ranges
+
+def split_page_ranges(ranges, chunks):
+    """Repartir varios rangos en bloques de tamaño parecido sin mezclar rangos"""
+    total = sum(end - start + 1 for start, end in ranges)
+    if total <= 0:
+        return []
+
+    chunk_size = -(-total // max(1, chunks))
+    result = []
+    for start, end in ranges:
+        pieces = -(-(end - start + 1) // chunk_size)
+        result.extend(split_page_range(start, end, pieces))
+    return result
+
+def iter_saved_pages(pdf_path, output_dir, dpi=200, format_type="PNG", prefix="page",
+                     window_size=DEFAULT_WINDOW_SIZE, poppler_path=None,
+                     first_page=1, last_page=None, encoders=DEFAULT_ENCODERS, stats=None,
+                     variants=None, photos=False, dedupe=None, max_bytes=None, control=None):
+    """
+    Renderizar y guardar un rango de páginas
+
+    Con `encoders` > 0 las páginas renderizadas pasan por una cola acotada a un
+    pool de hilos que las codifica y escribe mientras poppler renderiza las
+    siguientes. Con `encoders=0` cada página se guarda en el mismo hilo. Con
+    `variants` cada página se escribe en todas las variantes (ver page_variants)
+    a partir del mismo renderizado, y se ignora `format_type`. Con `photos` se
+    recortan además las fotos de cada página mientras sigue en memoria (ver
+    photo_crop). Con `dedupe` (un page_dedupe.DuplicateIndex) las páginas en
+    blanco no se guardan y las repetidas remiten al archivo de la original. Sin
+    ninguna de estas opciones poppler escribe los archivos directamente y la
+    página no pasa por Pillow (ver iter_direct_pages). Con `max_bytes` cada
+    página se reduce hasta que su archivo ocupe como mucho ese tamaño. Con
+    `control` (un render_control.RenderControl) se cuenta cada página guardada
+    y se deja de renderizar en la siguiente página tras una cancelación.
+
+    Yields:
+        tuple: (número de página, ruta del archivo guardado), en orden de página;
+            la ruta es None si la página está en blanco y la de la página
+            original si es repetida
+    """
+    output_dir = Path(output_dir)
+    stats = stats if stats is not None else StageStats()
+
+    def done(page):
+        if control is not None:
+            control.page_done()
+        return page
+
+    if (not variants and not photos and dedupe is None and not max_bytes
+            and format_type.lower() in DIRECT_FORMATS):
+        yield from map(done, iter_direct_pages(pdf_path, output_dir, dpi=dpi, format_type=format_type,
+                                               prefix=prefix,
+                                               window_size=max(window_size, DIRECT_WINDOW_SIZE),
+                                               poppler_path=poppler_path, first_page=first_page,
+                                               last_page=last_page, stats=stats, control=control))
+        return
+
+    pages = iter_pdf_pages(pdf_path, dpi=dpi, window_size=window_size, poppler_path=poppler_path,
+                           first_page=first_page, last_page=last_page, stats=stats)
+    if control is not None:
+        pages = until_cancelled(pages, control)
+
+    if variants:
+        save_func = save_page_variants
+    else:
+        save_func = save_page_image
+
+    def save_args(page_no):
+        if variants:
+            return output_dir, prefix, page_no, variants, stats
+        return (output_dir / page_filename(prefix, page_no, format_type), format_type, page_no, stats,
+                max_bytes)
+
+    def page_path(page_no):
+        if variants:
+            return output_dir / variant_filename(prefix, page_no, variants[0])
+        return output_dir / page_filename(prefix, page_no, format_type)
+
+    def save_page(image, page_no):
+        if dedupe is not None:
+            kind, original = classify_page(image, page_no, dedupe, stats=stats)
+            if kind == BLANK:
+                return None
+            if kind == DUPLICATE:
+                return page_path(original)
+        image_path = save_func(image, *save_args(page_no))
+        if photos:
+            save_page_photos(image, output_dir, prefix, page_no, stats=stats)
+        return image_path
+
+    if encoders <= 0:
+        for page_no, image in pages:
+            try:
+                image_path = save_page(image, page_no)
+            finally:
+                image.close()
+            yield done((page_no, image_path))
+        return
+
+    pool = PageEncoderPool(save_page, encoders=encoders, stats=stats)
+    try:
+        for page_no, image in pages:
+            pool.submit(page_no, image, page_no)
+            yield from map(done, pool.completed())
+    finally:
+        remaining = pool.close()
+    yield from map(done, remaining)
+
+def render_chunk(pdf_path, output_dir, dpi, format_type, prefix, window_size, poppler_path,
+                 encoders, variants, photos, dedupe, max_bytes, control, first_page, last_page):
+    """
+    Renderizar un bloque de páginas dentro de un proceso del pool
+
+    Returns:
+        tuple: (lista de (página, ruta), estadísticas por etapa como dict)
+    """
+    stats = StageStats()
+    if control is not None and control.cancelled():
+        return [], stats.to_dict()
+    pages = list(iter_saved_pages(pdf_path, output_dir, dpi=dpi, format_type=format_type,
+                                  prefix=prefix, window_size=window_size,
+                                  poppler_path=poppler_path, first_page=first_page,
+                                  last_page=last_page, encoders=encoders, stats=stats,
+                                  variants=variants, photos=photos, dedupe=dedupe,
+                                  max_bytes=max_bytes, control=control))
+    stats.set_peak_memory(peak_rss_mb())
+    return pages, stats.to_dict()
+
+def convert_pdf_pages(pdf_path, output_dir, total_pages, dpi=200, format_type="PNG", prefix="page",
+                      workers=1, window_size=DEFAULT_WINDOW_SIZE, poppler_path=None,
+                      encoders=DEFAULT_ENCODERS, stats=None, pages=None, variants=None, photos=False,
+                      dedupe=None, max_bytes=None, executor=None, control=None):
+    """
+    Renderizar y guardar todas las páginas, en serie o repartidas en un pool de procesos
+
+    Con varios workers el rango de páginas se divide en bloques que se renderizan
+    a la vez; cada proceso guarda sus páginas directamente, de modo que solo las
+    rutas vuelven al proceso principal. Los resultados se entregan siempre en
+    orden de página. Dentro de cada proceso, un pool de `encoders` hilos codifica
+    y escribe mientras se renderizan las páginas siguientes. La memoria máxima
+    es del orden de `workers * (window_size + 3 * encoders)` páginas.
+
+    Args:
+        pdf_path (str): Ruta del archivo PDF
+        output_dir (str): Carpeta de salida
+        total_pages (int): Número de páginas del PDF
+        dpi (int | dict): Calidad en DPI, o el DPI de cada página (ver page_budget)
+        format_type (str): Formato de imagen (PNG, JPEG, TIFF)
+        prefix (str): Prefijo para nombres de archivo
+        workers (int): Procesos de renderizado en paralelo
+        window_size (int): Páginas decodificadas en memoria por proceso
+        poppler_path (str): Carpeta de binarios de Poppler (opcional)
+        encoders (int): Hilos de codificación por proceso (0 = guardar en serie)
+        stats (StageStats): Acumulador de tiempos por etapa (opcional)
+        pages (list): Páginas a renderizar (default: todas)
+        variants (list): Variantes de salida por página (ver page_variants, opcional)
+        photos (bool): Recortar también las fotos de cada página (ver photo_crop)
+        dedupe (DuplicateIndex): Omitir páginas en blanco y repetidas (ver page_dedupe);
+            con varios workers debe ser un índice de page_dedupe.index_manager()
+        max_bytes (int): Tamaño máximo del archivo de cada página (sin variantes)
+        executor (ProcessPoolExecutor): Pool ya arrancado con al menos `workers`
+            procesos (p. ej. el de conversion_server); no se cierra al terminar
+        control (RenderControl): Progreso por página y cancelación (ver render_control);
+            con varios workers debe ser un control de render_control.control_manager()
+
+    Yields:
+        tuple: (número de página, ruta del archivo guardado)
+    """
+    stats = stats if stats is not None else StageStats()
+    if pages is None:
+        ranges = [(1, total_pages)] if total_pages > 0 else []
+    else:
+        ranges = group_page_ranges(pages)
+    page_count = sum(end - start + 1 for start, end in ranges)
+    if page_count == 0:
+        return
+
+    workers = max(1, min(int(workers), page_count))
+    stats.set_threads("render", workers)
+    if workers == 1:
+        for start, end in ranges:
+            if control is not None and control.cancelled():
+                break
+            yield from iter_saved_pages(pdf_path, output_dir, dpi=dpi, format_type=format_type,
+                                        prefix=prefix, window_size=window_size,
+                                        poppler_path=poppler_path, first_page=start,
+                                        last_page=end, encoders=encoders, stats=stats,
+                                        variants=variants, photos=photos, dedupe=dedupe,
+                                        max_bytes=max_bytes, control=control)
+        stats.set_peak_memory(peak_rss_mb())
+        return
+
+    stats.set_threads("encode", workers * max(1, encoders))
+    stats.set_threads("write", workers * max(1, encoders))
+    chunks = split_page_ranges(ranges, workers * CHUNKS_PER_WORKER)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    futures = []
+    try:
+        futures = [
+            executor.submit(render_chunk, str(pdf_path), str(output_dir), dpi, format_type,
+                            prefix, window_size, poppler_path, encoders, variants, photos, dedupe,
+                            max_bytes, control, start, end)
+            for start, end in chunks
+        ]
+        # Esperar los bloques en orden para entregar las páginas en orden
+        for future in futures:
+            pages, chunk_stats = future.result()
+            stats.merge(chunk_stats)
+            yield from pages
+            if control is not None and control.cancelled():
+                break
+        stats.set_peak_memory(peak_rss_mb())
+    finally:
+        # Los bloques que aún no empezaron no se renderizan
+        # (shutdown(cancel_futures=True) necesita Python 3.9)
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Recortar la foto de cada lote de las páginas renderizadas del catálogo
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Resultado de cada página (fotos encontradas), para enlazarlas después con los lotes
+PHOTOS_DIR_NAME = ".photos"
+PHOTOS_JSON = "photos.json"
+
+# Ancho aproximado (px) de la versión reducida en la que se analiza la página
+ANALYSIS_WIDTH = 420
+
+# Lado (px de la versión reducida) de los bloques en que se mide la página
+BLOCK = 4
+
+# Un bloque es de foto si casi no tiene píxeles del color del papel (el tono más
+# frecuente de la página, con esta tolerancia)
+PAPER_TOLERANCE = 12
+MAX_PAPER_FRACTION = 0.10
+
+# Bloques de cierre morfológico: une zonas claras o planas dentro de una foto
+CLOSE_BLOCKS = 3
+
+# Tamaño mínimo de una foto (fracción del ancho de página), proporción mínima de bloques de
+# foto, relación de aspecto máxima (descarta bandas y filetes) y contraste mínimo (descarta
+# recuadros de color plano)
+MIN_PHOTO_SIZE = 0.06
+MIN_FILL = 0.6
+MAX_ASPECT = 4.0
+MIN_REGION_STD = 10.0
+
+# Distancia máxima (fracción de página) entre el texto de un lote y su foto
+MAX_LINK_GAP = 0.08
+
+PHOTO_QUALITY = 85
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def photo_filename(prefix, page_no, index):
+    """Nombre del recorte: {prefix}_{page_no:03d}_photo{index}.jpg"""
+    return f"{prefix}_{page_no:03d}_photo{index}.jpg"
+
+def _box_sum(mask, size):
+    """Suma de cada ventana size x size centrada (tabla acumulada, sin bucles por píxel)"""
+    pad = size // 2
+    padded = np.pad(mask.astype(np.int32), ((pad + 1, pad), (pad + 1, pad)))
+    table = padded.cumsum(axis=0).cumsum(axis=1)
+    return (table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size])
+
+def _close(mask, size):
+    """Cierre morfológico (dilatación seguida de erosión) con un cuadrado de lado `size`"""
+    dilated = _box_sum(mask, size) > 0
+    return _box_sum(dilated, size) == size * size
+
+def _runs(flags):
+    """Tramos [inicio, fin) de valores True consecutivos de un vector booleano"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.view(np.int8), [0]))))
+    return edges.reshape(-1, 2)
+
+def paper_mask(gray):
+    """Píxeles del color del papel: el tono más frecuente de la página (blanco o papel tintado)"""
+    paper_level = int(np.bincount(gray.ravel(), minlength=256).argmax())
+    return np.abs(gray.astype(np.int16) - paper_level) <= PAPER_TOLERANCE
+
+def photo_block_mask(gray):
+    """
+    Mapa de bloques de foto de una página en escala de grises
+
+    Cada bloque de BLOCK x BLOCK píxeles se mide de una vez con un reshape:
+    el texto deja papel entre letras y líneas en casi todos los bloques,
+    mientras que dentro de una foto casi no queda papel a la vista.
+    """
+    rows, cols = gray.shape[0] // BLOCK, gray.shape[1] // BLOCK
+    paper = paper_mask(gray[:rows * BLOCK, :cols * BLOCK]).reshape(rows, BLOCK, cols, BLOCK)
+    mask = paper.mean(axis=(1, 3)) <= MAX_PAPER_FRACTION
+    return _close(mask, CLOSE_BLOCKS)
+
+def find_regions(mask, min_blocks, gray=None):
+    """
+    Rectángulos de foto de un mapa de bloques por proyecciones de filas y columnas
+
+    Corte XY: la proyección por filas separa bandas horizontales, dentro de
+    cada banda la proyección por columnas separa las fotos, y una última
+    proyección por filas ajusta cada rectángulo a su foto.
+
+    Returns:
+        list: (fila0, col0, fila1, col1) en bloques, fin exclusivo
+    """
+    regions = []
+    for top, bottom in _runs(mask.any(axis=1)):
+        band = mask[top:bottom]
+        for left, right in _runs(band.any(axis=0)):
+            cell = band[:, left:right]
+            for row0, row1 in _runs(cell.any(axis=1)):
+                height, width = row1 - row0, right - left
+                if height < min_blocks or width < min_blocks:
+                    continue
+                if max(height, width) > MAX_ASPECT * min(height, width):
+                    continue
+                if cell[row0:row1].mean() < MIN_FILL:
+                    continue
+                if gray is not None:
+                    pixels = gray[(top + row0) * BLOCK:(top + row1) * BLOCK, left * BLOCK:right * BLOCK]
+                    if pixels.std() < MIN_REGION_STD:
+                        continue
+                regions.append((top + row0, left, top + row1, right))
+    return regions
+
+def detect_photos(image):
+    """
+    Buscar las fotos de una página renderizada
+
+    El análisis se hace sobre una versión reducida (ANALYSIS_WIDTH px de
+    ancho) en escala de grises, así que cuesta lo mismo a cualquier DPI.
+
+    Returns:
+        list: Rectángulos (x0, y0, x1, y1) en píxeles de la página, en orden de lectura
+    """
+    factor = max(1, image.width // ANALYSIS_WIDTH)
+    small = image.reduce(factor) if factor > 1 else image
+    gray = np.asarray(small.convert("L"))
+    mask = photo_block_mask(gray)
+
+    scale = BLOCK * factor
+    min_blocks = max(2, int(MIN_PHOTO_SIZE * gray.shape[1] / BLOCK))
+    boxes = []
+    for row0, col0, row1, col1 in find_regions(mask, min_blocks, gray):
+        boxes.append((int(col0 * scale), int(row0 * scale),
+                      min(image.width, int(col1 * scale)), min(image.height, int(row1 * scale))))
+    return boxes
+
+def _write_json(path, data):
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+def save_page_photos(image, output_dir, prefix, page_no, stats=None):
+    """
+    Recortar y guardar las fotos de una página ya renderizada
+
+    Pensado para llamarse dentro del pipeline de renderizado con la página
+    aún en memoria. Los rectángulos se guardan en .photos/ (relativos a la
+    página) para enlazarlos con los lotes al final (link_photos).
+
+    Returns:
+        list: Fotos de la página ({"file", "bbox"})
+    """
+    start = time.perf_counter()
+    output_dir = Path(output_dir)
+    photos = []
+    for index, (x0, y0, x1, y1) in enumerate(detect_photos(image), 1):
+        name = photo_filename(prefix, page_no, index)
+        crop = image.crop((x0, y0, x1, y1))
+        if crop.mode not in ("RGB", "L"):
+            crop = crop.convert("RGB")
+        crop.save(output_dir / name, "JPEG", quality=PHOTO_QUALITY)
+        photos.append({
+            "file": name,
+            "bbox": [round(x0 / image.width, 4), round(y0 / image.height, 4),
+                     round(x1 / image.width, 4), round(y1 / image.height, 4)],
+        })
+
+    # Borrar los recortes de un análisis anterior que ya no existen
+    current = {photo["file"] for photo in photos}
+    for photo in load_page_photos(output_dir, page_no) or []:
+        if photo["file"] not in current:
+            try:
+                (output_dir / photo["file"]).unlink()
+            except FileNotFoundError:
+                pass
+
+    photos_dir = output_dir / PHOTOS_DIR_NAME
+    photos_dir.mkdir(exist_ok=True)
+    _write_json(photos_dir / f"{page_no:03d}.json", photos)
+    if stats is not None:
+        stats.add("crop", time.perf_counter() - start, page_no=page_no)
+    return photos
+
+def _gap(a, b):
+    """Distancia entre dos intervalos (0 si se solapan)"""
+    return max(0.0, max(a[0], b[0]) - min(a[1], b[1]))
+
+def match_photos(lots, photos):
+    """
+    Emparejar los lotes de una página con sus fotos
+
+    Cada lote se empareja como mucho con una foto, la más cercana a su texto
+    (encima, debajo o al lado), empezando por las parejas más próximas.
+
+    Returns:
+        dict: índice de lote -> foto
+    """
+    pairs = []
+    for lot_index, lot in enumerate(lots):
+        if not lot.get("bbox"):
+            continue
+        lx0, ly0, lx1, ly1 = lot["bbox"]
+        for photo_index, photo in enumerate(photos):
+            px0, py0, px1, py1 = photo["bbox"]
+            dx, dy = _gap((lx0, lx1), (px0, px1)), _gap((ly0, ly1), (py0, py1))
+            # La foto debe estar en la misma columna o en la misma fila que el texto
+            if dx > 0 and dy > 0:
+                continue
+            gap = max(dx, dy)
+            if gap <= MAX_LINK_GAP:
+                pairs.append((gap, lot_index, photo_index))
+
+    links = {}
+    used = set()
+    for _, lot_index, photo_index in sorted(pairs):
+        if lot_index in links or photo_index in used:
+            continue
+        links[lot_index] = photos[photo_index]
+        used.add(photo_index)
+    return links
+
+def load_page_photos(output_dir, page_no):
+    try:
+        with open(Path(output_dir) / PHOTOS_DIR_NAME / f"{page_no:03d}.json", "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def link_photos(output_dir, total_pages, catalog_path=None):
+    """
+    Enlazar las fotos recortadas con los lotes del catálogo
+
+    Escribe photos.json (fotos por página y foto de cada lote) y, si existe
+    catalog.json, añade a cada lote el campo "photo".
+
+    Returns:
+        dict: photos (recortes), lots (lotes con foto), json (ruta de photos.json)
+    """
+    from lot_extract import CATALOG_JSON
+
+    output_dir = Path(output_dir)
+    catalog_path = Path(catalog_path) if catalog_path else output_dir / CATALOG_JSON
+    pages = {page_no: load_page_photos(output_dir, page_no) or [] for page_no in range(1, total_pages + 1)}
+
+    catalog = None
+    if catalog_path.is_file():
+        with open(catalog_path, "r", encoding="utf-8") as file:
+            catalog = json.load(file)
+
+    lot_photos = {}
+    if catalog is not None:
+        by_page = {}
+        for lot in catalog.get("lots", []):
+            lot.pop("photo", None)
+            by_page.setdefault(lot.get("page"), []).append(lot)
+        for page_no, lots in by_page.items():
+            for lot_index, photo in match_photos(lots, pages.get(page_no, [])).items():
+                lots[lot_index]["photo"] = photo["file"]
+                lot_photos[str(lots[lot_index]["lot"])] = photo["file"]
+        _write_json(catalog_path, catalog)
+
+    photos_path = output_dir / PHOTOS_JSON
+    _write_json(photos_path, {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "pages": {str(page_no): photos for page_no, photos in pages.items() if photos},
+        "lots": lot_photos,
+    })
+    return {
+        "photos": sum(len(photos) for photos in pages.values()),
+        "lots": len(lot_photos),
+        "json": photos_path,
+    }
+
+def crop_rendered_pages(output_dir, prefix="page", format_type="PNG", force=False, force_pages=()):
+    """
+    Recortar las fotos de páginas ya guardadas (fuera del pipeline de renderizado)
+
+    Solo se procesan las páginas sin resultado en .photos/, salvo con `force`
+    o si están en `force_pages` (p. ej. páginas reaprovechadas con otro número).
+
+    Returns:
+        tuple: (páginas procesadas, número total de páginas)
+    """
+    output_dir = Path(output_dir)
+    suffix = "." + format_type.lower()
+    page_files = sorted(path for path in output_dir.glob(f"{prefix}_*{suffix}")
+                        if path.stem[len(prefix) + 1:].isdigit())
+    processed = 0
+    total_pages = 0
+    for path in page_files:
+        page_no = int(path.stem[len(prefix) + 1:])
+        total_pages = max(total_pages, page_no)
+        result = output_dir / PHOTOS_DIR_NAME / f"{page_no:03d}.json"
+        if not force and page_no not in force_pages and result.is_file() and result.stat().st_mtime >= path.stat().st_mtime:
+            continue
+        with Image.open(path) as image:
+            image.load()
+            save_page_photos(image, output_dir, prefix, page_no)
+        processed += 1
+    return processed, total_pages
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Recortar la foto de cada lote de las páginas renderizadas")
+    parser.add_argument("output", nargs="?", default="auction_images",
+                        help="Carpeta de las imágenes de página (default: auction_images)")
+    parser.add_argument("--prefix", default="auction_page", help="Prefijo de las imágenes (default: auction_page)")
+    parser.add_argument("--format", dest="format_type", default="PNG", type=str.upper,
+                        choices=["PNG", "JPEG", "TIFF"], help="Formato de las imágenes (default: PNG)")
+    parser.add_argument("--force", action="store_true", help="Volver a analizar todas las páginas")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    if not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+        log_message("❌ Error: el recorte de fotos necesita numpy y Pillow (pip install numpy Pillow)")
+        return 1
+    if not Path(args.output).is_dir():
+        log_message(f"❌ Error: carpeta no encontrada: {args.output}")
+        return 1
+
+    start = time.perf_counter()
+    processed, total_pages = crop_rendered_pages(args.output, args.prefix, args.format_type, force=args.force)
+    elapsed = time.perf_counter() - start
+    result = link_photos(args.output, total_pages)
+    log_message(f"📷 {processed} páginas analizadas en {elapsed:.1f} s "
+                f"({processed / elapsed if elapsed > 0 else 0:.1f} páginas/s)")
+    log_message(f"📷 {result['photos']} fotos, {result['lots']} lotes con foto: {result['json']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Publicar las imágenes de la subasta con nombres basados en su contenido
+
+Cada imagen de la carpeta de salida se copia a `static/` como
+`<nombre>.<hash>.<ext>` junto a variantes WebP/AVIF más ligeras, y
+`static/asset-manifest.json` relaciona el nombre original con el publicado. Como el nombre cambia cuando cambia el
+contenido, los archivos publicados pueden cachearse para siempre.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_render import DEFAULT_WORKERS
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+STATIC_DIR_NAME = "static"
+ASSET_MANIFEST = "asset-manifest.json"
+MANIFEST_VERSION = 1
+
+# Caracteres del hash en el nombre publicado (64 bits)
+HASH_LENGTH = 16
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".webp", ".gif"}
+
+CONTENT_TYPES = {
+    ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".tif": "image/tiff",
+    ".tiff": "image/tiff", ".webp": "image/webp", ".gif": "image/gif", ".avif": "image/avif",
+    ".json": "application/json",
+}
+
+# Variantes precomprimidas: tipo MIME -> (formato de Pillow, extensión, opciones)
+VARIANT_FORMATS = {
+    "webp": ("image/webp", "WEBP", ".webp", {"quality": 80, "method": 4}),
+    "avif": ("image/avif", "AVIF", ".avif", {"quality": 60}),
+}
+DEFAULT_VARIANT_FORMATS = ("webp",)
+
+def log_message(message):
+    """Imprimir mensaje con timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _copy_atomic(source, target):
+    # Copia y no enlace duro: los conversores reescriben las páginas en el mismo inodo
+    if target.exists():
+        return
+    temp_path = target.with_name(target.name + ".tmp")
+    shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+def _write_variant(image, target, pillow_format, options):
+    temp_path = target.with_name(target.name + ".tmp")
+    image.save(temp_path, pillow_format, **options)
+    os.replace(temp_path, target)
+
+def publish_image(source, static_dir, variant_formats=DEFAULT_VARIANT_FORMATS, previous=None):
+    """
+    Publicar una imagen y sus variantes
+
+    Args:
+        source (Path): Imagen original
+        static_dir (Path): Carpeta de publicación
+        variant_formats (tuple): Claves de VARIANT_FORMATS a generar
+        previous (dict): Entrada del manifiesto anterior (se reutiliza si el original no cambió)
+
+    Returns:
+        dict: Entrada del manifiesto
+    """
+    stat = source.stat()
+    if (previous and previous.get("source_size") == stat.st_size
+            and previous.get("source_mtime_ns") == stat.st_mtime_ns
+            and (static_dir / previous["file"]).is_file()
+            and set(previous.get("variants", {})) | set(previous.get("skipped", [])) >= {
+                VARIANT_FORMATS[name][0] for name in variant_formats}
+            and all((static_dir / v["file"]).is_file() for v in previous.get("variants", {}).values())):
+        return previous
+
+    sha256 = file_sha256(source)
+    stem, suffix = source.stem, source.suffix.lower()
+    published = f"{stem}.{sha256[:HASH_LENGTH]}{suffix}"
+    _copy_atomic(source, static_dir / published)
+
+    entry = {
+        "file": published,
+        "etag": f'"{sha256[:32]}"',
+        "content_type": CONTENT_TYPES.get(suffix, "application/octet-stream"),
+        "bytes": stat.st_size,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "variants": {},
+        "skipped": [],
+    }
+
+    if not PIL_AVAILABLE:
+        return entry
+
+    Image.init()
+    with Image.open(source) as image:
+        entry["width"], entry["height"] = image.size
+        if suffix in (".gif", ".webp"):
+            return entry
+        image.load()
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        for name in variant_formats:
+            content_type, pillow_format, extension, options = VARIANT_FORMATS[name]
+            if pillow_format not in Image.SAVE:
+                entry["skipped"].append(content_type)
+                continue
+            target = static_dir / f"{stem}.{sha256[:HASH_LENGTH]}{extension}"
+            if not target.is_file():
+                _write_variant(image, target, pillow_format, options)
+            size = target.stat().st_size
+            # Una variante que no ahorra bytes no se sirve
+            if size >= stat.st_size:
+                target.unlink()
+                entry["skipped"].append(content_type)
+                continue
+            entry["variants"][content_type] = {
+                "file": target.name,
+                "etag": f'"{sha256[:32]}-{name}"',
+                "bytes": size,
+            }
+    return entry
+
+def load_manifest(static_dir):
+    """Manifiesto de publicación ({} si no existe o es de otra versión)"""
+    try:
+        with open(Path(static_dir) / ASSET_MANIFEST, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+def publish_images(output_dir, variant_formats=DEFAULT_VARIANT_FORMATS, workers=DEFAULT_WORKERS, prune=False):
+    """
+    Publicar todas las imágenes de una carpeta de salida
+
+    Solo se vuelven a procesar las imágenes cuyo tamaño o fecha cambió desde
+    la última publicación.
+
+    Args:
+        output_dir (str): Carpeta con las imágenes convertidas
+        variant_formats (tuple): Variantes a generar ("webp", "avif")
+        workers (int): Imágenes procesadas en paralelo
+        prune (bool): Borrar de static/ los archivos que ya no están en el manifiesto
+
+    Returns:
+        dict: images, published (procesadas de nuevo), pruned, manifest (ruta)
+    """
+    output_dir = Path(output_dir)
+    static_dir = output_dir / STATIC_DIR_NAME
+    static_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = load_manifest(static_dir).get("assets", {})
+    sources = sorted(path for path in output_dir.iterdir()
+                     if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+                     and not path.name.startswith("."))
+
+    def publish(source):
+        return source.name, publish_image(source, static_dir, variant_formats, previous.get(source.name))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        assets = dict(executor.map(publish, sources))
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "assets": assets,
+    }
+    manifest_path = static_dir / ASSET_MANIFEST
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, manifest_path)
+
+    pruned = 0
+    if prune:
+        referenced = {ASSET_MANIFEST}
+        for entry in assets.values():
+            referenced.add(entry["file"])
+            referenced.update(variant["file"] for variant in entry["variants"].values())
+        for path in static_dir.iterdir():
+            if path.is_file() and path.name not in referenced:
+                path.unlink()
+                pruned += 1
+
+    return {
+        "images": len(assets),
+        "published": sum(1 for name, entry in assets.items() if entry is not previous.get(name)),
+        "pruned": pruned,
+        "manifest": manifest_path,
+    }
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Publicar las imágenes con nombres por contenido para cacheo permanente")
+    parser.add_argument("output", nargs="?", default="auction_images",
+                        help="Carpeta de las imágenes convertidas (default: auction_images)")
+    parser.add_argument("--formats", default=",".join(DEFAULT_VARIANT_FORMATS),
+                        help=f"Variantes precomprimidas: {', '.join(VARIANT_FORMATS)} o vacío "
+                             f"(default: {','.join(DEFAULT_VARIANT_FORMATS)})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Imágenes procesadas en paralelo (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--prune", action="store_true",
+                        help="Borrar de static/ las versiones que ya no están publicadas")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Función principal"""
+    args = parse_args(argv)
+    variant_formats = tuple(name.strip().lower() for name in args.formats.split(",") if name.strip())
+    unknown = [name for name in variant_formats if name not in VARIANT_FORMATS]
+    if unknown:
+        log_message(f"❌ Formatos de variante desconocidos: {', '.join(unknown)}")
+        return 2
+    if not Path(args.output).is_dir():
+        log_message(f"❌ Error: carpeta no encontrada: {args.output}")
+        return 1
+    if variant_formats and not PIL_AVAILABLE:
+        log_message("⚠️ Pillow no está instalado: se publican las imágenes sin variantes")
+
+    result = publish_images(args.output, variant_formats, workers=args.workers, prune=args.prune)
+    log_message(f"🌐 {result['images']} imágenes publicadas ({result['published']} nuevas o cambiadas, "
+                f"{result['pruned']} archivos antiguos borrados)")
+    log_message(f"🗂️ Manifiesto: {result['manifest']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Progreso y cancelación de una conversión, compartidos con los procesos de renderizado
+"""
+
+import threading
+from multiprocessing.managers import BaseManager
+
+class RenderControl:
+    """
+    Páginas guardadas hasta ahora y petición de cancelar
+
+    Los procesos de renderizado llaman a `page_done` por cada página guardada
+    y consultan `cancelled` antes de guardar la siguiente, así que una
+    cancelación se atiende en el siguiente límite de página. Para compartirlo
+    entre procesos debe crearse con control_manager().
+    """
+
+    def __init__(self):
+        self._pages = 0
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def page_done(self):
+        with self._lock:
+            self._pages += 1
+
+    def pages_done(self):
+        with self._lock:
+            return self._pages
+
+    def cancel(self):
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+class _ControlManager(BaseManager):
+    pass
+
+_ControlManager.register("RenderControl", RenderControl)
+
+def control_manager():
+    """
+    Proceso que guarda los RenderControl compartidos por los procesos de renderizado
+
+    `manager.RenderControl()` crea un control cuyo proxy puede pasarse a los
+    procesos del pool. Llamar a `manager.shutdown()` al terminar.
+    """
+    manager = _ControlManager()
+    manager.start()
+    return manager
+
+def until_cancelled(pages, control):
+    """
+    Entregar las páginas renderizadas (número, imagen) hasta que se cancele la conversión
+
+    La página que llega después de la cancelación se cierra sin guardarla y se
+    detiene el generador de origen.
+    """
+    for page_no, image in pages:
+        if control.cancelled():
+            image.close()
+            pages.close()
+            return
+        yield page_no, image
@@ -52,6 +52,8 @@ const USER_STATUS = {
 let appState = {
     currentTab: 'auctions',
     cars: [],
+    catalogApi: false,
+    catalogVersion: 0,
     favorites: JSON.parse(localStorage.getItem('favorites') || '[]'),
     profile: JSON.parse(localStorage.getItem('profile') || '{}'),
     biddingHistory: JSON.parse(localStorage.getItem('biddingHistory') || '[]'),
@@ -149,6 +151,298 @@ const sampleCars = [
     }
 ];
 
+// Catalog extracted from the auction PDF (lot_extract.py), served next to the page images
+const CATALOG_URL = 'auction_images/catalog.json';
+const CATALOG_IMAGE_BASE = 'auction_images/';
+
+// Content-hashed copies of the images (publish_images.py): cacheable forever
+const ASSET_BASE = window.ASSET_BASE_URL || CATALOG_IMAGE_BASE + 'static/';
+let assetManifest = null;
+
+function loadAssetManifest() {
+    if (!assetManifest) {
+        assetManifest = fetch(`${ASSET_BASE}asset-manifest.json`, { cache: 'no-cache' })
+            .then(response => response.ok ? response.json() : { assets: {} })
+            .then(manifest => manifest.assets || {})
+            .catch(() => ({}));
+    }
+    return assetManifest;
+}
+
+function assetUrl(assets, name) {
+    const asset = assets[name];
+    return asset ? ASSET_BASE + asset.file : CATALOG_IMAGE_BASE + name;
+}
+
+function catalogLotToCar(lot, assets = {}) {
+    const startingPrice = lot.starting_price || 0;
+    // La foto recortada del lote (photo_crop.py) si existe; si no, la página entera
+    const asset = assets[lot.photo || lot.image] || {};
+    const srcset = lot.photo ? '' : Object.values(lot.images || {})
+        .filter(name => assets[name] && assets[name].width)
+        .map(name => `${assetUrl(assets, name)} ${assets[name].width}w`)
+        .join(', ');
+    const currentBid = lot.current_bid != null ? lot.current_bid : startingPrice;
+    return {
+        id: lot.lot,
+        title: lot.title,
+        brand: (lot.make || '').toLowerCase(),
+        year: lot.year || '',
+        mileage: lot.mileage_km != null ? `${lot.mileage_km.toLocaleString()} km` : '',
+        currentBid: currentBid,
+        minBid: lot.min_bid != null ? lot.min_bid : currentBid + 500,
+        timeLeft: '',
+        image: assetUrl(assets, lot.photo || lot.image),
+        imageSrcset: srcset,
+        imageWidth: asset.width,
+        imageHeight: asset.height,
+        description: lot.text,
+        specs: {
+            'Lot': lot.lot,
+            'Page': lot.page,
+            'Currency': lot.currency || ''
+        }
+    };
+}
+
+// Indexed search service (auction_server.py); when it is not reachable the app filters locally
+const CATALOG_API = window.CATALOG_API_URL || '/api';
+
+async function detectCatalogApi() {
+    try {
+        const response = await fetch(`${CATALOG_API}/facets`);
+        if (!response.ok) return;
+        const data = await response.json();
+        appState.catalogApi = true;
+        updateBrandFilterOptions(data.facets.brand);
+        startLiveUpdates();
+        syncCatalog().catch(error => console.warn('Catalog sync failed:', error));
+    } catch (error) {
+        appState.catalogApi = false;
+    }
+}
+
+// Incremental catalog sync (auction_server.py /api/catalog): after the first
+// load only lots changed since the last known version are fetched, and an
+// unchanged catalog answers 304 to the If-None-Match the browser sends.
+async function syncCatalog() {
+    let since = appState.catalogVersion || 0;
+    let changed = [];
+    let reset = false;
+    let version = since;
+    
+    for (;;) {
+        const response = await fetch(`${CATALOG_API}/catalog?since=${since}`, { cache: 'no-cache' });
+        if (response.status === 304) return;
+        if (!response.ok) throw new Error(`Catalog API ${response.status}`);
+        const page = await response.json();
+        reset = reset || page.reset;
+        changed = changed.concat(page.lots);
+        version = page.version;
+        if (!page.next_cursor) break;
+        since = page.next_cursor;
+    }
+    
+    const firstLoad = !appState.catalogVersion || reset;
+    appState.catalogVersion = version;
+    if (changed.length === 0) return;
+    const assets = await loadAssetManifest();
+    if (firstLoad) {
+        appState.cars = changed.filter(lot => !lot.removed).map(lot => catalogLotToCar(lot, assets));
+        loadCars();
+        return;
+    }
+    
+    // Patch the changed cards; only added or removed lots need the grid rebuilt
+    let rebuild = false;
+    changed.forEach(lot => {
+        const index = appState.cars.findIndex(car => car.id === lot.lot);
+        if (lot.removed) {
+            if (index !== -1) {
+                appState.cars.splice(index, 1);
+                rebuild = true;
+            }
+        } else if (index === -1) {
+            appState.cars.push(catalogLotToCar(lot, assets));
+            rebuild = true;
+        } else {
+            const car = Object.assign(appState.cars[index], catalogLotToCar(lot, assets), {
+                endsAt: appState.cars[index].endsAt,
+                timeLeft: appState.cars[index].timeLeft
+            });
+            updateCarCards(car);
+        }
+    });
+    if (rebuild) {
+        appState.cars.sort((a, b) => a.id - b.id);
+        displayCars(appState.cars);
+    }
+}
+
+// Live bid updates (auction_server.py /api/live, Server-Sent Events).
+// Each card subscribes to its lot while it is on screen; the server pushes
+// only changes of those lots and the cards are patched in place.
+const liveUpdates = {
+    source: null,
+    clientId: null,
+    visible: new Set(),
+    subscribeTimer: null,
+    observer: 'IntersectionObserver' in window
+        ? new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                const carId = parseInt(entry.target.dataset.carId);
+                if (entry.isIntersecting) {
+                    liveUpdates.visible.add(carId);
+                } else {
+                    liveUpdates.visible.delete(carId);
+                }
+            });
+            scheduleLiveSubscription();
+        })
+        : null
+};
+
+function observeLiveCard(card) {
+    if (liveUpdates.observer) {
+        liveUpdates.observer.observe(card);
+    } else {
+        liveUpdates.visible.add(parseInt(card.dataset.carId));
+        scheduleLiveSubscription();
+    }
+}
+
+function startLiveUpdates() {
+    if (liveUpdates.source || !('EventSource' in window)) return;
+    
+    const source = new EventSource(`${CATALOG_API}/live`);
+    liveUpdates.source = source;
+    
+    // Sent on every (re)connection: subscribe again with the new client id
+    source.addEventListener('hello', event => {
+        const hello = JSON.parse(event.data);
+        liveUpdates.clientId = hello.client;
+        liveUpdates.clockOffset = hello.server_time * 1000 - Date.now();
+        if (hello.closes_at) {
+            appState.cars.forEach(car => {
+                if (!car.endsAt) car.endsAt = hello.closes_at * 1000;
+            });
+        }
+        scheduleLiveSubscription(0);
+    });
+    
+    source.addEventListener('lot', event => applyLotDelta(JSON.parse(event.data)));
+}
+
+function scheduleLiveSubscription(delay = 250) {
+    if (!liveUpdates.source) return;
+    clearTimeout(liveUpdates.subscribeTimer);
+    liveUpdates.subscribeTimer = setTimeout(sendLiveSubscription, delay);
+}
+
+async function sendLiveSubscription() {
+    if (!liveUpdates.clientId) return;
+    try {
+        await fetch(`${CATALOG_API}/live/subscribe`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ client: liveUpdates.clientId, lots: Array.from(liveUpdates.visible) })
+        });
+    } catch (error) {
+        console.warn('Live subscription failed:', error);
+    }
+}
+
+function applyLotDelta(delta) {
+    const car = appState.cars.find(c => c.id === delta.lot);
+    if (!car) return;
+    
+    car.currentBid = delta.current_bid;
+    car.minBid = delta.min_bid;
+    if (delta.ends_at) car.endsAt = delta.ends_at * 1000;
+    if (delta.closed) {
+        car.timeLeft = 'Closed';
+    } else if (car.endsAt) {
+        car.timeLeft = formatTimeLeft(car.endsAt);
+    }
+    updateCarCards(car);
+}
+
+function formatTimeLeft(endsAt) {
+    const seconds = Math.floor((endsAt - Date.now() - (liveUpdates.clockOffset || 0)) / 1000);
+    if (seconds <= 0) return 'Closed';
+    const days = Math.floor(seconds / 86400);
+    const hours = Math.floor(seconds % 86400 / 3600);
+    const minutes = Math.floor(seconds % 3600 / 60);
+    if (days > 0) return `${days}d ${hours}h`;
+    if (hours > 0) return `${hours}h ${minutes}m`;
+    return `${minutes}m ${seconds % 60}s`;
+}
+
+// Patch the price and time left of every card showing this car
+function updateCarCards(car) {
+    document.querySelectorAll(`.car-card[data-car-id="${car.id}"]`).forEach(card => {
+        const price = card.querySelector('.car-price');
+        const timeLeft = card.querySelector('.car-time-left');
+        const priceText = `$${car.currentBid.toLocaleString()}`;
+        if (price && price.textContent !== priceText) price.textContent = priceText;
+        if (timeLeft) timeLeft.textContent = `⏰ ${car.timeLeft}`;
+    });
+}
+
+function updateBrandFilterOptions(brandCounts) {
+    const select = document.getElementById('brand-filter');
+    const selected = select.value;
+    select.innerHTML = '<option value="">All brands</option>';
+    Object.entries(brandCounts).forEach(([brand, count]) => {
+        const option = document.createElement('option');
+        option.value = brand.toLowerCase();
+        option.textContent = `${brand} (${count})`;
+        select.appendChild(option);
+    });
+    select.value = selected;
+}
+
+async function queryCatalogApi(endpoint, params) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value) query.set(key, value);
+    });
+    const response = await fetch(`${CATALOG_API}/${endpoint}?${query}`);
+    if (!response.ok) throw new Error(`Catalog API ${response.status}`);
+    return response.json();
+}
+
+async function searchCatalogApi() {
+    const result = await queryCatalogApi('search', {
+        q: document.getElementById('search-input').value,
+        brand: document.getElementById('brand-filter').value,
+        price: document.getElementById('price-filter').value,
+        limit: 200,
+        facets: '0'
+    });
+    const assets = await loadAssetManifest();
+    displayCars(result.lots.map(lot => catalogLotToCar(lot, assets)));
+}
+
+async function loadCatalogLots() {
+    // Replace the sample data with the extracted catalog when it has been published
+    if (appState.catalogApi) {
+        syncCatalog().catch(error => console.warn('Catalog sync failed:', error));
+        return;
+    }
+    try {
+        const response = await fetch(CATALOG_URL, { cache: 'no-cache' });
+        if (!response.ok) return;
+        const catalog = await response.json();
+        if (!Array.isArray(catalog.lots) || catalog.lots.length === 0) return;
+        const assets = await loadAssetManifest();
+        appState.cars = catalog.lots.map(lot => catalogLotToCar(lot, assets));
+        loadCars();
+    } catch (error) {
+        console.warn('Catalog not available, using sample data:', error);
+    }
+}
+
 function initApp() {
     // Initialize sample data
     appState.cars = sampleCars;
@@ -163,6 +457,8 @@ function initApp() {
     
     // Load initial data
     loadCars();
+    loadCatalogLots();
+    detectCatalogApi();
     loadProfile();
     loadBiddingHistory();
     
@@ -440,6 +736,7 @@ function showSkeletonLoading(container) {
 function createCarCard(car) {
     const card = document.createElement('div');
     card.className = 'car-card';
+    card.dataset.carId = car.id;
     
     // Create image container with placeholder
     const imageContainer = document.createElement('div');
@@ -454,6 +751,13 @@ function createCarCard(car) {
     const img = document.createElement('img');
     img.className = 'car-image car-image-loading';
     img.alt = car.title;
+    img.loading = 'lazy';
+    img.decoding = 'async';
+    // Intrinsic size from the asset manifest reserves the space before the image arrives
+    if (car.imageWidth && car.imageHeight) {
+        img.width = car.imageWidth;
+        img.height = car.imageHeight;
+    }
     img.onerror = function() {
         this.style.display = 'none';
         placeholder.innerHTML = '📷';
@@ -469,6 +773,11 @@ function createCarCard(car) {
     
     // Set image source after setup to prevent flickering
     setTimeout(() => {
+        // Let the browser pick a converter variant (thumb/large) when the lot provides them
+        if (car.imageSrcset) {
+            img.srcset = car.imageSrcset;
+            img.sizes = '(max-width: 480px) 100vw, 320px';
+        }
         img.src = car.image;
     }, 50);
     
@@ -480,7 +789,7 @@ function createCarCard(car) {
         <div class="car-title">${car.title}</div>
         <div class="car-details">
             <span>${car.year} • ${car.mileage}</span>
-            <span>⏰ ${car.timeLeft}</span>
+            <span class="car-time-left">⏰ ${car.timeLeft}</span>
         </div>
         <div class="car-price">$${car.currentBid.toLocaleString()}</div>
         <div class="car-actions">
@@ -501,10 +810,18 @@ function createCarCard(car) {
         }
     });
     
+    // Follow this lot's bids while the card is on screen
+    observeLiveCard(card);
+    
     return card;
 }
 
 function searchCars() {
+    if (appState.catalogApi) {
+        searchCatalogApi().catch(error => console.warn('Catalog search failed:', error));
+        return;
+    }
+    
     const searchTerm = document.getElementById('search-input').value.toLowerCase();
     const filteredCars = appState.cars.filter(car => 
         car.title.toLowerCase().includes(searchTerm) ||
@@ -515,6 +832,11 @@ function searchCars() {
 }
 
 function filterCars() {
+    if (appState.catalogApi) {
+        searchCatalogApi().catch(error => console.warn('Catalog search failed:', error));
+        return;
+    }
+    
     const brandFilter = document.getElementById('brand-filter').value;
     const priceFilter = document.getElementById('price-filter').value;
     
@@ -692,6 +1014,12 @@ function openBidModal(carId) {
 }
 
 function placeBid() {
+    // Bids must go through the bid engine when the server is available
+    if (appState.catalogApi) {
+        placeBidEnhanced();
+        return;
+    }
+    
     const carId = parseInt(document.getElementById('place-bid').dataset.carId);
     const bidAmount = parseInt(document.getElementById('bid-amount').value);
     
@@ -810,25 +1138,36 @@ function loadBiddingHistory() {
     });
 }
 
-// Periodic updates (simulate real-time updates)
+// Countdown: update the time left of the cards on screen in place (no grid rebuild)
 setInterval(() => {
-    // Update time left for auctions (simplified)
+    liveUpdates.visible.forEach(carId => {
+        const car = appState.cars.find(c => c.id === carId);
+        if (car && car.endsAt) {
+            car.timeLeft = formatTimeLeft(car.endsAt);
+            updateCarCards(car);
+        }
+    });
+}, 1000);
+
+// Without the live server, simulate time-left changes (patched into the cards in place)
+setInterval(() => {
+    if (liveUpdates.source) return;
     appState.cars.forEach(car => {
-        // This is a simplified simulation - in real app, this would come from server
-        if (Math.random() < 0.1) { // 10% chance to update
+        if (!car.endsAt && Math.random() < 0.1) { // 10% chance to update
             const timeOptions = ['30 min', '1 hour', '2 hours', '5 hours', '1 day', '2 days'];
             car.timeLeft = timeOptions[Math.floor(Math.random() * timeOptions.length)];
+            updateCarCards(car);
         }
     });
-    
-    // Refresh current view
-    if (appState.currentTab === 'auctions') {
-        loadCars();
-    } else if (appState.currentTab === 'favorites') {
-        loadFavorites();
-    }
 }, 30000); // Update every 30 seconds
 
+// Pick up catalog changes (new or withdrawn lots); unchanged catalogs cost a 304
+setInterval(() => {
+    if (appState.catalogApi) {
+        syncCatalog().catch(error => console.warn('Catalog sync failed:', error));
+    }
+}, 60000);
+
 // User status management functions
 function refreshUserStatus() {
     showToast('🔄 Checking status...', 'info');
@@ -951,6 +1290,19 @@ function setupSearchEnhancements() {
             return;
         }
         
+        if (appState.catalogApi) {
+            queryCatalogApi('suggest', { q: query })
+                .then(data => {
+                    // Ignore answers to a query the user has already typed past
+                    if (searchInput.value.toLowerCase() !== query) return;
+                    showSearchSuggestions(data.suggestions.map(s => ({
+                        ...s, icon: s.type === 'brand' ? '🏷️' : '🚗'
+                    })));
+                })
+                .catch(() => showSearchSuggestions(getSuggestions(query)));
+            return;
+        }
+        
         const suggestions = getSuggestions(query);
         showSearchSuggestions(suggestions);
     });
@@ -1033,6 +1385,26 @@ function validateBidAmount(carId, amount) {
     return { valid: true, message: 'Valid bid' };
 }
 
+// Send a bid to the server-side bid engine; the car takes the lot state it returns
+async function postBid(car, bidAmount) {
+    const response = await fetch(`${CATALOG_API}/bids`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            lot: car.id,
+            bidder: String(appState.user.telegram_id || appState.user.name),
+            amount: bidAmount
+        })
+    });
+    const result = await response.json();
+    if (!response.ok && response.status !== 409) throw new Error(result.error || `Bid API ${response.status}`);
+    if (result.lot) {
+        car.currentBid = result.lot.current_bid;
+        car.minBid = result.lot.min_bid;
+    }
+    return result;
+}
+
 // Enhanced placeBid with better validation
 function placeBidEnhanced() {
     const carId = parseInt(document.getElementById('place-bid').dataset.carId);
@@ -1050,13 +1422,27 @@ function placeBidEnhanced() {
     bidButton.textContent = 'Processing...';
     bidButton.disabled = true;
     
-    // Simulate API call delay
-    setTimeout(() => {
-        const car = appState.cars.find(c => c.id === carId);
+    const car = appState.cars.find(c => c.id === carId);
+    
+    // With the bid server the engine decides; otherwise simulate the API call delay
+    const request = appState.catalogApi
+        ? postBid(car, bidAmount)
+        : new Promise(resolve => setTimeout(() => resolve({ accepted: true }), 1000));
+    
+    request.then(result => {
+        if (!result.accepted) {
+            bidButton.textContent = originalText;
+            bidButton.disabled = false;
+            loadCars();
+            showToast(result.error || 'Bid rejected', 'error');
+            return;
+        }
         
         // Update car bid
-        car.currentBid = bidAmount;
-        car.minBid = bidAmount + 500;
+        if (!result.lot) {
+            car.currentBid = bidAmount;
+            car.minBid = bidAmount + 500;
+        }
         
         // Add to bidding history
         const bidRecord = {
@@ -1085,7 +1471,12 @@ function placeBidEnhanced() {
         if (tg.HapticFeedback) {
             tg.HapticFeedback.notificationOccurred('success');
         }
-    }, 1000);
+    }).catch(error => {
+        console.error('Bid failed:', error);
+        bidButton.textContent = originalText;
+        bidButton.disabled = false;
+        showToast('Could not place bid, please try again', 'error');
+    });
 }
 
 // Touch gestures for mobile
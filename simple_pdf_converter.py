@@ -6,21 +6,39 @@ Versión simplificada sin interfaz gráfica
 
 import os
 import sys
+import time
+import argparse
 from pathlib import Path
 from datetime import datetime
 
-try:
-    from pdf2image import convert_from_path
-    PDF2IMAGE_AVAILABLE = True
-except ImportError:
-    PDF2IMAGE_AVAILABLE = False
+from pdf_render import (
+    PDF2IMAGE_AVAILABLE,
+    DEFAULT_WINDOW_SIZE,
+    DEFAULT_WORKERS,
+    convert_pdf_pages,
+    find_poppler_path,
+    get_page_count,
+    page_filename,
+)
+from page_pipeline import DEFAULT_ENCODERS, StageStats
+from page_cache import PYPDF_AVAILABLE, invalidate_manifest, plan_incremental
+from page_variants import parse_variants, variant_filename, write_variants_manifest
+from conversion_metrics import METRIC_FORMATS, write_metrics
+from page_journal import PageJournal, journal_key
+from page_archive import pack_pages
+from page_dedupe import NUMPY_AVAILABLE, DuplicateIndex, finish_dedupe, index_manager
+from job_queue import SHARD_PAGES, submit_job
 
 def log_message(message):
     """Imprimir mensaje con timestamp"""
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] {message}")
 
-def convert_pdf_to_images(pdf_path, output_dir=None, dpi=200, format_type="PNG", prefix="page"):
+def convert_pdf_to_images(pdf_path, output_dir=None, dpi=200, format_type="PNG", prefix="page",
+                          window_size=DEFAULT_WINDOW_SIZE, workers=DEFAULT_WORKERS,
+                          encoders=DEFAULT_ENCODERS, incremental=False, variants=None,
+                          metrics_path=None, metrics_format=None, poppler_path=None,
+                          executor=None, progress=None, resume=False, archive=False, dedupe=False):
     """
     Convertir PDF a imágenes
     
@@ -30,7 +48,22 @@ def convert_pdf_to_images(pdf_path, output_dir=None, dpi=200, format_type="PNG",
         dpi (int): Calidad en DPI (default: 200)
         format_type (str): Formato de imagen (PNG, JPEG, TIFF)
         prefix (str): Prefijo para nombres de archivo
+        window_size (int): Páginas decodificadas en memoria a la vez (por proceso)
+        workers (int): Procesos de renderizado en paralelo
+        encoders (int): Hilos de codificación por proceso (0 = guardar en serie)
+        incremental (bool): Renderizar solo las páginas que cambiaron
+        variants (list): Variantes de salida por página; reemplaza a format_type
+        metrics_path (str): Archivo donde exportar las métricas por etapa y página (opcional)
+        metrics_format (str): "jsonl" o "prometheus" (default: según la extensión)
+        poppler_path (str): Carpeta de binarios de Poppler ya localizada (default: buscarla)
+        executor (ProcessPoolExecutor): Pool de procesos ya arrancado (ver conversion_server)
+        progress (callable): Recibe un dict por evento: start, page y error (opcional)
+        resume (bool): No renderizar de nuevo las páginas que el diario de una
+            conversión interrumpida da por terminadas (ver page_journal)
+        archive (bool): Empaquetar también todas las páginas en {prefix}.pages (ver page_archive)
+        dedupe (bool): No guardar páginas en blanco y guardar una sola vez las repetidas (ver page_dedupe)
     """
+    progress = progress or (lambda event: None)
     
     if not PDF2IMAGE_AVAILABLE:
         log_message("❌ Error: pdf2image no está instalado")
@@ -38,6 +71,13 @@ def convert_pdf_to_images(pdf_path, output_dir=None, dpi=200, format_type="PNG",
         log_message("   También necesitas poppler-utils instalado")
         return False
     
+    if dedupe and not NUMPY_AVAILABLE:
+        log_message("⚠️ numpy no está instalado: se guardan también las páginas en blanco y repetidas")
+        dedupe = False
+    if resume and dedupe:
+        log_message("❌ Error: --resume no se puede combinar con --dedupe")
+        return False
+    
     # Verificar que el PDF existe
     pdf_file = Path(pdf_path)
     if not pdf_file.exists():
@@ -53,44 +93,189 @@ def convert_pdf_to_images(pdf_path, output_dir=None, dpi=200, format_type="PNG",
     # Crear carpeta si no existe
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    manager = None
+    journal = None
     try:
+        wall_start = time.perf_counter()
         log_message("🚀 Iniciando conversión...")
         log_message(f"📄 PDF: {pdf_file.name}")
         log_message(f"📁 Salida: {output_dir}")
-        log_message(f"🎨 Configuración: {dpi} DPI, formato {format_type}")
+        if variants:
+            log_message(f"🎨 Configuración: {dpi} DPI, variantes: {', '.join(v.name for v in variants)}")
+        else:
+            log_message(f"🎨 Configuración: {dpi} DPI, formato {format_type}")
+        log_message(f"⚙️ Procesos de renderizado: {workers}, hilos de codificación: {encoders}")
         
-        # Convertir PDF
-        log_message("🔄 Convirtiendo páginas...")
-        images = convert_from_path(str(pdf_file), dpi=dpi)
-        
-        total_pages = len(images)
+        if poppler_path is None:
+            poppler_path = find_poppler_path(Path(__file__).parent)
+        total_pages = get_page_count(pdf_file, poppler_path=poppler_path)
         log_message(f"📑 Encontradas {total_pages} páginas")
         
-        # Guardar imágenes
-        for i, image in enumerate(images, 1):
-            filename = f"{prefix}_{i:03d}.{format_type.lower()}"
-            image_path = output_dir / filename
-            
-            # Optimizar según formato
-            if format_type.lower() == 'jpeg':
-                image.save(image_path, format_type.upper(), quality=95, optimize=True)
+        # Comparar con el manifiesto de la conversión anterior
+        plan = None
+        render_pages = None
+        if incremental:
+            if not PYPDF_AVAILABLE:
+                log_message("⚠️ pypdf no está instalado: solo se reaprovechan páginas si el PDF no cambió")
+            plan = plan_incremental(pdf_file, output_dir, total_pages, dpi, format_type, prefix,
+                                    variants=variants)
+            plan.apply_reuse()
+            render_pages = plan.render_pages
+            log_message(f"♻️ Incremental: {len(plan.unchanged)} sin cambios, "
+                        f"{len(plan.reused_pages)} reaprovechadas, {len(render_pages)} por renderizar")
+        else:
+            invalidate_manifest(output_dir)
+        
+        # Diario de páginas terminadas; al reanudar, saltar las que siguen intactas
+        if not dedupe:
+            journal = PageJournal(output_dir, journal_key(pdf_file, dpi, format_type, prefix, variants)).open(resume)
+        if resume:
+            pending = render_pages if render_pages is not None else range(1, total_pages + 1)
+            finished = journal.completed_pages(pending)
+            render_pages = [page_no for page_no in pending if page_no not in finished]
+            log_message(f"⏩ Reanudando: {len(finished)} páginas ya terminadas, {len(render_pages)} por renderizar")
+        
+        progress({"event": "start", "pages": total_pages,
+                  "render": total_pages if render_pages is None else len(render_pages)})
+        
+        def page_files(page_no):
+            if variants:
+                return [output_dir / variant_filename(prefix, page_no, variant) for variant in variants]
+            return [output_dir / page_filename(prefix, page_no, format_type)]
+        
+        # Convertir y guardar por ventanas de páginas
+        log_message(f"🔄 Convirtiendo páginas ({window_size} en memoria)...")
+        stats = StageStats()
+        dedupe_index = None
+        if dedupe:
+            # Con varios procesos el índice de páginas vistas vive en un proceso aparte
+            manager = index_manager() if workers > 1 else None
+            dedupe_index = manager.DuplicateIndex() if manager else DuplicateIndex()
+        
+        pages = convert_pdf_pages(pdf_file, output_dir, total_pages, dpi=dpi,
+                                  format_type=format_type, prefix=prefix, workers=workers,
+                                  window_size=window_size, poppler_path=poppler_path,
+                                  encoders=encoders, stats=stats, pages=render_pages,
+                                  variants=variants, dedupe=dedupe_index, executor=executor)
+        rendered = 0
+        for i, image_path in pages:
+            rendered += 1
+            if image_path is None:
+                log_message(f"⬜ Página {i} en blanco: no se guarda")
+            elif image_path != page_files(i)[0]:
+                log_message(f"🔁 Página {i} repetida: {image_path.name}")
             else:
-                image.save(image_path, format_type.upper())
-            
-            log_message(f"💾 Guardado: {filename}")
+                log_message(f"💾 Guardado: {image_path.name}")
+            if journal is not None:
+                journal.record(i, page_files(i))
+            progress({"event": "page", "page": i, "file": image_path.name if image_path is not None else None})
+        
+        if plan is not None:
+            for filename in plan.finish():
+                log_message(f"🗑️ Eliminado archivo obsoleto: {filename}")
+        
+        if variants:
+            manifest_path = write_variants_manifest(output_dir, prefix, total_pages, variants, dpi)
+            log_message(f"🗂️ Manifiesto de variantes: {manifest_path.name}")
+        
+        if dedupe_index is not None:
+            result = finish_dedupe(dedupe_index, output_dir, prefix, stats, page_files)
+            log_message(f"🔁 {result['blank']} páginas en blanco y {result['duplicates']} repetidas sin guardar: "
+                        f"≈{result['bytes'] / (1024 * 1024):.2f} MB y ≈{result['seconds']:.2f} s "
+                        f"de codificación ahorrados ({result['manifest'].name})")
+        
+        if archive:
+            result = pack_pages(output_dir, prefix, format_type, variants, total_pages)
+            log_message(f"🗃️ Archivo de páginas: {result['path'].name} ({result['added']} archivos nuevos "
+                        f"o cambiados, {result['bytes'] / (1024 * 1024):.2f} MB)")
         
         log_message(f"✅ ¡Conversión completada exitosamente!")
         log_message(f"📁 Imágenes guardadas en: {output_dir}")
         log_message(f"📊 Total de imágenes: {total_pages}")
+        for line in stats.summary_lines():
+            log_message(f"⏱️ {line}")
+        
+        if metrics_path:
+            metrics_file = write_metrics(metrics_path, stats, metrics_format, pdf=str(pdf_file),
+                                         dpi=dpi, format=format_type, workers=workers,
+                                         encoders=encoders, pages=rendered,
+                                         wall_seconds=time.perf_counter() - wall_start)
+            log_message(f"📈 Métricas escritas en: {metrics_file}")
         
         return True
         
     except Exception as e:
         log_message(f"❌ Error durante la conversión: {str(e)}")
+        progress({"event": "error", "message": str(e)})
         return False
+    
+    finally:
+        if journal is not None:
+            journal.close()
+        if manager is not None:
+            manager.shutdown()
 
-def main():
+def submit_pdf(queue_path, pdf_path, output_dir, dpi=200, format_type="PNG", prefix="page",
+               variants=None, shard_pages=SHARD_PAGES):
+    """
+    Enviar el PDF a la cola compartida (job_queue) en lugar de convertirlo aquí
+
+    Los procesos `python job_queue.py --queue <cola> worker` renderizan los
+    bloques de páginas en `output_dir`, que debe ser accesible para todos.
+    """
+    try:
+        poppler_path = find_poppler_path(Path(__file__).parent)
+        job_id, pages, shards = submit_job(queue_path, pdf_path, output_dir, dpi, format_type, prefix,
+                                           variants, shard_pages, poppler_path)
+    except Exception as e:
+        log_message(f"❌ Error al enviar el PDF a la cola: {e}")
+        return False
+    
+    log_message(f"📥 Trabajo {job_id}: {Path(pdf_path).name}, {pages} páginas en {shards} bloques")
+    log_message(f"📋 Procesarlo con: python job_queue.py --queue {queue_path} worker")
+    return True
+
+def parse_args(argv=None):
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Simple PDF to Images Converter")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Procesos de renderizado en paralelo (default: {DEFAULT_WORKERS}, núcleos de CPU)")
+    parser.add_argument("--encoders", type=int, default=DEFAULT_ENCODERS,
+                        help=f"Hilos de codificación por proceso, 0 = en serie (default: {DEFAULT_ENCODERS})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Renderizar solo las páginas que cambiaron desde la última conversión")
+    parser.add_argument("--variants", type=parse_variants, default=None,
+                        help="Varias salidas por página desde un solo renderizado, "
+                             "p. ej. \"thumb:webp:320,large:jpeg:1024,full:png\"")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar una conversión interrumpida sin repetir las páginas ya terminadas")
+    parser.add_argument("--archive", action="store_true",
+                        help="Empaquetar también todas las páginas en un solo archivo {prefix}.pages")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="No guardar páginas en blanco y guardar una sola vez las páginas repetidas")
+    parser.add_argument("--metrics", default=None,
+                        help="Archivo de métricas por etapa y página (.jsonl se añade, .prom para Prometheus)")
+    parser.add_argument("--metrics-format", choices=METRIC_FORMATS, default=None,
+                        help="Formato de --metrics (default: según la extensión)")
+    parser.add_argument("--queue", default=None,
+                        help="Enviar el PDF a una cola compartida (job_queue.py) en lugar de convertirlo aquí")
+    parser.add_argument("--shard-pages", type=int, default=SHARD_PAGES,
+                        help=f"Páginas por bloque de la cola (default: {SHARD_PAGES})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Función principal"""
+    args = parse_args(argv)
+    
+    if args.queue:
+        unsupported = [flag for flag, value in (("--incremental", args.incremental), ("--resume", args.resume),
+                                                ("--archive", args.archive), ("--dedupe", args.dedupe),
+                                                ("--metrics", args.metrics))
+                       if value]
+        if unsupported:
+            log_message(f"❌ Error: {', '.join(unsupported)} no se puede combinar con --queue")
+            return
+    
     print("=" * 50)
     print("📄 PDF to Images Converter (Simple)")
     print("=" * 50)
@@ -117,6 +302,8 @@ def main():
     dpi = 200
     format_type = "PNG"
     prefix = "page"
+    window_size = DEFAULT_WINDOW_SIZE
+    workers = args.workers
     
     # Preguntar si quiere cambiar configuración
     print("\nConfiguración actual:")
@@ -124,6 +311,8 @@ def main():
     print(f"  🎨 DPI: {dpi}")
     print(f"  📄 Formato: {format_type}")
     print(f"  🏷️ Prefijo: {prefix}")
+    print(f"  🧠 Páginas en memoria: {window_size}")
+    print(f"  ⚙️ Procesos: {workers}")
     print()
     
     change_config = input("¿Cambiar configuración? (y/n): ").lower().strip()
@@ -145,8 +334,25 @@ def main():
         new_prefix = input(f"Prefijo [{prefix}]: ").strip()
         if new_prefix:
             prefix = new_prefix
+        
+        new_window = input(f"Páginas en memoria [{window_size}]: ").strip()
+        if new_window and new_window.isdigit() and int(new_window) > 0:
+            window_size = int(new_window)
+        
+        new_workers = input(f"Procesos [{workers}]: ").strip()
+        if new_workers and new_workers.isdigit() and int(new_workers) > 0:
+            workers = int(new_workers)
     
     print()
+    if args.queue:
+        success = submit_pdf(args.queue, pdf_path, output_dir, dpi=dpi, format_type=format_type,
+                             prefix=prefix, variants=args.variants, shard_pages=args.shard_pages)
+        if not success:
+            print()
+            print("❌ No se pudo enviar el PDF a la cola. Revisa los errores arriba.")
+        input("\nPresiona Enter para salir...")
+        return
+    
     log_message("Iniciando conversión con la configuración seleccionada...")
     
     # Ejecutar conversión
@@ -155,7 +361,17 @@ def main():
         output_dir=output_dir,
         dpi=dpi,
         format_type=format_type,
-        prefix=prefix
+        prefix=prefix,
+        window_size=window_size,
+        workers=workers,
+        encoders=args.encoders,
+        incremental=args.incremental,
+        variants=args.variants,
+        metrics_path=args.metrics,
+        metrics_format=args.metrics_format,
+        resume=args.resume,
+        archive=args.archive,
+        dedupe=args.dedupe
     )
     
     if success:
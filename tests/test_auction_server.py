@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from auction_server import HTTPServer, Response, parse_range
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes = 10 - 20", (10, 20)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-2000", "bytes=50-10", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    assert parse_range(header, 1000) == "invalid"
+
+@pytest.mark.parametrize("header", ["bytes=0-10,20-30", "bytes=-", "items=0-10", "bytes=a-b", ""])
+def test_unsupported_ranges_serve_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+def exchange(raw_request):
+    """Enviar una petición en crudo a un HTTPServer con una ruta POST /echo y leer la respuesta"""
+    async def echo(request):
+        return Response.json({"bytes": len(request.body)})
+
+    async def scenario():
+        server = HTTPServer()
+        server.route("POST", "/echo", echo)
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw_request)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+        finally:
+            listener.close()
+            await listener.wait_closed()
+
+    return asyncio.run(scenario())
+
+def test_body_is_read_by_content_length():
+    response = exchange(b"POST /echo HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\nhello")
+    assert response.startswith(b"HTTP/1.1 200")
+    assert response.endswith(b'{"bytes":5}')
+
+@pytest.mark.parametrize("value", [b"abc", b"-5", b"1.5", b"0x10"])
+def test_invalid_content_length_is_rejected(value):
+    response = exchange(b"POST /echo HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\nhello")
+    assert response.startswith(b"HTTP/1.1 400")
+    assert "Content-Length inválido".encode("utf-8") in response
@@ -0,0 +1,24 @@
+import pytest
+
+from batch_convert import check_output_dirs, expand_inputs, unique_inputs
+
+def test_same_stem_in_two_folders_is_rejected(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "sale.pdf").write_bytes(b"%PDF")
+    pdfs = [tmp_path / "a" / "sale.pdf", tmp_path / "b" / "sale.pdf"]
+    with pytest.raises(ValueError) as error:
+        check_output_dirs(str(tmp_path / "out" / "{stem}"), pdfs)
+    assert "a" in str(error.value) and "sale.pdf" in str(error.value)
+    check_output_dirs(str(tmp_path / "out" / "{parent}" / "{stem}"), pdfs)
+
+def test_overlapping_globs_list_each_pdf_once(tmp_path):
+    (tmp_path / "sale.pdf").write_bytes(b"%PDF")
+    (tmp_path / "other.pdf").write_bytes(b"%PDF")
+    pdfs = expand_inputs([str(tmp_path / "*.pdf"), str(tmp_path / "sale.pdf"), str(tmp_path / "s*.pdf")])
+    assert sorted(path.name for path in pdfs) == ["other.pdf", "sale.pdf"]
+    check_output_dirs(str(tmp_path / "out" / "{stem}"), pdfs)
+
+def test_unique_inputs_resolves_paths(tmp_path):
+    pdf = tmp_path / "sale.pdf"
+    assert unique_inputs([pdf, tmp_path / "." / "sale.pdf"]) == [pdf]
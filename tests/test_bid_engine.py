@@ -0,0 +1,80 @@
+import asyncio
+
+from bid_engine import BidEngine, encode_record
+
+def test_checkpoint_while_bids_create_new_lots(tmp_path):
+    wal_path = tmp_path / "bids.wal"
+    lots = 30000
+
+    async def scenario():
+        engine = BidEngine(wal_path, lot_lookup=lambda lot: 1000, commit_delay=0)
+        await engine.start()
+        bids = []
+        checkpoints = []
+        for lot in range(1, lots + 1):
+            # Cada puja abre un lote nuevo mientras otro hilo escribe la instantánea
+            bids.append(asyncio.ensure_future(engine.place_bid(lot, "a", 1500)))
+            if lot % 5000 == 0:
+                checkpoints.append(asyncio.ensure_future(engine.checkpoint()))
+            if lot % 20 == 0:
+                await asyncio.sleep(0)
+        await asyncio.gather(*bids, *checkpoints)
+        await engine.stop()
+
+    asyncio.run(scenario())
+
+    engine = BidEngine(wal_path, lot_lookup=lambda lot: 1000)
+    engine.replay()
+    assert len(engine.books) == lots
+    assert all(book.current_bid == 1500 for book in engine.books.values())
+
+def place_bids(wal_path, bids, checkpoint_after=None):
+    async def scenario():
+        engine = BidEngine(wal_path, lot_lookup=lambda lot: 1000, commit_delay=0)
+        await engine.start()
+        for done, (lot, bidder, amount) in enumerate(bids, 1):
+            await engine.place_bid(lot, bidder, amount)
+            if done == checkpoint_after:
+                await engine.checkpoint()
+        await engine.stop()
+
+    asyncio.run(scenario())
+
+def test_replay_truncates_torn_tail(tmp_path):
+    wal_path = tmp_path / "bids.wal"
+    place_bids(wal_path, [(1, "a", 1500), (1, "b", 2000), (2, "a", 1500)])
+    complete_size = wal_path.stat().st_size
+    # Caída a mitad de escritura: la última línea queda sin terminar
+    with open(wal_path, "ab") as file:
+        file.write(encode_record({"seq": 4, "type": "bid", "lot": 1, "bidder": "c",
+                                  "amount": 2500, "ts": 0})[:-7])
+
+    engine = BidEngine(wal_path)
+    assert engine.replay() == 3
+    assert wal_path.stat().st_size == complete_size
+    assert engine.books[1].current_bid == 2000
+    assert engine.books[1].leader == "b"
+    assert engine.seq == 3
+
+def test_replay_stops_at_corrupted_record(tmp_path):
+    wal_path = tmp_path / "bids.wal"
+    place_bids(wal_path, [(1, "a", 1500), (1, "b", 2000)])
+    lines = wal_path.read_bytes().splitlines(keepends=True)
+    wal_path.write_bytes(lines[0] + lines[1].replace(b"2000", b"9000"))
+
+    engine = BidEngine(wal_path)
+    assert engine.replay() == 1
+    assert wal_path.read_bytes() == lines[0]
+    assert engine.books[1].current_bid == 1500
+
+def test_replay_applies_only_bids_after_snapshot(tmp_path):
+    wal_path = tmp_path / "bids.wal"
+    place_bids(wal_path, [(1, "a", 1500), (2, "a", 1500), (1, "b", 2000), (3, "c", 1500)],
+               checkpoint_after=2)
+
+    engine = BidEngine(wal_path)
+    # La instantánea cubre las dos primeras pujas; el WAL solo guarda las siguientes
+    assert engine.replay() == 2
+    assert engine.seq == 4
+    assert {lot: (book.current_bid, book.leader) for lot, book in engine.books.items()} == {
+        1: (2000, "b"), 2: (1500, "a"), 3: (1500, "c")}
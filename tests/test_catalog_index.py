@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from catalog_index import BLOCK_SIZE, CatalogIndex, SortedBitmapIndex, iter_bits
+
+MAKES = ["Toyota", "Nissan", "Ford", "Lexus", "Mitsubishi"]
+MODELS = {"Toyota": "Land Cruiser", "Nissan": "Patrol", "Ford": "F-150", "Lexus": "LX570",
+          "Mitsubishi": "Pajero"}
+
+def make_lots(count=300, seed=7):
+    rng = random.Random(seed)
+    lots = []
+    for number in rng.sample(range(1, count * 2), count):
+        make = rng.choice(MAKES)
+        lots.append({
+            "lot": number,
+            "make": make,
+            "model": MODELS[make],
+            "year": rng.choice([None, 2015, 2018, 2020, 2022]),
+            "title": f"{make} {MODELS[make]}",
+            # Precios repetidos a propósito para probar los extremos de los rangos
+            "starting_price": rng.choice([None, 5000, 10000, 20000]) or rng.randrange(1000, 40000, 250),
+        })
+    return lots
+
+@pytest.fixture(scope="module")
+def index():
+    return CatalogIndex(make_lots())
+
+def lot_numbers(index, mask):
+    return sorted(index.lots[doc_id]["lot"] for doc_id in iter_bits(mask))
+
+def expected(lots, predicate):
+    return sorted(lot["lot"] for lot in lots if predicate(lot))
+
+@pytest.mark.parametrize("low, high, low_inclusive", [
+    (None, None, True), (5000, 10000, True), (5000, 10000, False), (None, 5000, True),
+    (20000, None, False), (7777, 7777, True), (50000, None, True), (10000, 5000, True),
+])
+def test_range_mask_matches_scan(low, high, low_inclusive):
+    rng = random.Random(3)
+    values = [rng.choice([None, 5000, 10000, 20000, rng.randrange(0, 30000)])
+              for _ in range(BLOCK_SIZE * 5 + 17)]
+    mask = SortedBitmapIndex(values).range_mask(low, high, low_inclusive=low_inclusive)
+
+    def inside(value):
+        if value is None:
+            return False
+        if low is not None and (value < low if low_inclusive else value <= low):
+            return False
+        return high is None or value <= high
+
+    assert sorted(iter_bits(mask)) == [doc_id for doc_id, value in enumerate(values) if inside(value)]
+
+def test_text_query_uses_last_word_as_prefix(index):
+    lots = index.lots
+    assert lot_numbers(index, index.text_mask("land cru")) == expected(
+        lots, lambda lot: lot["make"] == "Toyota")
+    assert lot_numbers(index, index.text_mask("f-150")) == expected(lots, lambda lot: lot["make"] == "Ford")
+    assert lot_numbers(index, index.text_mask("nis")) == expected(lots, lambda lot: lot["make"] == "Nissan")
+    assert index.text_mask("cruiser land") == index.text_mask("land cruiser")
+    assert index.text_mask("toyota patrol") == 0
+    assert index.text_mask("toyot patrol") == 0
+    assert index.text_mask("") == index.all_mask
+
+def test_filters_match_scan(index):
+    lots = index.lots
+    mask = index.filter_mask(brand="toyota", price="5000-10000", year_min=2018, year_max=2020)
+    assert lot_numbers(index, mask) == expected(
+        lots, lambda lot: lot["make"] == "Toyota" and 5000 < lot["starting_price"] <= 10000
+        and lot["year"] is not None and 2018 <= lot["year"] <= 2020)
+
+    mask = index.filter_mask(price_min=10000, price_max=20000)
+    assert lot_numbers(index, mask) == expected(lots, lambda lot: 10000 <= lot["starting_price"] <= 20000)
+
+def test_search_facets_and_price_order(index):
+    result = index.search("pat", sort="price_desc", limit=1000)
+    nissans = [lot for lot in index.lots if lot["make"] == "Nissan"]
+    assert result["total"] == len(nissans)
+    prices = [lot["starting_price"] for lot in result["lots"]]
+    assert prices == sorted(prices, reverse=True)
+    assert result["facets"]["brand"] == {"Nissan": len(nissans)}
+    assert sum(result["facets"]["price"].values()) == len(nissans)
+
+    page = index.search(offset=10, limit=5, facets=False)
+    assert [lot["lot"] for lot in page["lots"]] == sorted(lot["lot"] for lot in index.lots)[10:15]
+    assert "facets" not in page
+
+def test_facets_of_everything_count_every_lot(index):
+    facets = index.facets()
+    assert sum(facets["brand"].values()) == len(index.lots)
+    assert sum(facets["price"].values()) == len(index.lots)
+    assert facets["year"] == {str(year): sum(1 for lot in index.lots if lot["year"] == year)
+                              for year in (2022, 2020, 2018, 2015)}
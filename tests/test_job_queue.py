@@ -0,0 +1,103 @@
+import pytest
+
+import job_queue
+from job_queue import MAX_ATTEMPTS, QueueWorker, connect, queue_status, submit_job
+
+@pytest.fixture
+def queue_path(tmp_path, monkeypatch):
+    # Las páginas se cuentan con pdfinfo; aquí cada PDF tiene 20
+    monkeypatch.setattr(job_queue, "get_page_count", lambda pdf_path, poppler_path=None: 20)
+    return tmp_path / "queue.sqlite"
+
+def submit(queue_path, tmp_path, name, shard_pages=8):
+    pdf_path = tmp_path / f"{name}.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4\n%%EOF\n")
+    return submit_job(queue_path, pdf_path, tmp_path / name, shard_pages=shard_pages)
+
+def expire_leases(queue_path):
+    connection = connect(queue_path)
+    try:
+        connection.execute("UPDATE shards SET lease_until = 0 WHERE status = 'leased'")
+    finally:
+        connection.close()
+
+def shard_row(queue_path, shard_id):
+    connection = connect(queue_path)
+    try:
+        return dict(connection.execute("SELECT * FROM shards WHERE id = ?", (shard_id,)).fetchone())
+    finally:
+        connection.close()
+
+def test_claims_oldest_job_in_page_order(queue_path, tmp_path):
+    first_job, pages, shards = submit(queue_path, tmp_path, "a")
+    submit(queue_path, tmp_path, "b")
+    assert (pages, shards) == (20, 3)
+
+    worker = QueueWorker(queue_path, worker_id="w1")
+    claimed = [worker.claim() for _ in range(4)]
+    assert [(shard["id"], shard["first_page"], shard["last_page"]) for shard in claimed] == [
+        (first_job, 1, 8), (first_job, 9, 16), (first_job, 17, 20), (first_job + 1, 1, 8)]
+    assert queue_status(queue_path)[0]["status"] == "running"
+    assert queue_status(queue_path)[0]["shards"]["leased"] == 3
+
+def test_expired_lease_is_taken_over(queue_path, tmp_path):
+    submit(queue_path, tmp_path, "a", shard_pages=20)
+    first = QueueWorker(queue_path, worker_id="w1")
+    second = QueueWorker(queue_path, worker_id="w2")
+
+    shard = first.claim()
+    # Mientras el alquiler sigue vigente nadie más puede reclamar el bloque
+    assert second.claim() is None
+
+    expire_leases(queue_path)
+    taken = second.claim()
+    assert taken["shard_id"] == shard["shard_id"]
+    assert shard_row(queue_path, shard["shard_id"])["worker"] == "w2"
+    assert shard_row(queue_path, shard["shard_id"])["attempts"] == 2
+
+    # El primer proceso ya no es dueño: su entrega se descarta
+    staging_dir = tmp_path / "a" / job_queue.SHARDS_DIR / "1-1"
+    staging_dir.mkdir(parents=True)
+    assert not first.complete(shard, staging_dir, None, 1.0)
+    assert shard_row(queue_path, shard["shard_id"])["status"] == "leased"
+
+    staging_dir = tmp_path / "a" / job_queue.SHARDS_DIR / "1-2"
+    staging_dir.mkdir(parents=True)
+    (staging_dir / "page_001.png").write_bytes(b"page")
+    assert second.complete(taken, staging_dir, None, 1.0)
+    assert queue_status(queue_path)[0]["status"] == "done"
+    assert (tmp_path / "a" / "page_001.png").read_bytes() == b"page"
+    assert not (tmp_path / "a" / job_queue.SHARDS_DIR).exists()
+    assert (tmp_path / "a" / "page_complete.json").is_file()
+
+def test_shard_fails_after_max_attempts(queue_path, tmp_path):
+    submit(queue_path, tmp_path, "a", shard_pages=20)
+    worker = QueueWorker(queue_path, worker_id="w1")
+
+    for attempt in range(MAX_ATTEMPTS):
+        shard = worker.claim()
+        assert shard["attempts"] == attempt
+        expire_leases(queue_path)
+
+    assert worker.claim() is None
+    status = queue_status(queue_path)[0]
+    assert status["status"] == "failed"
+    assert status["shards"]["failed"] == 1
+    assert "alquiler caducado" in status["error"]
+
+def test_release_counts_only_failed_attempts(queue_path, tmp_path):
+    submit(queue_path, tmp_path, "a", shard_pages=20)
+    worker = QueueWorker(queue_path, worker_id="w1")
+
+    # Un proceso que se detiene devuelve el bloque sin gastar un intento
+    worker.release(worker.claim())
+    assert shard_row(queue_path, 1)["attempts"] == 0
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        worker.release(worker.claim(), "poppler falló")
+        assert shard_row(queue_path, 1)["status"] == "pending"
+    worker.release(worker.claim(), "poppler falló")
+
+    assert shard_row(queue_path, 1)["status"] == "failed"
+    assert queue_status(queue_path)[0]["status"] == "failed"
+    assert worker.claim() is None
@@ -0,0 +1,29 @@
+import pytest
+
+from lot_extract import parse_lot_text
+
+@pytest.mark.parametrize("text, currency, price", [
+    ("LOT 12 2019 TOYOTA CAMRY 35,000 KM AED 15,000", "AED", 15000),
+    ("LOT 7 2015 FORD F-150 80,000 MILES $5,000", "USD", 5000),
+    ("LOT 8 2016 NISSAN PATROL $ 12.500", "USD", 12500),
+    ("LOT 9 2018 HONDA ACCORD USD 5000", "USD", 5000),
+    ("LOT 10 2020 KIA RIO sar 7,250", "SAR", 7250),
+])
+def test_starting_price(text, currency, price):
+    lot = parse_lot_text(text)
+    assert lot["currency"] == currency
+    assert lot["starting_price"] == price
+
+def test_fields_stop_at_dollar_price():
+    lot = parse_lot_text("LOT 7 2015 FORD F-150 80,000 MILES $5,000")
+    assert lot["lot"] == 7
+    assert lot["year"] == 2015
+    assert lot["make"] == "Ford"
+    assert lot["model"] == "F-150"
+    assert lot["mileage_km"] == round(80000 * 1.609344)
+
+def test_lot_without_price():
+    lot = parse_lot_text("LOT 3 2012 TOYOTA HILUX")
+    assert lot["lot"] == 3
+    assert lot.get("starting_price") is None
+    assert parse_lot_text("TERMS AND CONDITIONS") is None
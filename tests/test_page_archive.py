@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from page_archive import FOOTER, PageArchive, archive_path_for, pack_pages
+from page_dedupe import write_page_refs
+
+def write_pages(output_dir, contents):
+    for page_no, data in contents.items():
+        (output_dir / f"page_{page_no:03d}.png").write_bytes(data)
+
+def read_pages(path):
+    with PageArchive(path) as archive:
+        pages = {}
+        for page_no in range(1, archive.page_count + 1):
+            view = archive.page(page_no)
+            pages[page_no] = None if view is None else bytes(view)
+            if view is not None:
+                view.release()
+        return pages
+
+def test_pack_and_read_pages(tmp_path):
+    contents = {page_no: os.urandom(1000 + page_no) for page_no in range(1, 6)}
+    write_pages(tmp_path, contents)
+
+    result = pack_pages(tmp_path)
+    assert result["pages"] == 5
+    assert result["added"] == 5
+    assert read_pages(result["path"]) == contents
+    with PageArchive(result["path"]) as archive:
+        view, crc = archive.lookup("page_003.png")
+        assert bytes(view) == contents[3]
+        view.release()
+        assert archive.lookup("page_009.png") is None
+        assert archive.torn_bytes == 0
+
+def test_repack_appends_only_changed_pages_in_place(tmp_path):
+    contents = {page_no: os.urandom(2000) for page_no in range(1, 5)}
+    write_pages(tmp_path, contents)
+    path = pack_pages(tmp_path)["path"]
+    before = path.read_bytes()
+    inode = path.stat().st_ino
+
+    unchanged = pack_pages(tmp_path)
+    assert unchanged["added"] == 0
+    assert path.read_bytes() == before
+
+    contents[2] = os.urandom(2100)
+    write_pages(tmp_path, {2: contents[2]})
+    result = pack_pages(tmp_path)
+    assert result["added"] == 1
+    after = path.read_bytes()
+    # El archivo se amplía en el sitio: la versión anterior queda intacta delante
+    assert path.stat().st_ino == inode
+    assert after[:len(before)] == before
+    assert read_pages(path) == contents
+
+def test_reader_falls_back_to_last_complete_footer(tmp_path):
+    contents = {page_no: os.urandom(1500) for page_no in range(1, 4)}
+    write_pages(tmp_path, contents)
+    path = pack_pages(tmp_path)["path"]
+    first_size = path.stat().st_size
+
+    write_pages(tmp_path, {3: os.urandom(1600)})
+    pack_pages(tmp_path)
+    # Actualización cortada a medias: el pie nuevo no llegó a escribirse entero
+    with open(path, "r+b") as file:
+        file.truncate(path.stat().st_size - FOOTER.size // 2)
+
+    with PageArchive(path) as archive:
+        assert archive.end == first_size
+        assert archive.torn_bytes == path.stat().st_size - first_size
+    assert read_pages(path) == contents
+
+    # El siguiente empaquetado recorta lo que sobraba y vuelve a añadir la página
+    result = pack_pages(tmp_path)
+    assert result["added"] == 1
+    with PageArchive(path) as archive:
+        assert archive.torn_bytes == 0
+    assert read_pages(path)[3] == (tmp_path / "page_003.png").read_bytes()
+
+def test_repeated_pages_point_at_the_original(tmp_path):
+    contents = {1: os.urandom(1200), 2: os.urandom(1300), 4: os.urandom(1400)}
+    write_pages(tmp_path, contents)
+    write_page_refs(tmp_path, "page", [3], {5: 2}, {2: "page_002.png"})
+
+    path = pack_pages(tmp_path)["path"]
+    pages = read_pages(path)
+    assert pages == {1: contents[1], 2: contents[2], 3: None, 4: contents[4], 5: contents[2]}
+    with PageArchive(path) as archive:
+        assert archive.entry(5) == archive.entry(2)
+
+def test_not_an_archive(tmp_path):
+    path = archive_path_for(tmp_path)
+    path.write_bytes(b"PGARCHV1" + b"\0" * 100)
+    with pytest.raises(ValueError):
+        PageArchive(path)
@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+from PIL import ImageDraw, ImageFont
+
+from page_dedupe import BLANK, DUPLICATE, DuplicateIndex, classify_page
+
+def lot_page(first_lot, make, price):
+    """Página de catálogo de 1700x2200 con la maqueta fija y texto de 28 px"""
+    font = ImageFont.load_default(size=28)
+    image = Image.new("RGB", (1700, 2200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 100, 1600, 300), outline="black", width=4)
+    draw.text((120, 150), "SAJAA AUCTION - TUESDAY", fill="black", font=font)
+    for row in range(6):
+        top = 400 + row * 280
+        draw.rectangle((100, top, 700, top + 240), fill=(90, 90, 90))
+        draw.text((760, top + 20), f"LOT {first_lot + row}", fill="black", font=font)
+        draw.text((760, top + 70), f"{make} {2015 + row}", fill="black", font=font)
+        draw.text((760, top + 120), f"AED {price + row * 500:,}", fill="black", font=font)
+    return image
+
+def test_same_template_lot_pages_are_kept():
+    index = DuplicateIndex()
+    pages = [lot_page(10, "TOYOTA CAMRY", 15000), lot_page(16, "NISSAN PATROL", 22000),
+             lot_page(22, "HONDA ACCORD", 9000)]
+    results = [classify_page(image, page_no, index) for page_no, image in enumerate(pages, 1)]
+    assert results == [(None, None)] * 3
+
+def test_single_digit_change_is_kept():
+    index = DuplicateIndex()
+    original = lot_page(10, "TOYOTA CAMRY", 15000)
+    changed = original.copy()
+    draw = ImageDraw.Draw(changed)
+    draw.rectangle((760, 420, 1100, 460), fill="white")
+    draw.text((760, 420), "LOT 18", fill="black", font=ImageFont.load_default(size=28))
+    assert classify_page(original, 1, index) == (None, None)
+    assert classify_page(changed, 2, index) == (None, None)
+
+def test_repeated_page_and_blank_page():
+    index = DuplicateIndex()
+    original = lot_page(10, "TOYOTA CAMRY", 15000)
+    assert classify_page(original, 1, index) == (None, None)
+    assert classify_page(Image.new("RGB", (1700, 2200), "white"), 2, index) == (BLANK, None)
+    assert classify_page(original.copy(), 3, index) == (DUPLICATE, 1)
+    assert index.refs() == ([2], {3: 1})